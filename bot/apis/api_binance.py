@@ -1,11 +1,11 @@
 import time
 from datetime import datetime
-from decimal import Decimal
 
 import pandas as pd
 import requests
 
-from bot.models.models import BinanceKlines, KlineData
+from bot.apis.parsing import CandleValidationError, parse_binance_klines
+from bot.logs.config_log import console
 
 try:
     from segredos import CAMINHO
@@ -34,12 +34,13 @@ STATUS_CODE = 200
 BTCBRL_FILE = CAMINHO + '/btc_brl_binance.csv'
 
 
-def get_klines(
+def get_klines(  # noqa: PLR0913, PLR0917
     symbol='BTCBRL',
     interval='1m',
     startTime=None,  # datetime.now().timestamp() - 10 * 24 * 60 * 60,
     endTime=None,  # datetime.now().timestamp(),
     limit=1000,
+    strict=None,
 ):
     # Pegando o timeZone atual
     # timeZone = str(datetime.datetime.now().astimezone().timetz())[15:-3]
@@ -57,36 +58,20 @@ def get_klines(
     response = requests.get(url, params=params)
 
     if response.status_code == STATUS_CODE:
-        response = response.json()
-        # Converter os dados brutos para objetos KlineData
-        klines_data = []
-        for kline in response:
-            kline_dict = {
-                'timestamp': datetime.fromtimestamp(
-                    kline[0] / 1000
-                ).astimezone(),
-                'open': Decimal(str(kline[1])),
-                'high': Decimal(str(kline[2])),
-                'low': Decimal(str(kline[3])),
-                'close': Decimal(str(kline[4])),
-                'volume': Decimal(str(kline[5])),
-                'kline_close_time': datetime.fromtimestamp(
-                    kline[6] / 1000
-                ).astimezone(),
-                'quote_asset_volume': Decimal(str(kline[7])),
-                'number_of_trades': int(kline[8]),
-                'taker_buy_base_volume': Decimal(str(kline[9])),
-                'taker_buy_quote_volume': Decimal(str(kline[10])),
-            }
-            klines_data.append(KlineData(**kline_dict))
-
-        binance_klines = BinanceKlines(
-            data=klines_data, symbol=symbol, interval=interval
-        )
-
-        # Converter para DataFrame
-        df = pd.DataFrame([k.model_dump() for k in binance_klines.data])
-        return df
+        # Caminho rápido vetorizado; validação pydantic por linha só no
+        # modo estrito
+        try:
+            return parse_binance_klines(
+                response.json(),
+                symbol=symbol,
+                interval=interval,
+                strict=strict,
+            )
+        except CandleValidationError as exc:
+            console.print(f'[red]Candles inválidos na resposta:[/red] {exc}')
+        except ValueError:
+            console.print('[red]Erro ao decodificar a resposta JSON.[/red]')
+        return None
     else:
         resposta = response.raise_for_status()
         return str(resposta)
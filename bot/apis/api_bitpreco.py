@@ -1,11 +1,13 @@
+import json
 import os
 import re
 
 # Adicionando o caminho do diretório pai ao sys.path
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from decimal import Decimal
 from typing import Dict, Optional
 
 import httpx
@@ -19,8 +21,17 @@ from rich.progress import (
 )
 
 try:
-    from bot.models.models import BitPrecoHistory, PriceData
-    from segredos import CAMINHO, auth_token
+    from bot.apis.http_client import request, request_async
+    from bot.apis.parsing import (
+        CandleValidationError,
+        parse_bitpreco_history,
+    )
+    from db.parquet_candles import (
+        CANDLES_DIR,
+        append_candles,
+        load_candles,
+    )
+    from segredos import auth_token
 
     from ..logs.config_log import console
     from ..models.coin_pair import CoinPair
@@ -31,16 +42,25 @@ except ImportError:
     )
     sys.path.append(project_root)
     # Fallback para importação local
+    from bot.apis.http_client import request, request_async
+    from bot.apis.parsing import (
+        CandleValidationError,
+        parse_bitpreco_history,
+    )
     from bot.logs.config_log import console
     from bot.models.coin_pair import CoinPair
-    from bot.models.models import BitPrecoHistory, PriceData
-    from segredos import CAMINHO, auth_token  # type: ignore
+    from db.parquet_candles import (
+        CANDLES_DIR,
+        append_candles,
+        load_candles,
+    )
+    from segredos import auth_token  # type: ignore
 
 
 publicTradingApi = 'https://api.bitpreco.com/v1/trading/balance'
 
 
-def fetch_bitpreco_history(
+def fetch_bitpreco_history(  # noqa: PLR0913, PLR0917
     symbol: str = 'BTC_BRL',
     resolution: str = '1',
     time_range: Dict[str, int] = {
@@ -49,6 +69,7 @@ def fetch_bitpreco_history(
     },
     countback: int = 0,
     currency_code: str = 'BRL',
+    strict: bool | None = None,
 ) -> Optional[pd.DataFrame]:
     """
     Busca dados históricos de preços da API da BitPreço.
@@ -62,6 +83,7 @@ def fetch_bitpreco_history(
         (em segundos desde a época Unix).
         countback (int): Número de registros anteriores.
         currency_code (str): Código da moeda, por exemplo, 'BRL'.
+        strict (bool): Valida cada candle com pydantic (modo debug).
 
     Retorna:
         dict: Dados históricos de preços se a requisição for bem-sucedida.
@@ -94,11 +116,17 @@ def fetch_bitpreco_history(
     }
 
     try:
-        response = httpx.get(url, params=params, headers=headers)
+        response = request(
+            'GET', url, endpoint='history', params=params, headers=headers
+        )
         response.raise_for_status()
         data = response.json()
 
         # Verificar se a resposta contém as chaves esperadas
+        # Período sem negociações: DataFrame vazio (None indica erro)
+        if data.get('s') == 'no_data':
+            return pd.DataFrame()
+
         if not all(key in data for key in ['t', 'o', 'c', 'h', 'l', 'v', 's']):
             # Debugar a resposta
             # print(f'[yellow]Resposta da API:[/yellow] {data}')
@@ -108,26 +136,11 @@ def fetch_bitpreco_history(
             # )
             return None
 
-        price_data = []
-        for t, o, c, h, l, v in zip(  # noqa: E741
-            data['t'], data['o'], data['c'], data['h'], data['l'], data['v']
-        ):
-            price_dict = {
-                'timestamp': datetime.fromtimestamp(t).astimezone(),
-                'open': Decimal(str(o)),
-                'close': Decimal(str(c)),
-                'high': Decimal(str(h)),
-                'low': Decimal(str(l)),
-                'volume': Decimal(str(v)),
-            }
-            price_data.append(PriceData(**price_dict))
-
-        bitpreco_history = BitPrecoHistory(
-            data=price_data, symbol=symbol, resolution=resolution
+        # Caminho rápido vetorizado; validação pydantic por linha só no
+        # modo estrito
+        df = parse_bitpreco_history(
+            data, symbol=symbol, resolution=resolution, strict=strict
         )
-
-        # Converter para DataFrame
-        df = pd.DataFrame([p.model_dump() for p in bitpreco_history.data])
         return df
 
     except httpx.RequestError as exc:
@@ -147,6 +160,8 @@ def fetch_bitpreco_history(
             console.print(clean_text)
         except Exception as e:
             console.print(f'[red]Erro ao processar resposta:[/red] {e}')
+    except CandleValidationError as exc:
+        console.print(f'[red]Candles inválidos na resposta:[/red] {exc}')
     except ValueError:
         console.print('[red]Erro ao decodificar a resposta JSON.[/red]')
         console.print_exception()
@@ -157,13 +172,18 @@ def fetch_bitpreco_history(
 
 
 class ProgressManager:
-    def __init__(self, existing_progress=None, task_id=None):
+    def __init__(self, existing_progress=None, task_id=None, silent=False):
+        """
+        Com silent=True não cria barra de progresso (ex.: threads em
+        segundo plano, já que o console só aceita um display ao vivo).
+        """
         self.existing_progress = existing_progress
         self.task_id = task_id
+        self.silent = silent
         self.progress = None
 
     def __enter__(self):
-        if not self.existing_progress:
+        if not self.existing_progress and not self.silent:
             self.progress = Progress(
                 SpinnerColumn(),
                 TextColumn('[progress.description]{task.description}'),
@@ -198,79 +218,226 @@ class ProgressManager:
                 self.progress.update(self.task_id, total=total)
 
 
+# Janela de cada requisição ao histórico (segundos)
+BACKFILL_INTERVAL = 1184400
+# Início do histórico da BitPreço (1 de setembro de 2017)
+BACKFILL_START = datetime(2017, 9, 1)
+# Requisições simultâneas no backfill (o limite global de requisições por
+# segundo é o token bucket 'history' do http_client)
+BACKFILL_WORKERS = 4
+# Espera (segundos) antes de tentar de novo um backfill que falhou
+BACKFILL_RETRY_DELAY = 600
+
+_manifest_lock = threading.Lock()
+_backfill_threads: dict[str, threading.Thread] = {}
+_backfill_done: set[tuple[str, str]] = set()
+# Instante da última falha do backfill de cada par e resolução
+_backfill_failed: dict[tuple[str, str], float] = {}
+
+
+def _manifest_path(symbol: str, resolution: str) -> str:
+    return os.path.join(
+        CANDLES_DIR, 'bitpreco', symbol, f'_backfill_{resolution}.json'
+    )
+
+
+def _load_manifest(symbol: str, resolution: str) -> set[int]:
+    """Retorna o início das janelas já baixadas por completo."""
+    try:
+        with open(_manifest_path(symbol, resolution), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return set()
+    if manifest.get('interval') != BACKFILL_INTERVAL:
+        return set()
+    return set(manifest.get('completed', []))
+
+
+def _save_manifest(symbol: str, resolution: str, completed: set[int]):
+    path = _manifest_path(symbol, resolution)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'interval': BACKFILL_INTERVAL,
+                'completed': sorted(completed),
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+
+
+def _missing_windows(
+    symbol: str, resolution: str, start_time: int, end_time: int
+) -> list[tuple[int, int]]:
+    """
+    Janelas que ainda precisam ser baixadas, da mais recente para a mais
+    antiga. Só as janelas fechadas do manifesto ficam de fora: um dia no
+    armazenamento pode estar incompleto (gravado por outra janela, pela
+    atualização recente ou por um CSV importado), então a existência da
+    partição não indica que a janela foi baixada.
+    """
+    completed = _load_manifest(symbol, resolution)
+    windows = []
+    for current in range(start_time, end_time, BACKFILL_INTERVAL):
+        following = min(current + BACKFILL_INTERVAL, end_time)
+        if following < end_time and current in completed:
+            continue
+        windows.append((current, following))
+    return windows[::-1]
+
+
+def _store_window(
+    df: pd.DataFrame,
+    window: tuple[int, int],
+    symbol: str,
+    resolution: str,
+    end_time: int,
+):
+    """Grava a janela baixada e a registra no manifesto se já fechou."""
+    if not df.empty:
+        append_candles(df, symbol, 'bitpreco', only_new=False)
+    if window[1] < end_time:
+        with _manifest_lock:
+            completed = _load_manifest(symbol, resolution)
+            completed.add(window[0])
+            _save_manifest(symbol, resolution, completed)
+
+
 # função que gera um dataset com os dados de histórico de preços da BitPreço
-def dataset_bitpreco(
+def dataset_bitpreco(  # noqa: PLR0913, PLR0917
     coin_pair: CoinPair,
     resolution: str = '1',
-    salvar_csv: bool = False,
+    salvar: bool = False,
     existing_progress=None,
     task_id=None,
+    max_workers: int = BACKFILL_WORKERS,
+    silent: bool = False,
 ) -> pd.DataFrame:
-    # Set the starting timestamp (e.g., September 1, 2017)
-    start_time = int(datetime(2017, 9, 1).timestamp())
+    """
+    Baixa o histórico de preços em janelas paralelas.
+
+    Com salvar=True cada janela é gravada no armazenamento assim que
+    chega e registrada no manifesto de checkpoint, de modo que uma
+    execução interrompida continua de onde parou. Nesse caso o retorno é
+    o histórico completo do armazenamento. Com silent=True não exibe a
+    barra de progresso.
+    """
+    start_time = int(BACKFILL_START.timestamp())
     end_time = int(time.time())
-    data_frames = []
-    interval = 1184400
 
     # Usar o formato apropriado para a BitPreco
     symbol = coin_pair.bitpreco_websocket
 
-    # Calcular o número total de iterações
-    total_iterations = (end_time - start_time) // interval + 1
+    if salvar:
+        windows = _missing_windows(symbol, resolution, start_time, end_time)
+    else:
+        windows = [
+            (current, min(current + BACKFILL_INTERVAL, end_time))
+            for current in range(start_time, end_time, BACKFILL_INTERVAL)
+        ][::-1]
+    data_frames = []
 
-    with ProgressManager(existing_progress, task_id) as progress_mgr:
+    def fetch_window(window):
+        return fetch_bitpreco_history(
+            symbol=symbol,
+            resolution=resolution,
+            time_range={'from': window[0], 'to': window[1]},
+            countback=0,
+            currency_code='BRL',
+        )
+
+    with (
+        ProgressManager(existing_progress, task_id, silent) as progress_mgr,
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+    ):
         progress_mgr.update(
-            total=total_iterations,
+            total=len(windows),
             description=f'Coletando dados históricos ({symbol})',
         )
+        futures = {
+            executor.submit(fetch_window, window): window for window in windows
+        }
+        for iteration, future in enumerate(as_completed(futures), 1):
+            window = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                console.print(f'[red]Erro no timestamp {window[0]}: {e}[/red]')
+                df = None
+
+            # None indica erro: a janela fica fora do manifesto e é
+            # baixada de novo na próxima execução
+            if df is not None and salvar:
+                _store_window(df, window, symbol, resolution, end_time)
+            elif df is not None:
+                data_frames.append(df)
+
+            progress_mgr.update(
+                advance=1,
+                description='Processando período'
+                + f' {iteration}/{len(windows)}',
+            )
 
-        current_time = start_time
-        iteration = 0
+    if salvar:
+        full_df = load_candles(symbol, 'bitpreco')
+    elif data_frames:
+        full_df = pd.concat(data_frames, ignore_index=True).sort_values(
+            'timestamp', ignore_index=True
+        )
+    else:
+        full_df = pd.DataFrame()
 
-        while current_time < end_time:
-            try:
-                next_time = min(current_time + interval, end_time)
-                df = fetch_bitpreco_history(
-                    symbol=symbol,
-                    resolution=resolution,
-                    time_range={'from': current_time, 'to': next_time},
-                    countback=0,
-                    currency_code='BRL',
-                )
+    if full_df.empty:
+        console.print('No data was collected')
+        return None
+    return full_df
 
-                if df is not None:
-                    data_frames.append(df)
 
-                current_time = next_time
-                iteration += 1
-                progress_mgr.update(
-                    advance=1,
-                    description='Processando período'
-                    + f' {iteration}/{total_iterations}',
-                )
-                time.sleep(1)  # API rate limit
+def backfill_in_background(coin_pair: CoinPair, resolution: str = '1'):
+    """
+    Inicia o backfill do par em uma thread separada, sem bloquear a thread
+    de trading. Roda no máximo uma vez por processo (retomando pelo
+    manifesto) e não faz nada enquanto já estiver em execução. Após uma
+    falha, só tenta de novo depois de BACKFILL_RETRY_DELAY segundos.
+    """
+    symbol = coin_pair.bitpreco_websocket
+    key = (symbol, resolution)
 
-            except Exception as e:
-                console.print(
-                    f'[red]Erro no timestamp {current_time}: {e}[/red]'
-                )
-                current_time += interval
-                iteration += 1
-                continue
-
-    # Combine all data frames into one
-    if data_frames:
-        full_df = pd.concat(data_frames, ignore_index=True)
-        # Save the data to a timescaledb table
-        if salvar_csv:
-            # transformando o timestamp para formato utc
-            full_df['timestamp'] = full_df['timestamp'].dt.tz_convert('UTC')
-            full_df.to_csv(f'{CAMINHO}/{symbol}_bitpreco.csv', index=False)
-            return full_df
-        else:
-            return full_df
-    else:
-        console.print('No data was collected')
+    def run():
+        # Sem barra de progresso: o bot já usa o display ao vivo do console
+        try:
+            dataset_bitpreco(
+                coin_pair=coin_pair,
+                resolution=resolution,
+                salvar=True,
+                silent=True,
+            )
+        except Exception as e:
+            _backfill_failed[key] = time.monotonic()
+            console.print(f'[red]Erro no backfill de {symbol}: {e}[/red]')
+            return
+        _backfill_done.add(key)
+
+    with _manifest_lock:
+        thread = _backfill_threads.get(symbol)
+        failed_at = _backfill_failed.get(key)
+        if (
+            key in _backfill_done
+            or (thread is not None and thread.is_alive())
+            or (
+                failed_at is not None
+                and time.monotonic() - failed_at < BACKFILL_RETRY_DELAY
+            )
+        ):
+            return thread
+        thread = threading.Thread(
+            target=run, name=f'backfill-{symbol}', daemon=True
+        )
+        _backfill_threads[symbol] = thread
+        thread.start()
+        return thread
 
 
 def Ticker(coin_pair=None):
@@ -283,26 +450,26 @@ def Ticker(coin_pair=None):
         pair_str = 'all-brl'
 
     url = f'https://api.bitpreco.com/{pair_str}/ticker'
-    response = httpx.get(url)
+    response = request('GET', url, endpoint='ticker')
     return response
 
 
 def Orderbook():
     url = 'https://api.bitpreco.com/btc-brl/orderbook'
-    response = httpx.get(url)
+    response = request('GET', url, endpoint='ticker')
     return response
 
 
 def Trades():
     url = 'https://api.bitpreco.com/btc-brl/trades'
-    response = httpx.get(url)
+    response = request('GET', url, endpoint='ticker')
     return response
 
 
 def Balance():
     url = publicTradingApi
     payload = {'cmd': 'balance', 'auth_token': auth_token}
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -313,7 +480,7 @@ def OpenOrders(market='BTC-BRL'):
         'auth_token': auth_token,
         'market': market,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -324,10 +491,41 @@ def ExecutedOrders(market='BTC-BRL'):
         'auth_token': auth_token,
         'market': market,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
+# Versões assíncronas das chamadas do início do ciclo de trading
+async def AsyncTicker(coin_pair=None):
+    if isinstance(coin_pair, CoinPair):
+        pair_str = coin_pair.get_format().lower()
+    elif isinstance(coin_pair, str):
+        pair_str = coin_pair.lower()
+    else:
+        pair_str = 'all-brl'
+
+    url = f'https://api.bitpreco.com/{pair_str}/ticker'
+    return await request_async('GET', url, endpoint='ticker')
+
+
+async def AsyncBalance():
+    payload = {'cmd': 'balance', 'auth_token': auth_token}
+    return await request_async(
+        'POST', publicTradingApi, endpoint='trading', data=payload
+    )
+
+
+async def AsyncExecutedOrders(market='BTC-BRL'):
+    payload = {
+        'cmd': 'executed_orders',
+        'auth_token': auth_token,
+        'market': market,
+    }
+    return await request_async(
+        'POST', publicTradingApi, endpoint='trading', data=payload
+    )
+
+
 def Buy(price, volume, amount, limited, market='BTC-BRL'):
     url = publicTradingApi
     payload = {
@@ -339,7 +537,7 @@ def Buy(price, volume, amount, limited, market='BTC-BRL'):
         'amount': amount,
         'limited': limited,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -354,7 +552,7 @@ def Sell(price, volume, amount, limited, market='BTC-BRL'):
         'amount': amount,
         'limited': limited,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -365,14 +563,14 @@ def OrderCancel(order_id):
         'auth_token': auth_token,
         'order_id': order_id,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
 def AllOrdersCancel():
     url = publicTradingApi
     payload = {'cmd': 'all_orders_cancel', 'auth_token': auth_token}
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -383,7 +581,7 @@ def OrderStatus(order_id):
         'auth_token': auth_token,
         'order_id': order_id,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -395,7 +593,7 @@ def GetQuote(type_mode='BUY', base_amount='0.01', market='BTC-BRL'):
         'market': market,
         'base_amount': base_amount,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -405,7 +603,7 @@ def ExecuteQuote(quote_id):
         'auth_token': auth_token,
         'quote_id': quote_id,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
@@ -420,12 +618,10 @@ def Withdrawal(amount, currency, priority, blockchain, address):
         'blockchain': blockchain,
         'address': address,
     }
-    response = httpx.post(url, data=payload)
+    response = request('POST', url, endpoint='trading', data=payload)
     return response
 
 
 if __name__ == '__main__':
-    dataset_bitpreco(
-        salvar_csv=True, coin_pair=CoinPair(base='BTC', quote='BRL')
-    )
+    dataset_bitpreco(salvar=True, coin_pair=CoinPair(base='BTC', quote='BRL'))
     # print(Ticker().json())
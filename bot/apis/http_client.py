@@ -0,0 +1,150 @@
+import asyncio
+import importlib.util
+import threading
+import time
+
+import httpx
+
+# HTTP/2 só é usado quando o pacote h2 está instalado (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Timeouts por tipo de endpoint (segundos)
+ENDPOINT_TIMEOUTS = {
+    'default': httpx.Timeout(10.0, connect=5.0),
+    'ticker': httpx.Timeout(5.0, connect=3.0),
+    'trading': httpx.Timeout(10.0, connect=5.0),
+    'history': httpx.Timeout(30.0, connect=5.0),
+}
+
+# Limites de requisições por tipo de endpoint: (requisições/s, rajada)
+ENDPOINT_RATE_LIMITS = {
+    'default': (10.0, 10),
+    'ticker': (10.0, 10),
+    'trading': (5.0, 5),
+    'history': (2.0, 2),
+}
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0
+)
+
+
+class TokenBucket:
+    """
+    Limitador de taxa do lado do cliente (token bucket), seguro entre
+    threads e utilizável em código síncrono e assíncrono.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Consome um token e retorna quanto tempo esperar por ele."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+_buckets = {
+    endpoint: TokenBucket(rate, capacity)
+    for endpoint, (rate, capacity) in ENDPOINT_RATE_LIMITS.items()
+}
+
+_client_lock = threading.Lock()
+_client: httpx.Client | None = None
+# Um AsyncClient por event loop (conexões não podem trocar de loop)
+_async_clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def get_client() -> httpx.Client:
+    """Retorna a sessão HTTP compartilhada (keep-alive entre chamadas)."""
+    global _client  # noqa: PLW0603
+    if _client is None or _client.is_closed:
+        with _client_lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    limits=POOL_LIMITS,
+                    timeout=ENDPOINT_TIMEOUTS['default'],
+                )
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Retorna a sessão HTTP assíncrona do event loop atual."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        # Descarta clientes de loops já encerrados
+        for old_loop in [lp for lp in _async_clients if lp.is_closed()]:
+            del _async_clients[old_loop]
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=POOL_LIMITS,
+            timeout=ENDPOINT_TIMEOUTS['default'],
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _timeout(endpoint: str) -> httpx.Timeout:
+    return ENDPOINT_TIMEOUTS.get(endpoint, ENDPOINT_TIMEOUTS['default'])
+
+
+def _bucket(endpoint: str) -> TokenBucket:
+    return _buckets.get(endpoint, _buckets['default'])
+
+
+def request(
+    method: str, url: str, endpoint: str = 'default', **kwargs
+) -> httpx.Response:
+    """Requisição síncrona pela sessão compartilhada."""
+    _bucket(endpoint).acquire()
+    kwargs.setdefault('timeout', _timeout(endpoint))
+    return get_client().request(method, url, **kwargs)
+
+
+async def request_async(
+    method: str, url: str, endpoint: str = 'default', **kwargs
+) -> httpx.Response:
+    """Requisição assíncrona pela sessão do event loop atual."""
+    await _bucket(endpoint).acquire_async()
+    kwargs.setdefault('timeout', _timeout(endpoint))
+    return await get_async_client().request(method, url, **kwargs)
+
+
+def close_clients():
+    """Fecha a sessão síncrona (as assíncronas fecham com aclose_clients)."""
+    global _client  # noqa: PLW0603
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose_clients():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from bot.apis.api_bitpreco import AsyncBalance, AsyncTicker
+from db.writer import get_writer
+
+
+class SharedFetch:
+    """
+    Resultado compartilhado de uma requisição assíncrona: dentro do `ttl`
+    devolve o valor em cache e, fora dele, chamadas concorrentes aguardam
+    a mesma requisição em andamento em vez de abrir uma nova.
+    """
+
+    def __init__(self, fetch, ttl: float):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._value = None
+        self._fetched_at = 0.0
+        self._inflight: asyncio.Future | None = None
+
+    def invalidate(self):
+        self._value = None
+
+    async def get(self):
+        if (
+            self._value is not None
+            and time.monotonic() - self._fetched_at < self.ttl
+        ):
+            return self._value
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._run())
+        # shield: o cancelamento de um chamador (prazo do ciclo) não
+        # cancela a requisição dos demais
+        return await asyncio.shield(self._inflight)
+
+    async def _run(self):
+        try:
+            value = await self._fetch()
+            self._value, self._fetched_at = value, time.monotonic()
+            return value
+        finally:
+            self._inflight = None
+
+
+def _all_markets(response: dict) -> dict[str, dict]:
+    """Indexa a resposta do ticker all-brl por mercado (ex.: BTC-BRL)."""
+    tickers = {}
+    for key, value in response.items():
+        if not isinstance(value, dict):
+            continue  # 'success'
+        market = key.upper().replace('_', '-')
+        tickers[market] = {'market': market, **value}
+    return tickers
+
+
+class MarketSnapshot:
+    """
+    Coordenador do "tick" de mercado: o saldo e o ticker de todos os
+    mercados são buscados uma vez por tick e compartilhados entre os pares.
+    Deve ser usado dentro de um único event loop.
+    """
+
+    def __init__(self, ttl: float):
+        self._balance = SharedFetch(self._fetch_balance, ttl)
+        self._tickers = SharedFetch(self._fetch_tickers, ttl)
+
+    @staticmethod
+    async def _fetch_balance() -> dict:
+        response = await AsyncBalance()
+        response.raise_for_status()
+        balance = response.json()
+        get_writer().save_balance(balance)
+        return balance
+
+    @staticmethod
+    async def _fetch_tickers() -> dict[str, dict]:
+        response = await AsyncTicker()
+        response.raise_for_status()
+        return _all_markets(response.json())
+
+    async def balance(self) -> dict:
+        return await self._balance.get()
+
+    async def ticker(self, market: str) -> dict:
+        """Ticker do mercado (formato BTC-BRL) a partir do snapshot."""
+        tickers = await self._tickers.get()
+        ticker = tickers.get(market.upper())
+        if ticker is None:
+            # Mercado ausente do all-brl: consulta individual
+            response = await AsyncTicker(market)
+            response.raise_for_status()
+            ticker = response.json()
+        return ticker
+
+    def invalidate(self):
+        """Força nova busca (ex.: após executar uma ordem)."""
+        self._balance.invalidate()
+        self._tickers.invalidate()
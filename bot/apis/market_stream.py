@@ -0,0 +1,293 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+import phxsocket
+from phxsocket.channel import ChannelEvents
+
+from bot.apis.api_bitpreco_websockets import ORDERBOOK_SOCKET_URL
+from bot.logs.config_log import console
+
+# Tópico com os preços de todos os mercados em BRL
+TICKER_TOPIC = 'ticker:ALL-BRL'
+# Tópico interno com o estado da conexão ({'connected': bool})
+STATUS_TOPIC = 'stream:status'
+
+# Intervalo entre heartbeats e tempo máximo de espera pela resposta
+HEARTBEAT_INTERVAL = 15.0
+HEARTBEAT_TIMEOUT = 10.0
+# Tempo máximo de espera pela resposta do join de um canal
+JOIN_TIMEOUT = 10.0
+# Espera entre reconexões (backoff exponencial)
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 60.0
+
+
+class PubSub:
+    """
+    Pub/sub em processo: entrega cada mensagem aos callbacks e filas
+    inscritos no tópico e guarda a última mensagem de cada tópico.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: dict[str, list] = {}
+        self._queues: dict[str, list[queue.Queue]] = {}
+        self._latest: dict[str, tuple[float, object]] = {}
+
+    def subscribe(self, topic: str, callback):
+        """Inscreve um callback; retorna a função que cancela a inscrição."""
+        with self._lock:
+            self._callbacks.setdefault(topic, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._callbacks.get(topic, []):
+                    self._callbacks[topic].remove(callback)
+
+        return unsubscribe
+
+    def subscribe_queue(self, topic: str, maxsize: int = 100) -> queue.Queue:
+        """Retorna uma fila que recebe as mensagens do tópico."""
+        q = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._queues.setdefault(topic, []).append(q)
+        return q
+
+    def unsubscribe_queue(self, topic: str, q: queue.Queue):
+        with self._lock:
+            if q in self._queues.get(topic, []):
+                self._queues[topic].remove(q)
+
+    def publish(self, topic: str, message):
+        with self._lock:
+            self._latest[topic] = (time.monotonic(), message)
+            callbacks = list(self._callbacks.get(topic, []))
+            queues = list(self._queues.get(topic, []))
+
+        for q in queues:
+            # Consumidor lento: descarta a mensagem mais antiga
+            while True:
+                try:
+                    q.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                console.print(
+                    f'[red]Erro no assinante do tópico {topic}: {e}[/red]'
+                )
+
+    def latest(self, topic: str, max_age: float | None = None):
+        """Última mensagem do tópico, ou None se não houver ou se for velha."""
+        with self._lock:
+            item = self._latest.get(topic)
+        if item is None:
+            return None
+        received, message = item
+        if max_age is not None and time.monotonic() - received > max_age:
+            return None
+        return message
+
+
+def _normalize_market(market: str) -> str:
+    return str(market).upper().replace('_', '-')
+
+
+def _ticker_entries(payload) -> list[dict]:
+    """
+    Extrai os tickers de um evento 'price', aceitando um único ticker,
+    uma lista de tickers ou um dicionário indexado pelo mercado.
+    """
+    if isinstance(payload, list):
+        entries = payload
+    elif isinstance(payload, dict) and 'last' in payload:
+        entries = [payload]
+    elif isinstance(payload, dict):
+        entries = [
+            {'market': market, **value}
+            for market, value in payload.items()
+            if isinstance(value, dict)
+        ]
+    else:
+        entries = []
+
+    tickers = []
+    for entry in entries:
+        if not isinstance(entry, dict) or 'market' not in entry:
+            continue
+        ticker = dict(entry)
+        ticker['market'] = _normalize_market(ticker['market'])
+        # Mesmo formato de timestamp do ticker REST
+        ticker.setdefault(
+            'timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+        tickers.append(ticker)
+    return tickers
+
+
+class MarketDataStream:
+    """
+    Mantém uma conexão WebSocket com a BitPreço (heartbeat e reconexão
+    automática) e publica os tickers e livros de ordens no pub/sub:
+
+    - ticker:{MERCADO} (ex.: ticker:BTC-BRL) com o dicionário do ticker
+    - orderbook:{MERCADO} com o snapshot do livro de ordens
+    - stream:status com {'connected': bool}
+    """
+
+    def __init__(
+        self,
+        url: str = ORDERBOOK_SOCKET_URL,
+        pubsub: PubSub | None = None,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    ):
+        self.url = url
+        self.pubsub = pubsub or PubSub()
+        self.heartbeat_interval = heartbeat_interval
+        self.orderbook_markets: set[str] = set()
+        self.connected = False
+        self._socket = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._disconnected = threading.Event()
+
+    def start(self, orderbook_markets=()):
+        """Inicia a conexão em segundo plano (não bloqueia)."""
+        self.orderbook_markets |= {
+            _normalize_market(m) for m in orderbook_markets
+        }
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='market-stream', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._disconnected.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._close_socket()
+
+    def latest_ticker(self, market: str, max_age: float | None = None):
+        return self.pubsub.latest(
+            f'ticker:{_normalize_market(market)}', max_age
+        )
+
+    def _set_connected(self, connected: bool):
+        if connected != self.connected:
+            self.connected = connected
+            self.pubsub.publish(STATUS_TOPIC, {'connected': connected})
+
+    def _run(self):
+        backoff = RECONNECT_MIN
+        while not self._stop_event.is_set():
+            try:
+                self._connect()
+                backoff = RECONNECT_MIN
+                self._watch()
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    console.print(
+                        f'[yellow]WebSocket de mercado desconectado: {e}'
+                        + '[/yellow]'
+                    )
+            finally:
+                self._set_connected(False)
+                self._close_socket()
+
+            if self._stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, RECONNECT_MAX)
+
+    def _connect(self):
+        self._disconnected.clear()
+        socket = phxsocket.Client(self.url, {})
+        # O heartbeat próprio (com resposta) é feito em _watch
+        socket.heartbeat_interval = self.heartbeat_interval
+        socket.on_close = lambda _socket: self._disconnected.set()
+        socket.on_error = lambda _socket, _error: self._disconnected.set()
+        self._socket = socket
+        socket.connect()
+
+        self._join(TICKER_TOPIC, 'price', self._on_price)
+        for market in sorted(self.orderbook_markets):
+            self._join(
+                f'orderbook:{market}',
+                'snapshot',
+                lambda payload, market=market: self.pubsub.publish(
+                    f'orderbook:{market}', payload
+                ),
+            )
+        self._set_connected(True)
+
+    def _join(self, topic: str, event: str, handler):
+        channel = self._socket.channel(topic, {})
+        channel.on(event, handler)
+        reply = self._socket.push(topic, ChannelEvents.JOIN, {}, reply=True)
+        if not reply.event.wait(JOIN_TIMEOUT):
+            raise TimeoutError(f'Sem resposta ao entrar em {topic}')
+        if (reply.message or {}).get('status') != 'ok':
+            raise ConnectionError(
+                f'Falha ao entrar em {topic}: {reply.message}'
+            )
+
+    def _watch(self):
+        """Envia heartbeats e retorna quando a conexão cair."""
+        while not self._stop_event.is_set():
+            if self._disconnected.wait(self.heartbeat_interval):
+                raise ConnectionError('conexão encerrada pelo servidor')
+            reply = self._socket.push(
+                'phoenix', ChannelEvents.HEARTBEAT, {}, reply=True
+            )
+            if not reply.event.wait(HEARTBEAT_TIMEOUT):
+                raise TimeoutError('heartbeat sem resposta')
+
+    def _close_socket(self):
+        socket, self._socket = self._socket, None
+        if socket is not None:
+            try:
+                socket.close()
+            except Exception:
+                # Conexão já encerrada (SocketClosedError)
+                pass
+
+    def _on_price(self, payload):
+        for ticker in _ticker_entries(payload):
+            self.pubsub.publish(f'ticker:{ticker["market"]}', ticker)
+
+
+_stream_lock = threading.Lock()
+_stream: MarketDataStream | None = None
+
+
+def get_stream() -> MarketDataStream:
+    """Instância única do stream de mercado no processo."""
+    global _stream  # noqa: PLW0603
+    with _stream_lock:
+        if _stream is None:
+            _stream = MarketDataStream()
+        return _stream
+
+
+if __name__ == '__main__':
+    stream = get_stream()
+    stream.pubsub.subscribe('ticker:BTC-BRL', console.print)
+    stream.pubsub.subscribe(STATUS_TOPIC, console.print)
+    stream.start(orderbook_markets=['BTC-BRL'])
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stream.stop()
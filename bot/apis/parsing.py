@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from bot.logs.config_log import console
+from bot.models.models import (
+    BinanceKlines,
+    BitPrecoHistory,
+    KlineData,
+    PriceData,
+)
+from segredos import DEGUG
+
+# Validação linha a linha com pydantic (lenta), ativada no modo debug
+STRICT_PARSING = str(DEGUG).lower() in {'1', 'true', 'yes'}
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+KLINE_COLUMNS = [
+    'timestamp',
+    'open',
+    'high',
+    'low',
+    'close',
+    'volume',
+    'kline_close_time',
+    'quote_asset_volume',
+    'number_of_trades',
+    'taker_buy_base_volume',
+    'taker_buy_quote_volume',
+]
+
+
+class CandleValidationError(ValueError):
+    """Resposta sem as colunas esperadas dos candles."""
+
+
+def validate_candles(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validação do lote inteiro de uma vez: colunas presentes, preços finitos
+    e positivos, volume não negativo e high >= low. Os candles inválidos
+    são descartados (e contados no log); só a falta de colunas levanta
+    CandleValidationError.
+    """
+    missing = {'timestamp', *PRICE_COLUMNS} - set(df.columns)
+    if missing:
+        raise CandleValidationError(
+            f'Colunas ausentes nos candles: {sorted(missing)}'
+        )
+    if df.empty:
+        return df
+
+    prices = df[['open', 'high', 'low', 'close']].to_numpy(dtype=float)
+    volume = df['volume'].to_numpy(dtype=float)
+    valid = (
+        np.isfinite(prices).all(axis=1)
+        & (prices > 0).all(axis=1)
+        & np.isfinite(volume)
+        & (volume >= 0)
+        & (prices[:, 1] >= prices[:, 2])
+        & df['timestamp'].notna().to_numpy()
+    )
+    if valid.all():
+        return df
+    console.print(
+        f'[yellow]{int((~valid).sum())} de {len(df)} candles inválidos '
+        + 'descartados (preço, volume, high < low ou timestamp)[/yellow]'
+    )
+    return df[valid].reset_index(drop=True)
+
+
+def parse_bitpreco_history(
+    data: dict,
+    symbol: str = 'BTC_BRL',
+    resolution: str = '1',
+    strict: bool | None = None,
+    validate: bool = True,
+) -> pd.DataFrame:
+    """
+    Converte a resposta t/o/c/h/l/v do tradingview da BitPreço em
+    DataFrame, com colunas float64 montadas direto dos arrays.
+
+    Args:
+        data: JSON da resposta
+        symbol: Par no formato BTC_BRL
+        resolution: Resolução dos candles
+        strict: Se True, valida cada candle com os modelos pydantic
+            (Decimal por linha). Padrão: STRICT_PARSING
+        validate: Valida o lote inteiro com validate_candles
+    """
+    if strict is None:
+        strict = STRICT_PARSING
+
+    if strict:
+        price_data = [
+            PriceData(
+                timestamp=pd.Timestamp(t, unit='s', tz='UTC').to_pydatetime(),
+                open=str(o),
+                close=str(c),
+                high=str(h),
+                low=str(l),
+                volume=str(v),
+            )
+            for t, o, c, h, l, v in zip(  # noqa: E741
+                data['t'],
+                data['o'],
+                data['c'],
+                data['h'],
+                data['l'],
+                data['v'],
+            )
+        ]
+        history = BitPrecoHistory(
+            data=price_data, symbol=symbol, resolution=resolution
+        )
+        df = pd.DataFrame([p.model_dump() for p in history.data])
+        for col in PRICE_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('float64')
+        return df
+
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(
+            np.asarray(data['t'], dtype='int64'), unit='s', utc=True
+        ),
+        'open': np.asarray(data['o'], dtype='float64'),
+        'high': np.asarray(data['h'], dtype='float64'),
+        'low': np.asarray(data['l'], dtype='float64'),
+        'close': np.asarray(data['c'], dtype='float64'),
+        'volume': np.asarray(data['v'], dtype='float64'),
+    })
+    return validate_candles(df) if validate else df
+
+
+def parse_binance_klines(
+    klines: list,
+    symbol: str = 'BTCBRL',
+    interval: str = '1m',
+    strict: bool | None = None,
+    validate: bool = True,
+) -> pd.DataFrame:
+    """
+    Converte a resposta de /api/v3/klines da Binance em DataFrame, com
+    colunas float64/int64 montadas direto dos arrays.
+    """
+    if strict is None:
+        strict = STRICT_PARSING
+
+    if strict:
+        klines_data = [
+            KlineData(
+                timestamp=pd.Timestamp(k[0], unit='ms', tz='UTC'),
+                open=str(k[1]),
+                high=str(k[2]),
+                low=str(k[3]),
+                close=str(k[4]),
+                volume=str(k[5]),
+                kline_close_time=pd.Timestamp(k[6], unit='ms', tz='UTC'),
+                quote_asset_volume=str(k[7]),
+                number_of_trades=int(k[8]),
+                taker_buy_base_volume=str(k[9]),
+                taker_buy_quote_volume=str(k[10]),
+            )
+            for k in klines
+        ]
+        binance_klines = BinanceKlines(
+            data=klines_data, symbol=symbol, interval=interval
+        )
+        df = pd.DataFrame([k.model_dump() for k in binance_klines.data])
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].astype('float64')
+        return df
+
+    if not klines:
+        return pd.DataFrame(columns=KLINE_COLUMNS)
+
+    # As 11 primeiras colunas da resposta (a 12ª é ignorada pela API)
+    raw = np.array([k[:11] for k in klines], dtype=object)
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(
+            raw[:, 0].astype('int64'), unit='ms', utc=True
+        ),
+        'open': raw[:, 1].astype('float64'),
+        'high': raw[:, 2].astype('float64'),
+        'low': raw[:, 3].astype('float64'),
+        'close': raw[:, 4].astype('float64'),
+        'volume': raw[:, 5].astype('float64'),
+        'kline_close_time': pd.to_datetime(
+            raw[:, 6].astype('int64'), unit='ms', utc=True
+        ),
+        'quote_asset_volume': raw[:, 7].astype('float64'),
+        'number_of_trades': raw[:, 8].astype('int64'),
+        'taker_buy_base_volume': raw[:, 9].astype('float64'),
+        'taker_buy_quote_volume': raw[:, 10].astype('float64'),
+    })
+    return validate_candles(df) if validate else df
@@ -0,0 +1,566 @@
+import itertools
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from bot.estrategias.TripleIndicatoStrategy import (
+    ATR,
+    MACD,
+    RSI,
+    SMA,
+    STOCH,
+    TripleIndicator,
+)
+from bot.logs.config_log import console
+from bot.otimizador import RESULT_METRICS, SharedOHLCV
+
+# Tamanho das ordens sem `size` no backtesting (quase todo o patrimônio)
+_FULL_EQUITY = 1 - sys.float_info.epsilon
+
+_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _annualization(index) -> tuple[float, np.ndarray | None]:
+    """Dias de negociação por ano e posição da última barra de cada
+    período (dia, semana...), como no backtesting (compute_stats)."""
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:  # noqa: PLR2004
+        return math.nan, None
+    period = pd.Series(index[-100:]).diff().dropna().median()
+    freq_days = period.days
+    have_weekends = (
+        index.dayofweek.to_series().between(5, 6).mean() > 2 / 7 * 0.6
+    )
+    annual_trading_days = {7: 52, 31: 12, 365: 1}.get(
+        freq_days, 365 if have_weekends else 252
+    )
+    freq = {7: 'W', 31: 'ME', 365: 'YE'}.get(freq_days, 'D')
+    positions = pd.Series(np.arange(len(index)), index=index)
+    period_last = (
+        positions.resample(freq).last().dropna().astype(np.intp).values
+    )
+    return annual_trading_days, period_last
+
+
+def prepare_data(data: pd.DataFrame) -> dict:
+    """
+    Arrays dos candles e posições de fechamento de cada dia, calculados
+    uma vez por conjunto de dados e reutilizados em todas as combinações
+    de parâmetros. Os arrays são somente leitura: o cache de indicadores
+    os reconhece sem reler o conteúdo.
+    """
+    prepared = {'index': data.index, 'size': len(data)}
+    for col in _OHLCV:
+        values = np.array(data[col], dtype=np.float64)
+        values.setflags(write=False)
+        prepared[col] = values
+    prepared['annual_trading_days'], prepared['period_last'] = _annualization(
+        data.index
+    )
+    return prepared
+
+
+def window(prepared: dict, start: int, stop: int) -> dict:
+    """Barras [start, stop) de `prepared` (visões, sem cópia), para
+    simular um trecho com sinais calculados sobre o histórico todo."""
+    sliced = {col: prepared[col][start:stop] for col in _OHLCV}
+    sliced['index'] = prepared['index'][start:stop]
+    sliced['size'] = len(sliced['index'])
+    sliced['annual_trading_days'], sliced['period_last'] = _annualization(
+        sliced['index']
+    )
+    return sliced
+
+
+def next_true(mask: np.ndarray) -> np.ndarray:
+    """Para cada barra, a primeira barra (ela ou seguinte) com `mask`
+    verdadeiro; len(mask) quando não houver."""
+    size = len(mask)
+    positions = np.where(mask, np.arange(size), size)
+    return np.minimum.accumulate(positions[::-1])[::-1]
+
+
+def warmup_start(indicators: list[np.ndarray]) -> int:
+    """Primeira barra simulada, como no backtesting: 1 + o aquecimento
+    do indicador que demora mais a ter valores."""
+    nbars = max(
+        (int(np.isnan(values).argmin()) for values in indicators), default=0
+    )
+    return 1 + nbars
+
+
+def simulate_votes(  # noqa: PLR0913, PLR0914, PLR0915, PLR0917
+    prepared: dict,
+    long_entry: np.ndarray,
+    short_entry: np.ndarray,
+    long_exit: np.ndarray,
+    short_exit: np.ndarray,
+    start: int,
+    cash: float = 10000,
+    commission: float = 0.0,
+) -> tuple[np.ndarray, dict]:
+    """
+    Simulação de uma estratégia de votos com as regras do backtesting
+    (exclusive_orders=True, ordens a mercado sem tamanho, sem spread):
+
+    - sem posição, um sinal na barra i vira uma ordem executada na
+      abertura de i + 1 (a venda tem prioridade sobre a compra);
+    - com posição, o sinal de saída na barra j fecha a operação na
+      abertura de j + 1;
+    - ordens da última barra não são executadas e a operação aberta no
+      fim fica fora da lista de operações (mas no patrimônio).
+
+    O laço em Python só passa pelas operações, com contas escalares: as
+    barras entre elas são puladas com os índices do próximo sinal, e o
+    patrimônio é montado depois, de uma vez, a partir dos trechos com e
+    sem posição.
+
+    Returns:
+        (patrimônio por barra, operações fechadas em arrays)
+    """
+    opens = prepared['Open']
+    closes = prepared['Close']
+    size_bars = prepared['size']
+
+    # Acesso escalar (item) aos arrays: o laço não cria escalares numpy
+    entry_at = next_true(long_entry | short_entry).item
+    exit_at = {1: next_true(long_exit).item, -1: next_true(short_exit).item}
+    is_short = short_entry.item
+    open_at = opens.item
+
+    # Trechos: barra inicial, caixa, tamanho e preço de entrada da posição
+    segments = [(0, cash, 0, 0.0)]
+    closed = []
+    bar = start
+    while bar < size_bars:
+        signal = entry_at(bar)
+        if signal >= size_bars - 1:
+            break
+        fill = signal + 1
+        side = -1 if is_short(signal) else 1
+
+        # Tamanho como no _Broker._process_orders
+        price = open_at(fill)
+        price_plus_commission = (
+            price + (_FULL_EQUITY * price * commission) / _FULL_EQUITY
+        )
+        units = int((max(0.0, cash) * _FULL_EQUITY) // price_plus_commission)
+        if not units:
+            bar = fill
+            continue
+        size = side * units
+        entry_commission = abs(size) * price * commission
+        cash -= entry_commission
+        segments.append((fill, cash, size, price))
+
+        exit_signal = exit_at[side](fill)
+        if exit_signal >= size_bars - 1:
+            # Operação aberta no fim dos dados
+            break
+        bar = exit_signal + 1
+        exit_price = open_at(bar)
+        exit_commission = abs(size) * exit_price * commission
+        cash += size * (exit_price - price) - exit_commission
+        segments.append((bar, cash, 0, 0.0))
+        closed.append((
+            size,
+            fill,
+            bar,
+            price,
+            exit_price,
+            entry_commission + exit_commission,
+        ))
+
+    starts, cash_levels, sizes, prices = map(np.array, zip(*segments))
+    lengths = np.diff(np.r_[starts, size_bars])
+    size_per_bar = np.repeat(sizes, lengths)
+    equity = np.repeat(cash_levels, lengths) + (
+        closes * size_per_bar - size_per_bar * np.repeat(prices, lengths)
+    )
+
+    broke = np.flatnonzero(equity[start:] <= 0)
+    if len(broke):
+        # Sem patrimônio: a posição fecha no fechamento da barra e a
+        # simulação termina (as operações seguintes não acontecem)
+        bar_out = start + int(broke[0])
+        closed = [trade for trade in closed if trade[2] <= bar_out]
+        segment = int(np.searchsorted(starts, bar_out, side='right')) - 1
+        fill, size, price = starts[segment], sizes[segment], prices[segment]
+        if size:
+            exit_price = float(closes[bar_out])
+            closed.append((
+                int(size),
+                int(fill),
+                bar_out,
+                float(price),
+                exit_price,
+                abs(size) * price * commission
+                + abs(size) * exit_price * commission,
+            ))
+        equity[bar_out:] = 0
+
+    columns = (
+        'size',
+        'entry_bar',
+        'exit_bar',
+        'entry_price',
+        'exit_price',
+        'commission',
+    )
+    values = zip(*closed) if closed else [()] * len(columns)
+    return equity, {
+        key: np.array(column) for key, column in zip(columns, values)
+    }
+
+
+def vote_metrics(prepared: dict, equity: np.ndarray, trades: dict) -> dict:
+    """Métricas de RESULT_METRICS com as fórmulas do backtesting."""
+    metrics = {}
+    metrics['Return [%]'] = (equity[-1] - equity[0]) / equity[0] * 100
+
+    annual_days = prepared['annual_trading_days']
+    if prepared['period_last'] is not None:
+        period_equity = equity[prepared['period_last']]
+        returns = period_equity[1:] / period_equity[:-1] - 1
+    else:
+        returns = np.array([])
+    returns = returns[~np.isnan(returns)]
+    gross = returns + 1
+    if len(returns) and np.all(gross > 0):
+        gmean = math.exp(np.log(gross).sum() / len(returns)) - 1
+    else:
+        gmean = 0.0
+    annual_return = (1 + gmean) ** annual_days - 1
+    variance = returns.var(ddof=1) if len(returns) > 1 else math.nan
+    volatility = (
+        math.sqrt(
+            (variance + (1 + gmean) ** 2) ** annual_days
+            - (1 + gmean) ** (2 * annual_days)
+        )
+        * 100
+    )
+    metrics['Return (Ann.) [%]'] = annual_return * 100
+    metrics['Sharpe Ratio'] = (
+        metrics['Return (Ann.) [%]'] / volatility if volatility else math.nan
+    )
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+    metrics['Max. Drawdown [%]'] = -np.nan_to_num(np.nanmax(drawdown)) * 100
+
+    count = len(trades['size'])
+    size = trades['size']
+    pnl = (
+        size * (trades['exit_price'] - trades['entry_price'])
+        - trades['commission']
+    )
+    pnl_pct = np.sign(size) * (
+        trades['exit_price'] / trades['entry_price'] - 1
+    ) - trades['commission'] / (np.abs(size) * trades['entry_price'])
+    losses = abs(pnl_pct[pnl_pct < 0].sum())
+    metrics['# Trades'] = count
+    metrics['Win Rate [%]'] = (pnl > 0).mean() * 100 if count else math.nan
+    metrics['Profit Factor'] = (
+        pnl_pct[pnl_pct > 0].sum() / losses if losses else math.nan
+    )
+    return {metric: metrics[metric] for metric in RESULT_METRICS}
+
+
+def triple_indicator_signals(prepared: dict, **params) -> dict:  # noqa: PLR0914
+    """
+    Sinais da TripleIndicator (mesmas regras de TripleIndicator.next)
+    calculados para todas as barras de uma vez.
+    """
+    p = {
+        name: getattr(TripleIndicator, name)
+        for name in (
+            'short_sma',
+            'long_sma',
+            'sma_200',
+            'rsi',
+            'rsi_oversold',
+            'rsi_overbought',
+            'macd_fastperiod',
+            'macd_slowperiod',
+            'macd_signalperiod',
+            'stoch_k_period',
+            'stoch_d_period',
+            'stoch_slowk_period',
+            'volume_sma_period',
+            'atr_period',
+            'indicators_validation',
+        )
+    }
+    p.update(params)
+    close, high, low = prepared['Close'], prepared['High'], prepared['Low']
+    volume = prepared['Volume']
+
+    sma_fast = SMA(close, p['short_sma'])
+    sma_slow = SMA(close, p['long_sma'])
+    sma_200 = SMA(close, p['sma_200'])
+    rsi = RSI(close, p['rsi'])
+    macd, macd_signal, _macd_histogram = MACD(
+        close,
+        fastperiod=p['macd_fastperiod'],
+        slowperiod=p['macd_slowperiod'],
+        signalperiod=p['macd_signalperiod'],
+    )
+    stoch_k, stoch_d = STOCH(
+        high,
+        low,
+        close,
+        fastk_period=p['stoch_k_period'],
+        slowk_period=p['stoch_slowk_period'],
+        slowd_period=p['stoch_d_period'],
+    )
+    volume_sma = SMA(volume, p['volume_sma_period'])
+    atr = ATR(high, low, close, timeperiod=p['atr_period'])
+
+    with np.errstate(invalid='ignore'):
+        trend_up = sma_fast > sma_slow
+        trend_down = sma_fast < sma_slow
+        rsi_oversold = rsi < p['rsi_oversold']
+        rsi_overbought = rsi > p['rsi_overbought']
+        macd_up = macd > macd_signal
+        macd_down = macd < macd_signal
+        stoch_up = stoch_k > stoch_d
+        stoch_down = stoch_k < stoch_d
+        volume_increase = volume > volume_sma
+
+    buy_votes = trend_up.astype(np.int8) + rsi_oversold + macd_up + stoch_up
+    sell_votes = (
+        trend_down.astype(np.int8) + rsi_overbought + macd_down + stoch_down
+    )
+    validation = p['indicators_validation']
+    short_entry = (sell_votes >= validation) & volume_increase
+    return {
+        # A venda enviada depois da compra cancela a compra
+        'long_entry': (buy_votes >= validation)
+        & volume_increase
+        & ~short_entry,
+        'short_entry': short_entry,
+        'long_exit': trend_down & (rsi_overbought | macd_down),
+        'short_exit': trend_up & (rsi_oversold | macd_up),
+        'start': warmup_start([
+            sma_fast,
+            sma_slow,
+            sma_200,
+            rsi,
+            macd,
+            macd_signal,
+            stoch_k,
+            stoch_d,
+            volume_sma,
+            atr,
+        ]),
+    }
+
+
+def backtest_triple_indicator(
+    prepared: dict,
+    cash: float = 10000,
+    commission: float = 0.0,
+    exclusive_orders: bool = True,
+    full: bool = False,
+    **params,
+):
+    """
+    Backtest vetorizado da TripleIndicator com `prepared` de
+    prepare_data. Aceita os mesmos parâmetros do Backtest usados no
+    projeto (cash, commission, exclusive_orders=True).
+
+    Returns:
+        Métricas de RESULT_METRICS; com full=True, também o patrimônio
+        e as operações: (métricas, patrimônio, operações)
+    """
+    if not exclusive_orders:
+        raise ValueError(
+            'O backtest vetorizado só simula exclusive_orders=True'
+        )
+    signals = triple_indicator_signals(prepared, **params)
+    equity, trades = simulate_votes(
+        prepared,
+        signals['long_entry'],
+        signals['short_entry'],
+        signals['long_exit'],
+        signals['short_exit'],
+        signals['start'],
+        cash=cash,
+        commission=commission,
+    )
+    metrics = vote_metrics(prepared, equity, trades)
+    if full:
+        return metrics, equity, trades
+    return metrics
+
+
+# Combinações enviadas a cada tarefa do pool na triagem
+SCREEN_CHUNK = 64
+
+# Estado de cada processo da triagem, criado uma vez em _init_screen
+_screen: dict = {}
+
+
+def _init_screen(spec: dict, backtest_kwargs: dict):
+    data, blocks = SharedOHLCV.attach(spec)
+    _screen['blocks'] = blocks
+    _screen['prepared'] = prepare_data(data)
+    _screen['backtest_kwargs'] = backtest_kwargs
+
+
+def _screen_chunk(combinations: list[dict]) -> list[dict]:
+    return [
+        {
+            **params,
+            **backtest_triple_indicator(
+                _screen['prepared'], **_screen['backtest_kwargs'], **params
+            ),
+        }
+        for params in combinations
+    ]
+
+
+def screen_triple_indicator(  # noqa: PLR0913
+    data: pd.DataFrame,
+    space: dict,
+    constraint: Callable[[dict], bool] | None = None,
+    maximize: str = 'Sharpe Ratio',
+    max_workers: int | None = 1,
+    **backtest_kwargs,
+) -> pd.DataFrame:
+    """
+    Triagem de todas as combinações de `space` com o backtest
+    vetorizado. Com max_workers diferente de 1, as combinações são
+    divididas em lotes entre processos, com os candles em memória
+    compartilhada (None: um processo por núcleo). Os melhores
+    candidatos podem ser conferidos depois com o backtesting
+    (optimize_parallel).
+
+    Returns:
+        DataFrame com parâmetros e métricas, do melhor para o pior
+    """
+    names = list(space)
+    combinations = [
+        params
+        for params in (
+            dict(zip(names, values))
+            for values in itertools.product(*space.values())
+        )
+        if constraint is None or constraint(params)
+    ]
+    started = time.perf_counter()
+    if max_workers == 1:
+        prepared = prepare_data(data)
+        rows = [
+            {
+                **params,
+                **backtest_triple_indicator(
+                    prepared, **backtest_kwargs, **params
+                ),
+            }
+            for params in combinations
+        ]
+    else:
+        chunks = [
+            combinations[i : i + SCREEN_CHUNK]
+            for i in range(0, len(combinations), SCREEN_CHUNK)
+        ]
+        with (
+            SharedOHLCV(data) as shared,
+            ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_screen,
+                initargs=(shared.spec, backtest_kwargs),
+            ) as executor,
+        ):
+            rows = [
+                row
+                for chunk in executor.map(_screen_chunk, chunks)
+                for row in chunk
+            ]
+    elapsed = time.perf_counter() - started
+
+    console.print(
+        f'[green]{len(rows)} combinações em {elapsed:.1f}s '
+        + f'({len(rows) / (elapsed or 1):.0f}/s)[/green]'
+    )
+    results = pd.DataFrame(rows, columns=[*names, *RESULT_METRICS])
+    return results.sort_values(
+        maximize, ascending=False, na_position='last'
+    ).reset_index(drop=True)
+
+
+def cross_check(data: pd.DataFrame, **backtest_kwargs) -> pd.DataFrame:
+    """
+    Compara o backtest vetorizado com o backtesting nos mesmos dados e
+    parâmetros (os da estratégia passados em backtest_kwargs).
+
+    Returns:
+        DataFrame com as métricas dos dois motores e a diferença
+    """
+    from backtesting import Backtest  # noqa: PLC0415
+
+    engine = {'exclusive_orders': True}
+    engine.update(
+        (key, backtest_kwargs.pop(key))
+        for key in ('cash', 'commission', 'exclusive_orders')
+        if key in backtest_kwargs
+    )
+    stats = Backtest(data, TripleIndicator, **engine).run(**backtest_kwargs)
+    metrics = backtest_triple_indicator(
+        prepare_data(data), **engine, **backtest_kwargs
+    )
+    comparison = pd.DataFrame(
+        {
+            'backtesting': [float(stats[metric]) for metric in RESULT_METRICS],
+            'vetorizado': [
+                float(metrics[metric]) for metric in RESULT_METRICS
+            ],
+        },
+        index=RESULT_METRICS,
+    )
+    comparison['diferenca'] = (
+        comparison['vetorizado'] - comparison['backtesting']
+    )
+    return comparison
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(7)
+    size = 20_000
+    close = 300000 * np.exp(np.cumsum(rng.normal(0, 0.002, size)))
+    candles = pd.DataFrame(
+        {
+            'Open': np.r_[close[0], close[:-1]],
+            'High': close * (1 + rng.random(size) * 0.002),
+            'Low': close * (1 - rng.random(size) * 0.002),
+            'Close': close,
+            'Volume': rng.random(size),
+        },
+        index=pd.date_range('2024-01-01', periods=size, freq='5min'),
+    )
+    console.print(
+        cross_check(
+            candles,
+            cash=10000000,
+            commission=0.002,
+            indicators_validation=2,
+        )
+    )
+    screen_triple_indicator(
+        candles,
+        {
+            'indicators_validation': [1, 2, 3, 4],
+            'rsi_oversold': [20, 30, 40],
+            'rsi_overbought': [60, 70, 80],
+            'rsi': [14, 16, 18],
+            'volume_sma_period': [10, 15, 20],
+        },
+        max_workers=None,
+        cash=10000000,
+        commission=0.002,
+    )
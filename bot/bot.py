@@ -1,7 +1,13 @@
+import asyncio
+import contextlib
+import multiprocessing
 import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict
 
+import httpx
 from rich.console import Group
 from rich.live import Live
 from rich.panel import Panel
@@ -14,31 +20,43 @@ from rich.progress import (
 )
 
 from bot.analizador_de_mercado import analyze_market
-from bot.apis.api_bitpreco import Balance, ExecutedOrders, Ticker
-from bot.historico_precos import get_price_history
-from bot.indicadores.calcular_indicadores import calculate_indicators
-from bot.indicadores.gerar_sinais_compra_venda import generate_signals
+from bot.apis.api_bitpreco import AsyncExecutedOrders
+from bot.apis.http_client import aclose_clients
+from bot.apis.market_snapshot import MarketSnapshot
+from bot.apis.market_stream import get_stream
+from bot.historico_precos import LiveHistory
+from bot.indicadores.pipeline_sinais import compute_signals
 from bot.logs.config_log import console
 from bot.models.coin_pair import CoinPair
 from bot.parametros import (
+    INTERVALO_MINIMO_CICLO,
     INTERVALO_TENTATIVAS,
     NUMERO_MAXIMO_TENTATIVAS,
+    PRAZO_CICLO,
+    PROCESSOS_INDICADORES,
     SIGNAL_BUY,  # noqa: F401
     SIGNAL_SELL,  # noqa: F401
     STOP_LOSS,
+    STREAM_MAX_AGE,
     THREAD_LOCK,
+    TTL_SNAPSHOT,
+    USAR_STREAM,
     profitability,
     risk_per_trade,
 )
 from bot.validador_trade import validate_trade_conditions
-from compartilhado import get_coinpairs, get_interval
-from db.duckdb_csv import save_to_csv_duckdb
-from db.json_csv import (
-    save_balance_to_csv,
-    save_orders_to_csv,
-    save_price_to_csv,
+from compartilhado import (
+    coinpair_config,
+    coinpairs_from_str,
+    get_coinpairs,
+    get_interval,
+    watch_config,
 )
-from segredos import CAMINHO
+from db.writer import get_writer
+
+
+async def _value(value):
+    return value
 
 
 class TradingBot:
@@ -50,63 +68,66 @@ class TradingBot:
         :type strategy_class: Type[TradingStrategy]
 
         _stop_event: Evento para parar o bot de trading.
-        thread_lock: Lock para controle de threads.
-        threads: Lista de threads em execução.
+        cycle_lock: Serializa os ciclos dos pares quando THREAD_LOCK=True.
+        pair_tasks: Tasks do agendador asyncio (uma por par de moedas).
+        pools: Processos de indicadores; pair_pools: processo de cada par.
+        snapshot: Saldo e tickers compartilhados entre os pares a cada tick.
+        history: Janela de candles de tamanho fixo de cada par (modo ao vivo).
+        writer: Gravação em segundo plano (tickers, ordens, saldo e candles).
         progress_bars: Dict de barras de progresso para cada par de moedas.
         tasks: Dicionário de tarefas associadas a cada barra de progresso.
+        stream: Stream de mercado via WebSocket (tickers em tempo real).
+        wake_events: Eventos que acordam o loop de cada par a cada novo preço.
+        stream_unsubscribes: Inscrições no stream de cada par.
+        rest_polls: Último poll REST de cada par (instante, saldo e ordens),
+        reaproveitado pelos ciclos acordados pelo stream.
         strategy_class: Classe da estratégia a ser utilizada.
         strategy: Instância da estratégia a ser utilizada.
         """
         self._stop_event = threading.Event()
-        self.thread_lock = threading.Lock()
-        self.threads = []
+        self.cycle_lock = contextlib.nullcontext()
+        self.pair_tasks: Dict[str, asyncio.Task] = {}
+        self.pools: list[ProcessPoolExecutor] = []
+        self.pair_pools: Dict[str, ProcessPoolExecutor] = {}
+        self.snapshot: MarketSnapshot | None = None
+        self.history = LiveHistory()
+        self.writer = get_writer()
         self.progress_bars: Dict[str, Progress] = {}
         self.tasks: Dict[str, int] = {}
+        self.stream = get_stream() if USAR_STREAM else None
+        self.wake_events: Dict[str, asyncio.Event] = {}
+        self.stream_unsubscribes: Dict[str, list] = {}
+        self.rest_polls: Dict[str, tuple[float, dict, list]] = {}
+        self.live = None
 
     # Barra de progresso para cada par de moedas
-    def create_progress_group(self):
+    def create_progress_group(self, coinpairs: list[CoinPair] | None = None):
         """Cria grupo de barras de progresso para cada par de moedas"""
         progress_group = []
-        for coinpair in get_coinpairs():
-            progress = Progress(
-                SpinnerColumn(),
-                TextColumn(
-                    f'[blue]{coinpair.bitpreco_format}[/blue] '
-                    + '{task.description}'
-                ),
-                BarColumn(),
-                TimeElapsedColumn(),
-            )
-            task = progress.add_task('Iniciando...', total=100)
-            self.progress_bars[coinpair.bitpreco_format] = progress
-            self.tasks[coinpair.bitpreco_format] = task
+        for coinpair in coinpairs or get_coinpairs():
+            # Pares já em execução mantêm a barra atual
+            if coinpair.bitpreco_format not in self.progress_bars:
+                progress = Progress(
+                    SpinnerColumn(),
+                    TextColumn(
+                        f'[blue]{coinpair.bitpreco_format}[/blue] '
+                        + '{task.description}'
+                    ),
+                    BarColumn(),
+                    TimeElapsedColumn(),
+                )
+                task = progress.add_task('Iniciando...', total=100)
+                self.progress_bars[coinpair.bitpreco_format] = progress
+                self.tasks[coinpair.bitpreco_format] = task
             progress_group.append(
-                Panel(progress, title=coinpair.bitpreco_format)
+                Panel(
+                    self.progress_bars[coinpair.bitpreco_format],
+                    title=coinpair.bitpreco_format,
+                )
             )
 
         return Group(*progress_group)
 
-    # Decorador para retry em caso de erro de conexão como timeout
-    @classmethod
-    def retry_on_connection_error(cls, func):
-        def wrapper(*args, **kwargs):
-            for attempt in range(NUMERO_MAXIMO_TENTATIVAS):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    console.print_exception()
-                    if 'timed out' in str(e) or 'ConnectionError' in str(e):
-                        if attempt < NUMERO_MAXIMO_TENTATIVAS - 1:
-                            console.print(
-                                f'[bold magenta]Tentativa {attempt + 1}'
-                                + f' falhou: {str(e)}[/bold magenta]'
-                            )
-                            time.sleep(INTERVALO_TENTATIVAS * (2**attempt))
-                            continue
-                    raise
-
-        return wrapper
-
     def adjust_risk(risk_factor):
         adjusted_risk = risk_per_trade * risk_factor
         return min(adjusted_risk, 0.2)
@@ -198,7 +219,9 @@ class TradingBot:
                 )
 
     # Função principal que executa o ciclo de trading
-    def execute_trading_cycle(self, coinpair: CoinPair) -> None:
+    async def execute_trading_cycle(
+        self, coinpair: CoinPair, indicator_pool: ProcessPoolExecutor
+    ) -> None:
         """
         Executa um ciclo completo de negociação:
         1. Obtém dados de mercado (ticker, saldo, ordens)
@@ -206,26 +229,62 @@ class TradingBot:
         3. Obtém histórico de preços e calcula indicadores
         4. Gera sinais de compra/venda
         5. Executa operações com base nos sinais
+
+        As requisições rodam concorrentes no event loop, o trabalho de CPU
+        (indicadores e sinais) no processo de indicadores do par e as
+        chamadas bloqueantes em threads.
+
+        Os pollings REST (saldo, ordens e candles) acontecem no máximo uma
+        vez por get_interval() por par. Um ciclo acordado pelo stream antes
+        disso só reavalia a janela com sinais do último ciclo com o preço
+        do stream (take profit, stop loss); sem stream recente, o REST é o
+        fallback.
         """
-        progress = self.progress_bars[coinpair.bitpreco_format]
-        task = self.tasks[coinpair.bitpreco_format]
+        market = coinpair.bitpreco_format
+        progress = self.progress_bars[market]
+        task = self.tasks[market]
+        loop = asyncio.get_running_loop()
 
         try:
-            # 1. Obter dados de mercado
-            ticker_json = Ticker(coinpair).json()
-            save_price_to_csv(ticker_json)
+            ticker_json = self.streamed_ticker(coinpair)
+            polled = self.rest_polls.get(market)
+            window = self.history.latest(coinpair)
+            streamed_cycle = (
+                ticker_json is not None
+                and polled is not None
+                and window is not None
+                and time.monotonic() - polled[0] < get_interval()
+            )
+            if streamed_cycle:
+                # Saldo e ordens do último poll REST do par
+                _, balance, executed_orders = polled
+            else:
+                # 1. Obter dados de mercado (requisições concorrentes). O
+                # ticker vem do WebSocket quando recente; senão, saldo e
+                # ticker vêm do snapshot compartilhado entre os pares
+                ticker_json, balance, orders_response = await asyncio.gather(
+                    self.snapshot.ticker(market)
+                    if ticker_json is None
+                    else _value(ticker_json),
+                    self.snapshot.balance(),
+                    AsyncExecutedOrders(market),
+                )
+                executed_orders = orders_response.json()
+                self.rest_polls[market] = (
+                    time.monotonic(),
+                    balance,
+                    executed_orders,
+                )
+                # Gravações vão para o escritor em segundo plano
+                self.writer.save_price(ticker_json)
+                self.writer.save_orders(executed_orders, coinpair)
+
             progress.update(
                 task,
                 description=f'Preço atual: {ticker_json['last']}',
                 advance=10,
             )
-
-            balance = Balance().json()
-            save_balance_to_csv(balance)
             progress.update(task, description='Saldo atualizado', advance=10)
-
-            executed_orders = ExecutedOrders(coinpair.bitpreco_format).json()
-            save_orders_to_csv(executed_orders, coinpair)
             progress.update(task, description='Ordens atualizadas', advance=10)
 
             # 2. Validar condições para trade
@@ -240,8 +299,27 @@ class TradingBot:
                 advance=10,
             )
 
-            # 3. Obter histórico e calcular indicadores
-            df = get_price_history(
+            if streamed_cycle:
+                # Candles e sinais sem mudança desde o último poll: só o
+                # preço do stream é reavaliado
+                traded = await asyncio.to_thread(
+                    self.act_on_signals,
+                    coinpair,
+                    window,
+                    ticker_json,
+                    balance,
+                    executed_orders,
+                    save=False,
+                )
+                self._after_cycle(market, traded)
+                progress.update(
+                    task, description='Preço do stream avaliado', advance=60
+                )
+                return
+
+            # 3. Obter a janela recente (I/O bloqueante em thread)
+            df = await asyncio.to_thread(
+                self.history.get,
                 coin_pair=coinpair,
                 progress=progress,
                 task=task,
@@ -255,113 +333,337 @@ class TradingBot:
                 console.print('Dados históricos não disponíveis')
                 return
 
-            df = calculate_indicators(df)
-            progress.update(
-                task,
-                description='Indicadores calculados',
-                advance=10,
+            # 4. Calcular indicadores e gerar sinais (processo separado)
+            df = await loop.run_in_executor(
+                indicator_pool,
+                compute_signals,
+                df,
+                coinpair.bitpreco_websocket,
             )
-
-            # 4. Gerar sinais de compra/venda
-            df = generate_signals(df)
             progress.update(
                 task,
-                description='Sinais de compra e venda gerados',
-                advance=10,
+                description='Indicadores e sinais calculados',
+                advance=20,
             )
 
             # 5. Analisar mercado e executar operações
-            trend, risk_factor = analyze_market(df)
-            console.clear()
-            console.log(
-                ':chart_with_upwards_trend: [bold cyan]'
-                + f'Tendência atual:[/bold cyan] {trend}, '
-                f'[bold cyan]Fator de risco:[/bold cyan] {risk_factor}'
+            traded = await asyncio.to_thread(
+                self.act_on_signals,
+                coinpair,
+                df,
+                ticker_json,
+                balance,
+                executed_orders,
             )
+            self._after_cycle(market, traded)
+            progress.update(task, description='Ciclo completo', advance=30)
 
-            adjusted_risk = ...
-            last_positon = df['position'].iloc[-1]
-            last_signal = df['signal'].iloc[-1]
-            last_price = ticker_json['last']
+        except Exception as e:
+            progress.update(task, description=f'[red]Erro: {str(e)}[/red]')
+            raise
 
-            brl_balance = balance.get('BRL', 0)
-            btc_balance = balance.get('BTC', 0)
+    def _after_cycle(self, market: str, traded: bool):
+        if traded:
+            # Saldo e ordens mudaram: o próximo ciclo faz o poll REST e
+            # busca um snapshot novo
+            self.snapshot.invalidate()
+            self.rest_polls.pop(market, None)
 
-            # Executa compra se tiver saldo e houver sinal de compra
-            if brl_balance > 0 and last_positon == 0 and last_signal == 1:
-                self.execute_buy(
-                    executed_orders,
-                    brl_balance,
-                    adjusted_risk,
-                    last_price,
-                    coinpair,
-                )
-                df.iloc[-1, df.columns.get_loc('position')] = 1
-            # Executa venda se tiver moeda e houver sinal de venda
-            elif btc_balance > 0 and last_positon == 1 and last_signal == -1:
-                self.execute_sell(
-                    executed_orders,
-                    coinpair,
-                    btc_balance,
-                    adjusted_risk,
-                    last_price,
-                )
-                df.iloc[-1, df.columns.get_loc('position')] = 0
-            else:
-                console.log(
-                    ':hourglass: [bold yellow]Nenhuma ação necessária '
-                    + 'no momento.[/bold yellow]'
-                )
+    def act_on_signals(  # noqa: PLR0913, PLR0917
+        self,
+        coinpair: CoinPair,
+        df,
+        ticker_json,
+        balance,
+        executed_orders,
+        save: bool = True,
+    ) -> bool:
+        """
+        Analisa o mercado, executa as operações e salva os candles (com
+        save=False, só se alguma ordem mudar a posição).
+        Retorna True se alguma ordem foi executada.
+        """
+        # 5. Analisar mercado e executar operações
+        trend, risk_factor = analyze_market(df)
+        console.clear()
+        console.log(
+            ':chart_with_upwards_trend: [bold cyan]'
+            + f'Tendência atual:[/bold cyan] {trend}, '
+            f'[bold cyan]Fator de risco:[/bold cyan] {risk_factor}'
+        )
+
+        adjusted_risk = ...
+        last_positon = df['position'].iloc[-1]
+        last_signal = df['signal'].iloc[-1]
+        last_price = ticker_json['last']
+
+        brl_balance = balance.get('BRL', 0)
+        btc_balance = balance.get('BTC', 0)
+        traded = False
+
+        # Executa compra se tiver saldo e houver sinal de compra
+        if brl_balance > 0 and last_positon == 0 and last_signal == 1:
+            self.execute_buy(
+                executed_orders,
+                brl_balance,
+                adjusted_risk,
+                last_price,
+                coinpair,
+            )
+            df.iloc[-1, df.columns.get_loc('position')] = 1
+            traded = True
+        # Executa venda se tiver moeda e houver sinal de venda
+        elif btc_balance > 0 and last_positon == 1 and last_signal == -1:
+            self.execute_sell(
+                executed_orders,
+                coinpair,
+                btc_balance,
+                adjusted_risk,
+                last_price,
+            )
+            df.iloc[-1, df.columns.get_loc('position')] = 0
+            traded = True
+        else:
+            console.log(
+                ':hourglass: [bold yellow]Nenhuma ação necessária '
+                + 'no momento.[/bold yellow]'
+            )
 
-            # Salvar os dados com indicadores e sinais
-            save_to_csv_duckdb(
+        # Salvar os candles novos com indicadores e sinais
+        if save or traded:
+            self.writer.save_candles(
                 df,
-                CAMINHO
-                + f'/{coinpair.bitpreco_websocket}_{coinpair.exchange.value}'
-                + '.csv',
-                # mode='append',
+                coinpair.bitpreco_websocket,
+                coinpair.exchange.value,
             )
-            progress.update(task, description='Ciclo completo', advance=30)
+            self.history.store(coinpair, df)
+        return traded
 
-        except Exception as e:
-            progress.update(task, description=f'[red]Erro: {str(e)}[/red]')
-            raise
+    async def with_retry(self, coinpair: CoinPair, indicator_pool):
+        """Executa o ciclo com retry em caso de erro de conexão."""
+        for attempt in range(NUMERO_MAXIMO_TENTATIVAS):
+            try:
+                return await self.execute_trading_cycle(
+                    coinpair, indicator_pool
+                )
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                if attempt >= NUMERO_MAXIMO_TENTATIVAS - 1:
+                    raise
+                console.print(
+                    f'[bold magenta]Tentativa {attempt + 1}'
+                    + f' falhou: {str(e)}[/bold magenta]'
+                )
+                await asyncio.sleep(INTERVALO_TENTATIVAS * (2**attempt))
 
-    def trader_loop(self, coinpair: CoinPair):
-        """Loop principal de trading para cada par de moedas"""
+    async def pair_loop(self, coinpair: CoinPair, indicator_pool):
+        """Loop de trading de um par (uma task do agendador)"""
+        market = coinpair.bitpreco_format
+        progress = self.progress_bars[market]
+        task = self.tasks[market]
         while not self._stop_event.is_set():
+            # O processo do par pode ter sido recriado (ver _replace_pool)
+            indicator_pool = self.pair_pools.get(market, indicator_pool)
             try:
-                if THREAD_LOCK:
-                    with self.thread_lock:
-                        self.retry_on_connection_error(
-                            self.execute_trading_cycle
-                        )(coinpair)
-                else:
-                    self.retry_on_connection_error(self.execute_trading_cycle)(
-                        coinpair
+                # Prazo por ciclo: ao estourar, o ciclo do par é cancelado
+                # sem afetar os demais
+                async with self.cycle_lock:
+                    await asyncio.wait_for(
+                        self.with_retry(coinpair, indicator_pool),
+                        timeout=PRAZO_CICLO,
                     )
                 # intervalo entre as execuções controlado pelo interval.json
                 delay = get_interval()
-                progress = self.progress_bars[coinpair.bitpreco_format]
-                task = self.tasks[coinpair.bitpreco_format]
                 progress.update(
                     task,
                     description=f'Aguardando {delay}s',
                     completed=100,
                 )
 
-                for _ in range(delay):
-                    if self._stop_event.is_set():
-                        break
-                    time.sleep(1)
+                await self.wait_next_cycle(coinpair, delay)
 
                 # Reset progress
                 progress.update(task, completed=0)
 
+            except TimeoutError:
+                console.print(
+                    f'[red]Ciclo de {coinpair.bitpreco_format} excedeu o '
+                    + f'prazo de {PRAZO_CICLO}s e foi cancelado[/red]'
+                )
+                await asyncio.sleep(INTERVALO_TENTATIVAS)
+            except BrokenProcessPool:
+                if self._stop_event.is_set():
+                    break
+                console.print(
+                    f'[red]Processo de indicadores de {market} encerrado '
+                    + 'inesperadamente; recriando o processo[/red]'
+                )
+                self._replace_pool(indicator_pool)
+                await asyncio.sleep(INTERVALO_TENTATIVAS)
             except Exception as e:
                 if not self._stop_event.is_set():
+                    console.print_exception()
                     console.print(f'[red]Erro: {str(e)}[/red]')
-                    time.sleep(INTERVALO_TENTATIVAS)
+                    await asyncio.sleep(INTERVALO_TENTATIVAS)
+
+    def streamed_ticker(self, coinpair: CoinPair) -> dict | None:
+        """Ticker recente do stream, ou None para usar o REST."""
+        if self.stream is None:
+            return None
+        return self.stream.latest_ticker(
+            coinpair.bitpreco_format, max_age=STREAM_MAX_AGE
+        )
+
+    async def wait_next_cycle(self, coinpair: CoinPair, delay: int):
+        """
+        Espera o próximo ciclo do par: no máximo `delay` segundos, ou menos
+        quando o stream entrega um novo preço (respeitando o intervalo
+        mínimo entre ciclos). Os ciclos acordados pelo stream não fazem
+        pollings REST (ver execute_trading_cycle).
+        """
+        await asyncio.sleep(min(INTERVALO_MINIMO_CICLO, delay))
+        wake = self.wake_events.get(coinpair.bitpreco_format)
+        remaining = delay - INTERVALO_MINIMO_CICLO
+        if remaining <= 0:
+            return
+        if wake is None:
+            await asyncio.sleep(remaining)
+            return
+        try:
+            await asyncio.wait_for(wake.wait(), timeout=remaining)
+        except TimeoutError:
+            pass
+        wake.clear()
+
+    def subscribe_stream(
+        self, coinpair: CoinPair, loop: asyncio.AbstractEventLoop
+    ):
+        """Assina o ticker do par no stream (acorda o loop do par)."""
+        if self.stream is None:
+            return
+        wake = asyncio.Event()
+        self.wake_events[coinpair.bitpreco_format] = wake
+        topic = f'ticker:{coinpair.bitpreco_format}'
+        self.stream_unsubscribes[coinpair.bitpreco_format] = [
+            # O stream publica a partir da sua própria thread
+            self.stream.pubsub.subscribe(
+                topic, lambda _t, e=wake: loop.call_soon_threadsafe(e.set)
+            ),
+            # Os tickers recebidos também vão para o diário (dashboard)
+            self.stream.pubsub.subscribe(topic, self.writer.save_price),
+        ]
+
+    @staticmethod
+    def _new_pool() -> ProcessPoolExecutor:
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=1, mp_context=context)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """
+        Substitui um processo de indicadores que morreu (ex.: falta de
+        memória): o executor quebrado não aceita mais tarefas. Os pares
+        fixados nele passam para o novo processo e recalculam os
+        indicadores do zero no próximo ciclo.
+        """
+        if broken not in self.pools:
+            return  # Já substituído por outro par do mesmo processo
+        pool = self._new_pool()
+        self.pools[self.pools.index(broken)] = pool
+        for market, pair_pool in self.pair_pools.items():
+            if pair_pool is broken:
+                self.pair_pools[market] = pool
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start_pair(self, coinpair: CoinPair):
+        """Cria a task do par, fixando-o em um processo de indicadores."""
+        market = coinpair.bitpreco_format
+        if market in self.pair_tasks:
+            return
+        if len(self.pools) < max(1, PROCESSOS_INDICADORES):
+            self.pools.append(self._new_pool())
+        # Par que volta à lista reaproveita o processo (estado incremental)
+        pool = self.pair_pools.setdefault(
+            market, self.pools[len(self.pair_pools) % len(self.pools)]
+        )
+        self.subscribe_stream(coinpair, asyncio.get_running_loop())
+        self.pair_tasks[market] = asyncio.create_task(
+            self.pair_loop(coinpair, pool), name=f'trader-{market}'
+        )
+
+    def stop_pair(self, market: str):
+        """Cancela a task do par removido da configuração."""
+        pair_task = self.pair_tasks.pop(market, None)
+        if pair_task is not None:
+            pair_task.cancel()
+        for unsubscribe in self.stream_unsubscribes.pop(market, []):
+            unsubscribe()
+        self.wake_events.pop(market, None)
+        self.rest_polls.pop(market, None)
+        self.history.discard(coinpairs_from_str([market])[0])
+
+    def sync_pairs(self, coinpairs: list[CoinPair]):
+        """
+        Aplica uma nova lista de pares (coinpair.json) sem reiniciar o bot:
+        inicia os pares novos e cancela os removidos.
+        """
+        markets = {coinpair.bitpreco_format for coinpair in coinpairs}
+        for market in set(self.pair_tasks) - markets:
+            console.print(f'[yellow]Par {market} removido[/yellow]')
+            self.stop_pair(market)
+        for coinpair in coinpairs:
+            if coinpair.bitpreco_format not in self.pair_tasks:
+                console.print(
+                    f'[green]Par {coinpair.bitpreco_format} adicionado'
+                    + '[/green]'
+                )
+                self.start_pair(coinpair)
+        if self.live is not None:
+            self.live.update(self.create_progress_group(coinpairs))
+
+    async def run_scheduler(self):
+        """
+        Agendador asyncio: uma task por par no mesmo event loop e um pool
+        de processos para os indicadores, em que cada par fica sempre no
+        mesmo processo (estado incremental preservado).
+        """
+        loop = asyncio.get_running_loop()
+        self.snapshot = MarketSnapshot(ttl=TTL_SNAPSHOT)
+        self.cycle_lock = (
+            asyncio.Lock() if THREAD_LOCK else contextlib.nullcontext()
+        )
+        unsubscribe_config = None
+        try:
+            for coinpair in get_coinpairs():
+                self.start_pair(coinpair)
+            if self.stream is not None:
+                self.stream.start()
+
+            # Mudanças no coinpair.json chegam pela thread do watch_config
+            unsubscribe_config = coinpair_config.subscribe(
+                lambda pairs: loop.call_soon_threadsafe(
+                    self.sync_pairs, coinpairs_from_str(pairs)
+                )
+            )
+            watch_config()
+
+            # Mantém o live display ativo até o pedido de parada
+            while not self._stop_event.is_set():
+                await asyncio.sleep(0.1)
+        finally:
+            if unsubscribe_config is not None:
+                unsubscribe_config()
+            pair_tasks = list(self.pair_tasks.values())
+            for market in list(self.pair_tasks):
+                self.stop_pair(market)
+            await asyncio.gather(*pair_tasks, return_exceptions=True)
+            for pool in self.pools:
+                pool.shutdown(wait=False, cancel_futures=True)
+            self.pools, self.pair_pools = [], {}
+            await aclose_clients()
+            # Grava o que ainda está na fila antes de sair
+            await asyncio.to_thread(self.writer.stop)
+            console.print(
+                '[bold green]Bot encerrado com sucesso![/bold green]'
+            )
 
     def start(self):
         """Inicia o bot de trading"""
@@ -376,25 +678,18 @@ class TradingBot:
             vertical_overflow='crop',
         ) as live:
             self.live = live
-            for coinpair in get_coinpairs():
-                thread = threading.Thread(
-                    target=self.trader_loop,
-                    args=(coinpair,),
-                    daemon=True,
-                )
-                thread.start()
-                self.threads.append(thread)
-
-            # Mantém o live display ativo
-            while not self._stop_event.is_set():
-                time.sleep(0.1)
+            asyncio.run(self.run_scheduler())
 
     def stop(self):
-        """Para o bot de trading"""
+        """
+        Pede a parada do bot de trading. Pode ser chamado no event loop
+        (handler do SIGINT): só sinaliza; os ciclos em andamento terminam
+        e o finally do run_scheduler fecha os clientes e grava a fila do
+        writer fora do loop.
+        """
         self._stop_event.set()
-        for thread in self.threads:
-            thread.join(timeout=5.0)
-        console.print('[bold green]Bot encerrado com sucesso![/bold green]')
+        if self.stream is not None:
+            self.stream.stop()
 
     def signal_handler(self, signum, frame):
         """Manipulador de sinais para encerramento gracioso"""
@@ -1,6 +1,16 @@
 import talib as ta
 from backtesting import Strategy
 
+from bot.indicadores.cache_indicadores import cached
+
+# Indicadores com os resultados guardados: nas otimizações, combinações
+# com os mesmos períodos reaproveitam o cálculo
+SMA = cached(ta.SMA)
+RSI = cached(ta.RSI)
+MACD = cached(ta.MACD)
+STOCH = cached(ta.STOCH)
+ATR = cached(ta.ATR)
+
 
 class TripleIndicator(Strategy):
     """
@@ -27,19 +37,19 @@ class TripleIndicator(Strategy):
 
     def init(self):
         price = self.data.Close
-        self.sma_fast = self.I(ta.SMA, price, self.short_sma)
-        self.sma_slow = self.I(ta.SMA, price, self.long_sma)
-        self.sma_200 = self.I(ta.SMA, price, self.sma_200)
-        self.rsi = self.I(ta.RSI, price, self.rsi)
+        self.sma_fast = self.I(SMA, price, self.short_sma)
+        self.sma_slow = self.I(SMA, price, self.long_sma)
+        self.sma_200 = self.I(SMA, price, self.sma_200)
+        self.rsi = self.I(RSI, price, self.rsi)
         self.macd, self.macd_signal, _macd_histogram = self.I(
-            ta.MACD,
+            MACD,
             price,
             fastperiod=self.macd_fastperiod,
             slowperiod=self.macd_slowperiod,
             signalperiod=self.macd_signalperiod,
         )
         self.stoch_k, self.stoch_d = self.I(
-            ta.STOCH,
+            STOCH,
             self.data.High,
             self.data.Low,
             price,
@@ -47,11 +57,9 @@ class TripleIndicator(Strategy):
             slowk_period=self.stoch_slowk_period,
             slowd_period=self.stoch_d_period,
         )
-        self.volume_sma = self.I(
-            ta.SMA, self.data.Volume, self.volume_sma_period
-        )
+        self.volume_sma = self.I(SMA, self.data.Volume, self.volume_sma_period)
         self.atr = self.I(
-            ta.ATR,
+            ATR,
             self.data.High,
             self.data.Low,
             price,
@@ -6,15 +6,24 @@ import pandas as pd
 
 from bot.apis.api_binance import get_klines
 from bot.apis.api_bitpreco import (
-    dataset_bitpreco,
+    BACKFILL_INTERVAL,
+    backfill_in_background,
     fetch_bitpreco_history,
 )
+from bot.indicadores.indicadores_incrementais import MIN_ROWS
 from bot.logs.config_log import console
 from bot.models.coin_pair import CoinPair, ExchangeType
 from bot.parametros import (
     BACKTEST_DAYS,
+    MARGEM_JANELA_AO_VIVO,
+)
+from db.parquet_candles import (
+    append_candles,
+    has_candles,
+    import_csv,
+    load_candles,
+    stored_days,
 )
-from db.duckdb_csv import load_csv_in_dataframe
 from segredos import CAMINHO
 
 
@@ -45,18 +54,21 @@ def get_price_history(
         end_date = datetime.now(dt.timezone.utc)
         start_date = end_date - timedelta(days=BACKTEST_DAYS)
 
-        # Definir nome do arquivo baseado na exchange e par
-        filename = (
-            f'{coin_pair.bitpreco_websocket}_{coin_pair.exchange.value}.csv'
-        )
-        # console.print(f'Carregando dados de {filename}...')
-        filepath = os.path.join(CAMINHO, filename)
+        symbol = coin_pair.bitpreco_websocket
+        exchange = coin_pair.exchange.value
+
+        # Importar o CSV antigo na primeira execução com o novo formato
+        if not has_candles(symbol, exchange):
+            filepath = os.path.join(CAMINHO, f'{symbol}_{exchange}.csv')
+            if os.path.exists(filepath):
+                import_csv(filepath, symbol, exchange)
 
         df = None
-        # Carregar dados do arquivo se existir
-        if os.path.exists(filepath):
-            df = load_csv_in_dataframe(
-                filepath,
+        # Carregar dados do armazenamento colunar se existirem
+        if has_candles(symbol, exchange):
+            df = load_candles(
+                symbol,
+                exchange,
                 # start_date=start_date,
                 # end_date=end_date,
             )
@@ -67,6 +79,9 @@ def get_price_history(
         else:
             # Atualizar dados mais recentes
             df = update_recent_data(df, coin_pair, interval)
+            # Retoma um backfill interrompido (uma vez por processo)
+            if coin_pair.exchange == ExchangeType.BITPRECO:
+                backfill_in_background(coin_pair, interval)
 
         if df is not None and not df.empty:
             df = process_dataframe(df)
@@ -81,6 +96,110 @@ def get_price_history(
         return pd.DataFrame()
 
 
+# Candles mantidos por par no modo ao vivo: aquecimento da EMA mais longa
+# mais uma margem para que os valores convirjam com os do histórico completo
+LIVE_WINDOW = MIN_ROWS + MARGEM_JANELA_AO_VIVO
+
+
+def load_recent_candles(
+    symbol: str, exchange: str, rows: int = LIVE_WINDOW
+) -> pd.DataFrame:
+    """
+    Carrega os `rows` candles mais recentes do armazenamento, lendo apenas
+    as partições dos últimos dias (dobrando a quantidade de dias até
+    completar a janela).
+    """
+    days = stored_days(symbol, exchange)
+    count = 1
+    while days:
+        df = load_candles(symbol, exchange, start_date=days[-count])
+        if len(df) >= rows or count >= len(days):
+            return df.tail(rows).reset_index(drop=True)
+        count = min(count * 2, len(days))
+    return pd.DataFrame()
+
+
+class LiveHistory:
+    """
+    Histórico do modo ao vivo: mantém em memória uma janela de tamanho fixo
+    (LIVE_WINDOW) por par, atualizada a cada ciclo só com os candles novos.
+    O histórico completo fica para os backtests (get_price_history).
+
+    O bot devolve a janela com indicadores e sinais via `store`, para que o
+    próximo ciclo recalcule apenas as linhas novas.
+    """
+
+    def __init__(self, size: int = LIVE_WINDOW):
+        self.size = size
+        self._frames: dict[str, pd.DataFrame] = {}
+
+    @staticmethod
+    def _key(coin_pair: CoinPair) -> str:
+        return f'{coin_pair.exchange.value}:{coin_pair.bitpreco_websocket}'
+
+    def get(
+        self,
+        coin_pair: CoinPair,
+        interval: str = '1',
+        progress=None,
+        task=None,
+    ) -> pd.DataFrame:
+        """Janela atualizada do par (DataFrame vazio em caso de erro)."""
+        try:
+            df = self._frames.get(self._key(coin_pair))
+            if df is None:
+                symbol = coin_pair.bitpreco_websocket
+                exchange = coin_pair.exchange.value
+                if not has_candles(symbol, exchange):
+                    filepath = os.path.join(
+                        CAMINHO, f'{symbol}_{exchange}.csv'
+                    )
+                    if os.path.exists(filepath):
+                        import_csv(filepath, symbol, exchange)
+                df = load_recent_candles(symbol, exchange, self.size)
+
+            if df is None or df.empty:
+                df = fetch_new_data(coin_pair, interval, progress, task)
+            else:
+                df = update_recent_data(df, coin_pair, interval)
+                if coin_pair.exchange == ExchangeType.BITPRECO:
+                    backfill_in_background(coin_pair, interval)
+
+            if df is None or df.empty:
+                console.print(
+                    '[red]Não foi possível obter dados históricos[/red]'
+                )
+                return pd.DataFrame()
+
+            df = process_dataframe(df).tail(self.size).reset_index(drop=True)
+            self._frames[self._key(coin_pair)] = df
+            return df
+
+        except Exception as e:
+            console.print(f'Erro ao obter histórico de preços: {e}')
+            console.print_exception()
+            return pd.DataFrame()
+
+    def store(self, coin_pair: CoinPair, df: pd.DataFrame):
+        """Guarda a janela processada (com indicadores e sinais)."""
+        self._frames[self._key(coin_pair)] = df.tail(self.size).reset_index(
+            drop=True
+        )
+
+    def latest(self, coin_pair: CoinPair) -> pd.DataFrame | None:
+        """
+        Janela com indicadores e sinais guardada pelo último ciclo, sem
+        buscar candles novos (None se ainda não houver).
+        """
+        df = self._frames.get(self._key(coin_pair))
+        if df is None or df.empty or 'signal' not in df.columns:
+            return None
+        return df
+
+    def discard(self, coin_pair: CoinPair):
+        self._frames.pop(self._key(coin_pair), None)
+
+
 def fetch_new_data(
     coin_pair: CoinPair,
     interval: str,
@@ -89,13 +208,22 @@ def fetch_new_data(
 ) -> pd.DataFrame:
     """Busca dados completos da exchange apropriada"""
     if coin_pair.exchange == ExchangeType.BITPRECO:
-        return dataset_bitpreco(
-            coin_pair=coin_pair,
+        # Baixa só a janela mais recente para o par começar a operar; o
+        # restante do histórico é baixado em segundo plano
+        symbol = coin_pair.bitpreco_websocket
+        end_time = int(datetime.now().timestamp())
+        df = fetch_bitpreco_history(
+            symbol=symbol,
             resolution=interval,
-            salvar_csv=True,
-            existing_progress=progress,
-            task_id=task,
+            time_range={
+                'from': end_time - BACKFILL_INTERVAL,
+                'to': end_time,
+            },
         )
+        if df is not None and not df.empty:
+            append_candles(df, symbol, coin_pair.exchange.value)
+        backfill_in_background(coin_pair, interval)
+        return df
     elif coin_pair.exchange == ExchangeType.BINANCE:
         # Ajustar intervalo para formato Binance
         binance_interval = convert_interval_to_binance(interval)
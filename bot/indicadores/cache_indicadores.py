@@ -0,0 +1,202 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+# Memória máxima (bytes) ocupada pelos resultados guardados por processo
+INDICATOR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Impressões digitais de arrays somente leitura lembradas por processo
+FINGERPRINT_MAX_ENTRIES = 32
+
+# Valores conferidos antes de reaproveitar uma impressão digital lembrada
+FINGERPRINT_SAMPLE = 64
+
+
+def _root(array: np.ndarray) -> np.ndarray:
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def _sample(array: np.ndarray) -> np.ndarray:
+    positions = np.unique(
+        np.linspace(0, len(array) - 1, FINGERPRINT_SAMPLE).astype(np.intp)
+    )
+    return array[positions]
+
+
+def _freeze(value):
+    """Resultado guardado somente leitura: quem o recebe não o altera."""
+    if isinstance(value, tuple):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    return value
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return getattr(value, 'nbytes', 0)
+
+
+class IndicatorCache:
+    """
+    Resultados de funções de indicadores (TA-Lib) guardados pela chave
+    (função, parâmetros, impressão digital dos dados), com descarte do
+    menos usado quando a memória passa de `max_bytes`.
+
+    Em uma otimização, as combinações de parâmetros repetem os mesmos
+    indicadores (ex.: o mesmo `rsi` com `atr_period` diferentes) sobre os
+    mesmos candles; só a primeira combinação calcula cada um.
+
+    A impressão digital é o hash do conteúdo do array. Para arrays 1-D
+    somente leitura (os dados do backtesting) ela é lembrada pelo buffer
+    e, a cada chamada, só uma amostra dos valores (incluindo o primeiro
+    e o último) é conferida. Um array somente leitura pode ser uma visão
+    de dados alterados depois (colunas do pandas): quem precisa de
+    exatidão nesse caso passa uma cópia gravável, que é sempre relida.
+    """
+
+    def __init__(self, max_bytes: int = INDICATOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._fingerprints: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fingerprint(self, array: np.ndarray) -> bytes:
+        """Hash do conteúdo (e do formato) de `array`."""
+        array = np.asarray(array)
+        memo_key = None
+        if not array.flags.writeable and array.ndim == 1 and len(array):
+            root = _root(array)
+            memo_key = (
+                id(root),
+                array.__array_interface__['data'][0],
+                array.shape,
+                array.strides,
+                array.dtype.str,
+            )
+            with self._lock:
+                memo = self._fingerprints.get(memo_key)
+            if memo is not None and np.array_equal(
+                memo[1], _sample(array), equal_nan=True
+            ):
+                with self._lock:
+                    self._fingerprints.move_to_end(memo_key)
+                return memo[2]
+
+        digest = hashlib.sha1(
+            f'{array.dtype.str}{array.shape}'.encode(), usedforsecurity=False
+        )
+        digest.update(np.ascontiguousarray(array).view(np.uint8))
+        digest = digest.digest()
+
+        if memo_key is not None:
+            with self._lock:
+                # A referência à raiz impede que o id e o buffer sejam
+                # reaproveitados enquanto a impressão estiver guardada
+                self._fingerprints[memo_key] = (root, _sample(array), digest)
+                while len(self._fingerprints) > FINGERPRINT_MAX_ENTRIES:
+                    self._fingerprints.popitem(last=False)
+        return digest
+
+    def _arg_key(self, value):
+        if isinstance(value, pd.Series):
+            value = value.to_numpy()
+        if isinstance(value, np.ndarray):
+            return ('array', self.fingerprint(value))
+        hash(value)  # TypeError: argumento sem chave (não guardado)
+        return value
+
+    def call(self, func: Callable, *args, **kwargs):
+        """`func(*args, **kwargs)`, reaproveitando um resultado igual."""
+        try:
+            key = (
+                func.__module__,
+                func.__qualname__,
+                tuple(self._arg_key(arg) for arg in args),
+                tuple(
+                    sorted(
+                        (name, self._arg_key(value))
+                        for name, value in kwargs.items()
+                    )
+                ),
+            )
+        except (TypeError, AttributeError):
+            return func(*args, **kwargs)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = _freeze(func(*args, **kwargs))
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+        return value
+
+    def wrap(self, func: Callable) -> Callable:
+        """`func` com os resultados guardados (mantém o nome, que o
+        backtesting usa na legenda do indicador)."""
+
+        @functools.wraps(func)
+        def cached_func(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+
+        return cached_func
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+
+_cache = IndicatorCache()
+
+
+def cached(func: Callable) -> Callable:
+    """
+    Versão de `func` com os resultados no cache do processo, para o
+    `self.I` das estratégias e para calculate_indicators. Os arrays
+    retornados são somente leitura e compartilhados entre as chamadas.
+    """
+    return _cache.wrap(func)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
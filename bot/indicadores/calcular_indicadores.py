@@ -1,5 +1,46 @@
 import talib as ta
 
+from bot.indicadores.cache_indicadores import cached
+
+# Períodos dos indicadores (compartilhados com o motor incremental)
+EMA_PERIODS = (5, 10, 20, 200)
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+RSI_PERIOD = 14
+BB_PERIOD = 20
+BB_NBDEV = 2
+STOCH_FASTK = 14
+STOCH_SLOWK = 3
+STOCH_SLOWD = 3
+VOLUME_SMA_PERIOD = 20
+ATR_PERIOD = 14
+
+INDICATOR_COLUMNS = [
+    *(f'ema_{period}' for period in EMA_PERIODS),
+    'macd',
+    'macd_signal',
+    'macd_hist',
+    'rsi',
+    'bb_upper',
+    'bb_middle',
+    'bb_lower',
+    'stoch_k',
+    'stoch_d',
+    'volume_sma',
+    'atr',
+]
+
+# Cálculos repetidos sobre os mesmos candles (ex.: vários consumidores da
+# mesma janela) reaproveitam o resultado
+EMA = cached(ta.EMA)
+MACD = cached(ta.MACD)
+RSI = cached(ta.RSI)
+BBANDS = cached(ta.BBANDS)
+STOCH = cached(ta.STOCH)
+SMA = cached(ta.SMA)
+ATR = cached(ta.ATR)
+
 
 def calculate_indicators(df):
     """
@@ -7,45 +48,47 @@ def calculate_indicators(df):
     """
     df = df.copy()
 
-    # Converter Series para numpy arrays
-    close_arr = df['close'].to_numpy(dtype=float)
-    high_arr = df['high'].to_numpy(dtype=float)
-    low_arr = df['low'].to_numpy(dtype=float)
-    volume_arr = df['volume'].to_numpy(dtype=float)
+    # Converter Series para numpy arrays (cópias graváveis: o cache relê
+    # o conteúdo, e um candle alterado no lugar não reaproveita resultado)
+    close_arr = df['close'].to_numpy(dtype=float, copy=True)
+    high_arr = df['high'].to_numpy(dtype=float, copy=True)
+    low_arr = df['low'].to_numpy(dtype=float, copy=True)
+    volume_arr = df['volume'].to_numpy(dtype=float, copy=True)
 
     # EMAs
-    df['ema_5'] = ta.EMA(close_arr, timeperiod=5)
-    df['ema_10'] = ta.EMA(close_arr, timeperiod=10)
-    df['ema_20'] = ta.EMA(close_arr, timeperiod=20)
-    df['ema_200'] = ta.EMA(close_arr, timeperiod=200)
+    for period in EMA_PERIODS:
+        df[f'ema_{period}'] = EMA(close_arr, timeperiod=period)
 
     # MACD
-    df['macd'], df['macd_signal'], df['macd_hist'] = ta.MACD(
-        close_arr, fastperiod=12, slowperiod=26, signalperiod=9
+    df['macd'], df['macd_signal'], df['macd_hist'] = MACD(
+        close_arr,
+        fastperiod=MACD_FAST,
+        slowperiod=MACD_SLOW,
+        signalperiod=MACD_SIGNAL,
     )
 
     # RSI
-    df['rsi'] = ta.RSI(close_arr, timeperiod=14)
+    df['rsi'] = RSI(close_arr, timeperiod=RSI_PERIOD)
 
     # Bollinger Bands
-    df['bb_upper'], df['bb_middle'], df['bb_lower'] = ta.BBANDS(
-        close_arr, timeperiod=20, nbdevup=2, nbdevdn=2
+    df['bb_upper'], df['bb_middle'], df['bb_lower'] = BBANDS(
+        close_arr, timeperiod=BB_PERIOD, nbdevup=BB_NBDEV, nbdevdn=BB_NBDEV
     )
 
     # Stochastic
-    df['stoch_k'], df['stoch_d'] = ta.STOCH(
+    df['stoch_k'], df['stoch_d'] = STOCH(
         high_arr,
         low_arr,
         close_arr,
-        fastk_period=14,
-        slowk_period=3,
-        slowd_period=3,
+        fastk_period=STOCH_FASTK,
+        slowk_period=STOCH_SLOWK,
+        slowd_period=STOCH_SLOWD,
     )
 
     # Volume médio
-    df['volume_sma'] = ta.SMA(volume_arr, timeperiod=20)
+    df['volume_sma'] = SMA(volume_arr, timeperiod=VOLUME_SMA_PERIOD)
 
     # Average True Range (ATR)
-    df['atr'] = ta.ATR(high_arr, low_arr, close_arr, timeperiod=14)
+    df['atr'] = ATR(high_arr, low_arr, close_arr, timeperiod=ATR_PERIOD)
 
     return df
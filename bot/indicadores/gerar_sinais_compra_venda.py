@@ -12,138 +12,173 @@ from bot.parametros import (
     STOCH_OVERSOLD,
 )
 
-
-def generate_signals(df, symbol: str = 'BTC_BRL'):
-    """Gera sinais de compra e venda com tratamento adequado de tipos"""
-    # Criar cópia explícita do DataFrame
-    df = df.copy()
-
-    # Garantir tipos corretos para colunas numéricas antes de calcular
-    numeric_columns = [
-        'close',
-        'open',
-        'high',
-        'low',
-        'volume',
-        'ema_5',
-        'ema_10',
-        'ema_20',
-        'ema_200',
-        'macd',
-        'macd_signal',
-        'macd_hist',
-        'rsi',
-        'bb_upper',
-        'bb_middle',
-        'bb_lower',
-        'stoch_k',
-        'stoch_d',
-        'volume_sma',
-        'atr',
-    ]
-
-    # Converter colunas numéricas para float de forma segura
-    for col in numeric_columns:
-        if col in df.columns:
-            df.loc[:, col] = pd.to_numeric(df[col], errors='coerce').astype(
-                'float64'
-            )
-
-    # Inicializar colunas inteiras com valores padrão
-    integer_columns = ['signal', 'position', 'ema_cross', 'macd_cross']
-    for col in integer_columns:
-        # Garantir que a coluna existe e está inicializada como inteiro
-        if col not in df.columns:
-            df[col] = pd.Series(0, index=df.index, dtype='int64')
-        else:
-            # Converter para float primeiro, então para int
-            df[col] = (
-                pd.to_numeric(df[col], errors='coerce')
-                .fillna(0)
-                .astype('int64')
-            )
-
-    # Identificar tendência
-    df['trend'] = np.where(df['close'] > df['ema_200'], 'alta', 'baixa')
-
-    # Cruzamentos
-    df['ema_cross'] = np.where(
-        (df['ema_5'] > df['ema_10'])
-        & (df['ema_5'].shift(1) <= df['ema_10'].shift(1)),
-        1,
-        np.where(
-            (df['ema_5'] < df['ema_10'])
-            & (df['ema_5'].shift(1) >= df['ema_10'].shift(1)),
-            -1,
-            0,
-        ),
+# Colunas convertidas para float quando chegam com outro tipo (ex.: CSV)
+NUMERIC_COLUMNS = [
+    'close',
+    'open',
+    'high',
+    'low',
+    'volume',
+    'ema_5',
+    'ema_10',
+    'ema_20',
+    'ema_200',
+    'macd',
+    'macd_signal',
+    'macd_hist',
+    'rsi',
+    'bb_upper',
+    'bb_middle',
+    'bb_lower',
+    'stoch_k',
+    'stoch_d',
+    'volume_sma',
+    'atr',
+]
+INTEGER_COLUMNS = ['signal', 'position', 'ema_cross', 'macd_cross']
+# Colunas geradas (e reaproveitadas no cálculo incremental)
+SIGNAL_COLUMNS = ['signal', 'position', 'ema_cross', 'macd_cross', 'trend']
+
+
+def _cross(fast: np.ndarray, slow: np.ndarray, out: np.ndarray):
+    """Cruzamento de fast sobre slow (1 para cima, -1 para baixo)."""
+    out[0] = 0
+    above = fast[1:] > slow[1:]
+    below = fast[1:] < slow[1:]
+    was_below_or_equal = fast[:-1] <= slow[:-1]
+    was_above_or_equal = fast[:-1] >= slow[:-1]
+    out[1:] = 0
+    out[1:][below & was_above_or_equal] = -1
+    out[1:][above & was_below_or_equal] = 1
+
+
+def signal_kernel(  # noqa: PLR0913, PLR0917
+    close: np.ndarray,
+    ema_5: np.ndarray,
+    ema_10: np.ndarray,
+    macd: np.ndarray,
+    macd_signal: np.ndarray,
+    rsi: np.ndarray,
+    bb_upper: np.ndarray,
+    bb_lower: np.ndarray,
+    stoch_k: np.ndarray,
+    signal: np.ndarray,
+    ema_cross: np.ndarray,
+    macd_cross: np.ndarray,
+):
+    """
+    Núcleo NumPy dos sinais: escreve em `ema_cross`, `macd_cross` e `signal`
+    (arrays int64 pré-alocados do mesmo tamanho das entradas). `signal`
+    chega com o valor anterior, mantido onde nenhum sinal é gerado.
+    """
+    _cross(ema_5, ema_10, ema_cross)
+    _cross(macd, macd_signal, macd_cross)
+
+    # Sinais de compra/venda: pelo menos N das 5 condições
+    buy_count = (
+        (ema_cross == 1).astype(np.int8)
+        + (macd_cross == 1)
+        + (rsi < RSI_OVERSOLD)
+        + (close <= bb_lower)
+        + (stoch_k < STOCH_OVERSOLD)
     )
-
-    df['macd_cross'] = np.where(
-        (df['macd'] > df['macd_signal'])
-        & (df['macd'].shift(1) <= df['macd_signal'].shift(1)),
-        1,
-        np.where(
-            (df['macd'] < df['macd_signal'])
-            & (df['macd'].shift(1) >= df['macd_signal'].shift(1)),
-            -1,
-            0,
-        ),
+    sell_count = (
+        (ema_cross == -1).astype(np.int8)
+        + (macd_cross == -1)
+        + (rsi > RSI_OVERBOUGHT)
+        + (close >= bb_upper)
+        + (stoch_k > STOCH_OVERBOUGHT)
     )
-
-    # Sinais de compra - agora precisa atender apenas 3 das 5 condições
-    buy_signals = pd.DataFrame({
-        # ema nao esta servindo de nada
-        'ema_signal': (df['ema_cross'] == 1),
-        # macd nao esta senvindo de nada
-        'macd_signal': (df['macd_cross'] == 1),
-        'rsi_signal': (df['rsi'] < RSI_OVERSOLD),
-        'bb_signal': (df['close'] <= df['bb_lower']),
-        'stoch_signal': (df['stoch_k'] < STOCH_OVERSOLD),
-    })
-
-    # Sinais de venda - agora precisa atender apenas 3 das 5 condições
-    sell_signals = pd.DataFrame({
-        'ema_signal': (df['ema_cross'] == -1),
-        'macd_signal': (df['macd_cross'] == -1),
-        'rsi_signal': (df['rsi'] > RSI_OVERBOUGHT),
-        'bb_signal': (df['close'] >= df['bb_upper']),
-        'stoch_signal': (df['stoch_k'] > STOCH_OVERBOUGHT),
-    })
-
-    # Conta quantas condições são atendidas
-    buy_count = buy_signals.sum(axis=1)
-    sell_count = sell_signals.sum(axis=1)
-
-    # Gera sinais quando pelo menos 3 condições são atendidas
-    df.loc[buy_count >= CONDICOES_COMPRA, 'signal'] = SIGNAL_BUY
-    df.loc[sell_count >= CONDICOES_VENDA, 'signal'] = SIGNAL_SELL
-
-    # Calcular posições
-    # df['position'] = df['signal'].fillna(0)
-    df['position'] = 0
-
-    # Validar sinais
-    # assert df['position'].isin([SIGNAL_BUY, 0, SIGNAL_SELL]).all(), (
-    #     'Valores de posição inválidos'
-    # )
-
-    # Garantir tipos corretos antes de salvar - versão melhorada
-    for col in integer_columns:
-        # Converter valores não inteiros para 0 e garantir tipo int64
-        df[col] = df[col].apply(
-            lambda x: 0
-            if pd.isna(x) or not isinstance(x, (int, np.integer))
-            else x
+    signal[buy_count >= CONDICOES_COMPRA] = SIGNAL_BUY
+    signal[sell_count >= CONDICOES_VENDA] = SIGNAL_SELL
+
+
+def _int_column(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    values = df[col]
+    if values.dtype != np.int64:
+        values = pd.to_numeric(values, errors='coerce').fillna(0)
+    return values.to_numpy(dtype=np.int64, copy=True)
+
+
+def generate_signals(df, symbol: str = 'BTC_BRL', start: int = 0):
+    """
+    Gera sinais de compra e venda.
+
+    Args:
+        df: DataFrame com os indicadores
+        symbol: Par de moedas (não utilizado no cálculo)
+        start: Primeira linha a recalcular. As linhas anteriores mantêm os
+            sinais já presentes em df (resultado salvo do ciclo anterior).
+    """
+    df = df.copy(deep=False)
+
+    # Converte apenas as colunas que não chegaram como float
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns and df[col].dtype != np.float64:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    start = min(max(start, 0), len(df))
+    # Sem o resultado anterior completo, recalcula todas as linhas
+    if start and any(
+        col not in df.columns or df[col].iloc[:start].isna().any()
+        for col in SIGNAL_COLUMNS
+    ):
+        start = 0
+
+    signal = _int_column(df, 'signal')
+    ema_cross = _int_column(df, 'ema_cross')
+    macd_cross = _int_column(df, 'macd_cross')
+
+    # Janela recalculada; a linha anterior a start só serve de referência
+    # para os cruzamentos
+    first = max(start - 1, 0)
+    window = slice(first, None)
+    columns = {
+        col: df[col].to_numpy(dtype=np.float64)[window]
+        for col in (
+            'close',
+            'ema_5',
+            'ema_10',
+            'macd',
+            'macd_signal',
+            'rsi',
+            'bb_upper',
+            'bb_lower',
+            'stoch_k',
         )
-        df[col] = df[col].astype('int64')
-
-    # Garantir que trend seja texto e não tenha valores nulos
-    df['trend'] = df['trend'].fillna('neutral').astype(str)
-
-    # Garantir timezone UTC antes de salvar
-    # if df['timestamp'].dt.tz is None:
-    #     df['timestamp'] = df['timestamp'].dt.tz_localize('UTC')
-    # df['timestamp'] = df['timestamp'].dt.tz_convert('UTC')
+    }
+    tail_signal = signal[window].copy()
+    tail_ema_cross = np.empty(len(tail_signal), dtype=np.int64)
+    tail_macd_cross = np.empty(len(tail_signal), dtype=np.int64)
+    signal_kernel(
+        **columns,
+        signal=tail_signal,
+        ema_cross=tail_ema_cross,
+        macd_cross=tail_macd_cross,
+    )
+    skip = start - first
+    signal[start:] = tail_signal[skip:]
+    ema_cross[start:] = tail_ema_cross[skip:]
+    macd_cross[start:] = tail_macd_cross[skip:]
 
+    # Identificar tendência
+    trend = pd.Series(
+        np.where(
+            df['close'].to_numpy(dtype=np.float64)[start:]
+            > df['ema_200'].to_numpy(dtype=np.float64)[start:],
+            'alta',
+            'baixa',
+        ),
+        index=df.index[start:],
+    ).astype(str)
+    if start:
+        trend = pd.concat([df['trend'].iloc[:start].astype(str), trend])
+
+    df['signal'] = signal
+    df['position'] = np.zeros(len(df), dtype=np.int64)
+    df['ema_cross'] = ema_cross
+    df['macd_cross'] = macd_cross
+    df['trend'] = trend
     return df
@@ -0,0 +1,366 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+from bot.indicadores.calcular_indicadores import (
+    ATR_PERIOD,
+    BB_NBDEV,
+    BB_PERIOD,
+    EMA_PERIODS,
+    INDICATOR_COLUMNS,
+    MACD_FAST,
+    MACD_SIGNAL,
+    MACD_SLOW,
+    RSI_PERIOD,
+    STOCH_FASTK,
+    STOCH_SLOWD,
+    STOCH_SLOWK,
+    VOLUME_SMA_PERIOD,
+    calculate_indicators,
+)
+
+# Quantidade mínima de candles para que todos os indicadores estejam
+# aquecidos no penúltimo candle (a EMA 200 é a de maior lookback)
+MIN_ROWS = max(EMA_PERIODS) + 1
+
+# Candles anteriores necessários para recalcular os indicadores de janela
+# fixa (Bollinger, Stochastic e média de volume) a partir do TA-Lib
+WINDOW_LOOKBACK = max(
+    BB_PERIOD - 1,
+    (STOCH_FASTK - 1) + (STOCH_SLOWK - 1) + (STOCH_SLOWD - 1),
+    VOLUME_SMA_PERIOD - 1,
+)
+
+# Colunas conferidas no candle confirmado antes de reaproveitar o estado
+_CHECK_COLUMNS = ['close', 'high', 'low', *INDICATOR_COLUMNS]
+
+
+def _wilder_gain_loss(close: np.ndarray) -> tuple[float, float]:
+    """Reproduz as médias de ganho/perda do RSI do TA-Lib até o fim da
+    série (o TA-Lib só expõe a razão entre elas)."""
+    values = close.tolist()
+    gain = loss = 0.0
+    prev = values[0]
+    for value in values[1 : RSI_PERIOD + 1]:
+        diff = value - prev
+        prev = value
+        if diff < 0:
+            loss -= diff
+        else:
+            gain += diff
+    gain /= RSI_PERIOD
+    loss /= RSI_PERIOD
+    for value in values[RSI_PERIOD + 1 :]:
+        diff = value - prev
+        prev = value
+        loss *= RSI_PERIOD - 1
+        gain *= RSI_PERIOD - 1
+        if diff < 0:
+            loss -= diff
+        else:
+            gain += diff
+        loss /= RSI_PERIOD
+        gain /= RSI_PERIOD
+    return gain, loss
+
+
+class IncrementalIndicators:
+    """
+    Motor incremental de indicadores para um par de moedas.
+
+    Guarda o estado das EMAs, do MACD, do RSI e do ATR e, a cada chamada de
+    update, processa apenas os candles que chegaram depois do último candle
+    confirmado. Os indicadores de janela fixa são recalculados pelo TA-Lib
+    sobre uma janela curta. O último candle é tratado como provisório, pois a
+    exchange ainda pode revisá-lo, então o estado só avança até o penúltimo.
+
+    Os valores das linhas antigas são lidos do próprio DataFrame recebido
+    (o bot salva e recarrega o resultado do ciclo anterior); se eles não
+    batem com o estado guardado, o cálculo completo é refeito.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._state = None
+        self._timestamp = None
+        self._row = None
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Retorna uma cópia de df com as colunas de indicadores. Em
+        result.attrs['indicators_from'] fica a primeira linha recalculada.
+        """
+        if self._state is not None:
+            result = self._update_tail(df)
+            if result is not None:
+                return result
+        return self._cold_start(df)
+
+    def _cold_start(self, df: pd.DataFrame) -> pd.DataFrame:
+        result = calculate_indicators(df)
+        result.attrs['indicators_from'] = 0
+        self.reset()
+
+        if len(result) < MIN_ROWS or 'timestamp' not in result.columns:
+            return result
+
+        close = result['close'].to_numpy(dtype=float)
+        high = result['high'].to_numpy(dtype=float)
+        low = result['low'].to_numpy(dtype=float)
+        if np.isnan(close).any() or np.isnan(high).any():
+            return result
+        if np.isnan(low).any():
+            return result
+
+        last = len(result) - 2
+        state = {
+            f'ema_{period}': float(result[f'ema_{period}'].iloc[last])
+            for period in EMA_PERIODS
+        }
+        # O MACD do TA-Lib inicia a EMA rápida alinhada à EMA lenta
+        state['macd_fast'] = float(
+            ta.EMA(close[MACD_SLOW - MACD_FAST : last + 1], MACD_FAST)[-1]
+        )
+        state['macd_slow'] = float(ta.EMA(close[: last + 1], MACD_SLOW)[-1])
+        state['macd_signal'] = float(result['macd_signal'].iloc[last])
+        state['rsi_gain'], state['rsi_loss'] = _wilder_gain_loss(
+            close[: last + 1]
+        )
+        state['atr'] = float(result['atr'].iloc[last])
+        state['close'] = float(close[last])
+
+        self._commit(result, last, state)
+        return result
+
+    def _update_tail(self, df: pd.DataFrame) -> pd.DataFrame | None:  # noqa: PLR0911, PLR0914
+        if 'timestamp' not in df.columns:
+            return None
+        if any(col not in df.columns for col in INDICATOR_COLUMNS):
+            return None
+
+        try:
+            pos = int(df['timestamp'].searchsorted(self._timestamp))
+        except TypeError:
+            return None
+        if pos >= len(df) or df['timestamp'].iloc[pos] != self._timestamp:
+            return None
+
+        start = pos + 1
+        if start >= len(df) or start < WINDOW_LOOKBACK:
+            return None
+
+        # Confere se o candle confirmado ainda é o mesmo
+        stored = np.array(list(self._row.values()), dtype=float)
+        current = df[list(self._row)].iloc[pos].to_numpy(dtype=float)
+        if not np.allclose(current, stored, rtol=1e-12, equal_nan=True):
+            return None
+
+        close = df['close'].to_numpy(dtype=float)
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        volume = df['volume'].to_numpy(dtype=float)
+        if np.isnan(close[start:]).any() or np.isnan(high[start:]).any():
+            return None
+        if np.isnan(low[start:]).any():
+            return None
+
+        new_values, committed_state = self._step(
+            close[start:].tolist(),
+            high[start:].tolist(),
+            low[start:].tolist(),
+        )
+
+        # Indicadores de janela fixa sobre os últimos candles
+        window = slice(start - WINDOW_LOOKBACK, None)
+        upper, middle, lower = ta.BBANDS(
+            close[window],
+            timeperiod=BB_PERIOD,
+            nbdevup=BB_NBDEV,
+            nbdevdn=BB_NBDEV,
+        )
+        stoch_k, stoch_d = ta.STOCH(
+            high[window],
+            low[window],
+            close[window],
+            fastk_period=STOCH_FASTK,
+            slowk_period=STOCH_SLOWK,
+            slowd_period=STOCH_SLOWD,
+        )
+        volume_sma = ta.SMA(volume[window], timeperiod=VOLUME_SMA_PERIOD)
+        new_values['bb_upper'] = upper[WINDOW_LOOKBACK:]
+        new_values['bb_middle'] = middle[WINDOW_LOOKBACK:]
+        new_values['bb_lower'] = lower[WINDOW_LOOKBACK:]
+        new_values['stoch_k'] = stoch_k[WINDOW_LOOKBACK:]
+        new_values['stoch_d'] = stoch_d[WINDOW_LOOKBACK:]
+        new_values['volume_sma'] = volume_sma[WINDOW_LOOKBACK:]
+
+        # Cópia rasa: só as colunas de indicadores são substituídas
+        result = df.copy(deep=False)
+        for col in INDICATOR_COLUMNS:
+            values = df[col].to_numpy(dtype=float, copy=True)
+            values[start:] = new_values[col]
+            result[col] = values
+        result.attrs['indicators_from'] = start
+
+        self._commit(result, len(result) - 2, committed_state)
+        return result
+
+    def _step(self, closes, highs, lows) -> tuple[dict, dict]:
+        """
+        Aplica as recorrências do TA-Lib aos candles novos.
+        Retorna os valores calculados e o estado após o penúltimo candle.
+        """
+        state = dict(self._state)
+        ema_k = {period: 2.0 / (period + 1) for period in EMA_PERIODS}
+        fast_k = 2.0 / (MACD_FAST + 1)
+        slow_k = 2.0 / (MACD_SLOW + 1)
+        signal_k = 2.0 / (MACD_SIGNAL + 1)
+
+        columns = [
+            *(f'ema_{period}' for period in EMA_PERIODS),
+            'macd',
+            'macd_signal',
+            'macd_hist',
+            'rsi',
+            'atr',
+        ]
+        out = {col: np.empty(len(closes)) for col in columns}
+
+        for i, (close, high, low) in enumerate(zip(closes, highs, lows)):
+            if i == len(closes) - 1:
+                # Estado confirmado: até o penúltimo candle
+                committed_state = dict(state)
+
+            for period in EMA_PERIODS:
+                key = f'ema_{period}'
+                state[key] = ((close - state[key]) * ema_k[period]) + state[
+                    key
+                ]
+                out[key][i] = state[key]
+
+            state['macd_fast'] = (
+                (close - state['macd_fast']) * fast_k
+            ) + state['macd_fast']
+            state['macd_slow'] = (
+                (close - state['macd_slow']) * slow_k
+            ) + state['macd_slow']
+            macd = state['macd_fast'] - state['macd_slow']
+            state['macd_signal'] = (
+                (macd - state['macd_signal']) * signal_k
+            ) + state['macd_signal']
+            out['macd'][i] = macd
+            out['macd_signal'][i] = state['macd_signal']
+            out['macd_hist'][i] = macd - state['macd_signal']
+
+            prev_close = state['close']
+            diff = close - prev_close
+            state['rsi_loss'] *= RSI_PERIOD - 1
+            state['rsi_gain'] *= RSI_PERIOD - 1
+            if diff < 0:
+                state['rsi_loss'] -= diff
+            else:
+                state['rsi_gain'] += diff
+            state['rsi_loss'] /= RSI_PERIOD
+            state['rsi_gain'] /= RSI_PERIOD
+            total = state['rsi_gain'] + state['rsi_loss']
+            out['rsi'][i] = (
+                100.0 * (state['rsi_gain'] / total) if total != 0 else 0.0
+            )
+
+            true_range = max(
+                high - low, abs(prev_close - high), abs(prev_close - low)
+            )
+            state['atr'] *= ATR_PERIOD - 1
+            state['atr'] += true_range
+            state['atr'] /= ATR_PERIOD
+            out['atr'][i] = state['atr']
+
+            state['close'] = close
+
+        return out, committed_state
+
+    def _commit(self, result: pd.DataFrame, pos: int, state: dict):
+        self._state = state
+        self._timestamp = result['timestamp'].iloc[pos]
+        self._row = dict(
+            zip(
+                _CHECK_COLUMNS,
+                result[_CHECK_COLUMNS].iloc[pos].to_numpy(dtype=float),
+            )
+        )
+
+
+# Um motor por par de moedas, compartilhado entre os ciclos do bot
+_engines: dict[str, IncrementalIndicators] = {}
+_engines_lock = threading.Lock()
+
+
+def calculate_indicators_incremental(df: pd.DataFrame, key: str):
+    """
+    Versão incremental de calculate_indicators.
+
+    Args:
+        df: DataFrame ordenado por timestamp com os candles do par
+        key: Identificador do par de moedas (ex: 'BTC_BRL')
+    """
+    with _engines_lock:
+        engine = _engines.setdefault(key, IncrementalIndicators())
+    return engine.update(df)
+
+
+def check_parity(df: pd.DataFrame, steps: int = 50) -> pd.Series:
+    """
+    Compara o motor incremental com o cálculo completo do TA-Lib, simulando
+    `steps` ciclos com um candle novo (e o anterior revisado) em cada um.
+    Retorna o maior erro relativo encontrado por coluna.
+    """
+    engine = IncrementalIndicators()
+    errors = pd.Series(0.0, index=INDICATOR_COLUMNS)
+    previous = None
+
+    for end in range(len(df) - steps, len(df) + 1):
+        frame = df.iloc[:end].reset_index(drop=True)
+        if previous is not None:
+            # Linhas antigas carregam o resultado do ciclo anterior
+            frame[INDICATOR_COLUMNS] = np.nan
+            frame.loc[: len(previous) - 2, INDICATOR_COLUMNS] = previous[
+                INDICATOR_COLUMNS
+            ].iloc[:-1]
+        previous = engine.update(frame)
+        expected = calculate_indicators(df.iloc[:end])
+
+        for col in INDICATOR_COLUMNS:
+            got = previous[col].to_numpy(dtype=float)
+            want = expected[col].to_numpy(dtype=float)
+            if not np.array_equal(np.isnan(got), np.isnan(want)):
+                errors[col] = np.inf
+                continue
+            mask = ~np.isnan(want)
+            scale = np.maximum(np.abs(want[mask]), 1.0)
+            diff = np.abs(got[mask] - want[mask]) / scale
+            errors[col] = max(errors[col], diff.max(initial=0.0))
+
+    return errors
+
+
+if __name__ == '__main__':
+    from bot.logs.config_log import console
+
+    rng = np.random.default_rng(42)
+    size = 5000
+    close = 300000 + np.cumsum(rng.normal(0, 50, size))
+    candles = pd.DataFrame({
+        'timestamp': pd.date_range(
+            '2024-01-01', periods=size, freq='1min', tz='UTC'
+        ),
+        'open': close,
+        'high': close + rng.random(size) * 30,
+        'low': close - rng.random(size) * 30,
+        'close': close,
+        'volume': rng.random(size),
+    })
+    console.print(check_parity(candles))
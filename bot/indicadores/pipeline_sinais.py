@@ -0,0 +1,20 @@
+import pandas as pd
+
+from bot.indicadores.gerar_sinais_compra_venda import generate_signals
+from bot.indicadores.indicadores_incrementais import (
+    calculate_indicators_incremental,
+)
+
+
+def compute_signals(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    Etapa de CPU do ciclo de trading: indicadores (motor incremental do
+    par `key`) e sinais de compra/venda.
+
+    Roda nos processos de indicadores do agendador. Cada par é sempre
+    enviado ao mesmo processo, que mantém o estado incremental em memória.
+    Os sinais também só são recalculados a partir da primeira linha com
+    indicadores novos.
+    """
+    df = calculate_indicators_incremental(df, key)
+    return generate_signals(df, start=df.attrs.get('indicators_from', 0))
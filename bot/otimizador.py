@@ -0,0 +1,407 @@
+import csv
+import itertools
+import math
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Callable, Sequence
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+from rich.progress import Progress
+
+from bot.logs.config_log import console
+from db.backtest_results import (
+    RESULTS_DB,
+    load_results,
+    params_hash,
+    run_context,
+    save_results,
+)
+
+# Métricas do backtesting guardadas para cada combinação avaliada
+RESULT_METRICS = [
+    'Sharpe Ratio',
+    'Return [%]',
+    'Return (Ann.) [%]',
+    'Max. Drawdown [%]',
+    '# Trades',
+    'Win Rate [%]',
+    'Profit Factor',
+]
+
+METHODS = ('grid', 'random', 'bayes')
+
+# Combinações avaliadas quando max_tries não é informado (random/bayes)
+DEFAULT_MAX_TRIES = 100
+
+_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class SharedOHLCV:
+    """
+    Candles OHLCV em memória compartilhada: os processos do otimizador
+    leem os mesmos arrays em vez de receber uma cópia serializada a cada
+    avaliação. Use como gerenciador de contexto no processo principal.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        columns = [col for col in _OHLCV if col in data.columns]
+        values = data[columns].to_numpy(dtype=np.float64)
+        index = pd.DatetimeIndex(data.index).as_unit('ns')
+
+        self._values = shared_memory.SharedMemory(
+            create=True, size=max(values.nbytes, 1)
+        )
+        self._index = shared_memory.SharedMemory(
+            create=True, size=max(index.asi8.nbytes, 1)
+        )
+        shared = np.ndarray(
+            values.shape, dtype=np.float64, buffer=self._values.buf
+        )
+        shared[:] = values
+        timestamps = np.ndarray(
+            len(index), dtype=np.int64, buffer=self._index.buf
+        )
+        timestamps[:] = index.asi8
+        # Descrição serializável para os processos se conectarem
+        self.spec = {
+            'values': self._values.name,
+            'index': self._index.name,
+            'shape': values.shape,
+            'columns': columns,
+            'tz': None if index.tz is None else str(index.tz),
+        }
+
+    @staticmethod
+    def attach(spec: dict):
+        """DataFrame sobre a memória compartilhada (sem cópia)."""
+        values = shared_memory.SharedMemory(name=spec['values'])
+        index = shared_memory.SharedMemory(name=spec['index'])
+        array = np.ndarray(spec['shape'], dtype=np.float64, buffer=values.buf)
+        timestamps = np.ndarray(
+            spec['shape'][0], dtype=np.int64, buffer=index.buf
+        )
+        datetime_index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'))
+        if spec['tz'] is not None:
+            datetime_index = datetime_index.tz_localize('UTC').tz_convert(
+                spec['tz']
+            )
+        df = pd.DataFrame(array, index=datetime_index, columns=spec['columns'])
+        # Os blocos precisam continuar abertos enquanto o DataFrame existir
+        return df, (values, index)
+
+    def close(self):
+        for block in (self._values, self._index):
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Estado de cada processo do pool, criado uma vez em _init_worker
+_worker: dict = {}
+
+
+def _init_worker(spec, strategy_class, backtest_kwargs):
+    data, blocks = SharedOHLCV.attach(spec)
+    _worker['blocks'] = blocks
+    _worker['backtest'] = Backtest(data, strategy_class, **backtest_kwargs)
+
+
+def _evaluate(params: dict) -> tuple[dict, dict]:
+    """Executa o backtest de uma combinação no processo do pool."""
+    try:
+        stats = _worker['backtest'].run(**params)
+        metrics = {metric: stats.get(metric) for metric in RESULT_METRICS}
+        metrics['error'] = ''
+    except Exception as e:
+        metrics = {metric: math.nan for metric in RESULT_METRICS}
+        metrics['error'] = f'{type(e).__name__}: {e}'
+    return params, metrics
+
+
+def _score(metrics: dict, maximize: str) -> float:
+    value = metrics.get(maximize)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return -math.inf
+    return value if math.isfinite(value) else -math.inf
+
+
+class ResultsTable:
+    """
+    Resultados gravados à medida que as avaliações terminam: cada linha
+    tem os parâmetros e as métricas. Sem `path`, ficam só em memória.
+    """
+
+    def __init__(self, path: str | None, params: Sequence[str]):
+        self.path = path
+        self.columns = [*params, *RESULT_METRICS, 'error']
+        self.rows: list[dict] = []
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                csv.DictWriter(f, self.columns).writeheader()
+
+    def append(self, params: dict, metrics: dict):
+        row = {**params, **metrics}
+        self.rows.append(row)
+        if self.path is not None:
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                csv.DictWriter(f, self.columns).writerow(row)
+
+    def to_frame(self, maximize: str) -> pd.DataFrame:
+        df = pd.DataFrame(self.rows, columns=self.columns)
+        return df.sort_values(
+            maximize, ascending=False, na_position='last'
+        ).reset_index(drop=True)
+
+
+def _grid(space: dict, constraint) -> list[dict]:
+    names = list(space)
+    combinations = (
+        dict(zip(names, values))
+        for values in itertools.product(*space.values())
+    )
+    return [c for c in combinations if constraint is None or constraint(c)]
+
+
+def _random(space: dict, constraint, max_tries: int, seed) -> list[dict]:
+    rng = random.Random(seed)
+    total = math.prod(len(values) for values in space.values())
+    if total <= max_tries * 4:
+        # Espaço pequeno: amostra sem repetição da grade completa
+        grid = _grid(space, constraint)
+        return rng.sample(grid, min(max_tries, len(grid)))
+
+    chosen, seen = [], set()
+    attempts = 0
+    while len(chosen) < max_tries and attempts < max_tries * 100:
+        attempts += 1
+        params = {name: rng.choice(values) for name, values in space.items()}
+        key = tuple(params.values())
+        if key in seen or (constraint is not None and not constraint(params)):
+            continue
+        seen.add(key)
+        chosen.append(params)
+    return chosen
+
+
+class _Search:
+    """
+    Executa as avaliações no pool e grava os resultados. Combinações já
+    em `known` (banco de resultados) não são avaliadas de novo.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self, executor, workers, table, maximize, progress, task, known
+    ):
+        self.executor = executor
+        self.workers = workers
+        self.table = table
+        self.maximize = maximize
+        self.progress = progress
+        self.task = task
+        self.known = known
+        self.reused = 0
+        # Resultados novos, a gravar no banco
+        self.evaluated: list[tuple[dict, dict]] = []
+
+    def _record(self, params, metrics, on_result):
+        self.table.append(params, metrics)
+        self.progress.advance(self.task)
+        if on_result is not None:
+            on_result(params, _score(metrics, self.maximize))
+
+    def run(self, candidates, on_result=None):
+        """Avalia os candidatos, com no máximo 2 por processo na fila."""
+        candidates = iter(candidates)
+        pending = set()
+        limit = self.workers * 2
+        while True:
+            while len(pending) < limit:
+                params = next(candidates, None)
+                if params is None:
+                    break
+                metrics = self.known.get(params_hash(params))
+                if metrics is not None:
+                    self.reused += 1
+                    self._record(params, metrics, on_result)
+                else:
+                    pending.add(self.executor.submit(_evaluate, params))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                params, metrics = future.result()
+                self.evaluated.append((params, metrics))
+                self._record(params, metrics, on_result)
+
+
+def _bayes(search, space, constraint, max_tries, seed, workers):  # noqa: PLR0913, PLR0917
+    """
+    Otimização bayesiana (sambo) em lotes: cada lote tem um candidato por
+    processo; o modelo é atualizado com os resultados e propõe o seguinte.
+    """
+    from sambo import Optimizer  # noqa: PLC0415
+
+    names = list(space)
+    values = [list(space[name]) for name in names]
+
+    # Chamada para cada candidato avaliado pelo sambo (dezenas de milhares
+    # por lote, pela restrição): só operações em Python puro
+    def decode(x) -> dict:
+        return {
+            name: options[min(max(int(v + 0.5), 0), len(options) - 1)]
+            for name, options, v in zip(names, values, x.tolist())
+        }
+
+    optimizer = Optimizer(
+        fun=None,
+        bounds=[(0, len(options) - 1) for options in values],
+        constraints=(
+            None if constraint is None else lambda x: constraint(decode(x))
+        ),
+        rng=seed,
+    )
+    scores: dict[tuple, float] = {}
+    evaluated = 0
+    stalled = 0
+    while evaluated < max_tries and stalled < 10:  # noqa: PLR2004
+        batch = optimizer.ask(min(workers, max_tries - evaluated))
+        new = {}
+        for x in batch:
+            params = decode(x)
+            key = tuple(params.values())
+            if key not in scores:
+                new[key] = params
+
+        def record(params, score):
+            scores[tuple(params.values())] = score
+
+        search.run(new.values(), record)
+        evaluated += len(new)
+        stalled = 0 if new else stalled + 1
+        # sambo minimiza: informa o negativo da métrica (falhas e Sharpe
+        # indefinido viram uma penalidade finita)
+        y = [scores[tuple(decode(x).values())] for x in batch]
+        optimizer.tell([-v if math.isfinite(v) else 1e12 for v in y], batch)
+
+
+def optimize_parallel(  # noqa: PLR0913, PLR0917
+    data: pd.DataFrame,
+    strategy_class,
+    space: dict[str, Sequence],
+    method: str = 'grid',
+    max_tries: int | None = None,
+    maximize: str = 'Sharpe Ratio',
+    constraint: Callable[[dict], bool] | None = None,
+    max_workers: int | None = None,
+    results_path: str | None = None,
+    random_state: int | None = None,
+    results_db: str | None = RESULTS_DB,
+    **backtest_kwargs,
+) -> pd.DataFrame:
+    """
+    Busca de parâmetros da estratégia com as avaliações distribuídas em
+    um pool de processos. Os candles vão para os processos por memória
+    compartilhada e cada tarefa recebe só os parâmetros.
+
+    Args:
+        data: Candles com as colunas Open, High, Low, Close, Volume
+        strategy_class: Estratégia do backtesting
+        space: Valores possíveis de cada parâmetro
+        method: 'grid' (todas as combinações), 'random' (amostra de
+            max_tries combinações) ou 'bayes' (sambo, em lotes)
+        max_tries: Limite de avaliações (padrão: a grade inteira no
+            'grid', DEFAULT_MAX_TRIES nos demais)
+        maximize: Métrica do backtesting a maximizar
+        constraint: Filtro das combinações válidas (ex.: média curta
+            menor que a longa)
+        max_workers: Processos do pool (padrão: os núcleos da máquina)
+        results_path: CSV gravado à medida que os resultados chegam
+        random_state: Semente das buscas aleatória e bayesiana
+        results_db: Banco de resultados (db.backtest_results): as
+            combinações já avaliadas com os mesmos dados, parâmetros do
+            Backtest e código são lidas dele, e as novas são gravadas
+            (None: não usa o banco)
+        **backtest_kwargs: Parâmetros do Backtest (cash, commission...)
+
+    Returns:
+        DataFrame com parâmetros e métricas, do melhor para o pior
+    """
+    if method not in METHODS:
+        raise ValueError(f'Método inválido: {method} (use {METHODS})')
+    space = {name: list(values) for name, values in space.items()}
+    workers = max_workers or os.cpu_count() or 1
+
+    if method == 'grid':
+        candidates = _grid(space, constraint)
+        if max_tries is not None:
+            candidates = candidates[:max_tries]
+        total = len(candidates)
+    else:
+        max_tries = max_tries or DEFAULT_MAX_TRIES
+        candidates = (
+            _random(space, constraint, max_tries, random_state)
+            if method == 'random'
+            else None
+        )
+        total = len(candidates) if candidates is not None else max_tries
+
+    table = ResultsTable(results_path, list(space))
+    context = known = None
+    if results_db is not None:
+        context = run_context(data, strategy_class, **backtest_kwargs)
+        known = load_results(context, results_db)
+    with (
+        SharedOHLCV(data) as shared,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shared.spec, strategy_class, backtest_kwargs),
+        ) as executor,
+        Progress(console=console, transient=True) as progress,
+    ):
+        task = progress.add_task(
+            f'Otimizando {strategy_class.__name__} ({method})', total=total
+        )
+        search = _Search(
+            executor, workers, table, maximize, progress, task, known or {}
+        )
+        try:
+            if candidates is not None:
+                search.run(candidates)
+            else:
+                _bayes(
+                    search, space, constraint, max_tries, random_state, workers
+                )
+        finally:
+            # Grava também o que terminou antes de uma interrupção
+            if context is not None:
+                save_results(context, search.evaluated, 'optimize', results_db)
+
+    results = table.to_frame(maximize)
+    console.print(
+        f'[green]{len(results)} combinações avaliadas '
+        + f'com {workers} processos '
+        + f'({search.reused} do banco de resultados)[/green]'
+    )
+    return results
+
+
+def best_params(results: pd.DataFrame, space: dict) -> dict:
+    """Parâmetros da melhor linha de optimize_parallel."""
+    best = results.iloc[0]
+    return {
+        name: best[name].item() if hasattr(best[name], 'item') else best[name]
+        for name in space
+    }
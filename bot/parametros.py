@@ -19,7 +19,13 @@ def get_available_pairs() -> List[CoinPair]:
 
 
 # Parâmetros Globais
-AVAILABLE_PAIRS: List[CoinPair] = get_available_pairs()
+# AVAILABLE_PAIRS é carregado sob demanda (ver __getattr__), para que
+# importar este módulo não dependa da rede
+def __getattr__(name: str):
+    if name == 'AVAILABLE_PAIRS':
+        return get_available_pairs()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 profitability = 1.05  # Margem de lucro desejada (5%)
 risk_per_trade = 0.10  # Arriscar 10% do saldo disponível por operação
@@ -31,6 +37,10 @@ STOP_LOSS = 0.95  # Limite para stop-loss (5% abaixo do preço de compra)
 
 # Configurações adicionais
 BACKTEST_DAYS = 120
+# Walk-forward: histórico, janela de otimização e de teste de cada fold
+WALK_FORWARD_DAYS = 365
+WALK_FORWARD_TRAIN_DAYS = 60
+WALK_FORWARD_TEST_DAYS = 15
 MAX_DAILY_TRADES = 100
 
 # Parâmetros RSI e Stochastic
@@ -48,3 +58,16 @@ NUMERO_MAXIMO_TENTATIVAS = 3
 INTERVALO_TENTATIVAS = 5
 
 THREAD_LOCK = False
+
+# Stream de mercado (WebSocket)
+USAR_STREAM = True  # Usar o WebSocket; o REST fica como fallback
+STREAM_MAX_AGE = 30  # Idade máxima (s) do ticker do stream para ser usado
+INTERVALO_MINIMO_CICLO = 5  # Intervalo mínimo (s) entre ciclos de um par
+
+# Agendador asyncio
+PRAZO_CICLO = 120  # Prazo (s) de um ciclo; ao estourar o ciclo é cancelado
+PROCESSOS_INDICADORES = 4  # Processos para o cálculo de indicadores
+TTL_SNAPSHOT = 5  # Validade (s) do saldo e tickers compartilhados
+
+# Janela ao vivo: candles além do aquecimento da EMA 200 mantidos por par
+MARGEM_JANELA_AO_VIVO = 800
@@ -1,3 +1,4 @@
+import os
 import sys
 from pathlib import Path
 
@@ -12,24 +13,84 @@ from rich.traceback import install
 
 from bot.estrategias.TripleIndicatoStrategy import TripleIndicator
 from bot.logs.config_log import console
-from bot.parametros import BACKTEST_DAYS
+from bot.otimizador import RESULT_METRICS, best_params, optimize_parallel
+from bot.parametros import (
+    BACKTEST_DAYS,
+    WALK_FORWARD_DAYS,
+    WALK_FORWARD_TEST_DAYS,
+    WALK_FORWARD_TRAIN_DAYS,
+)
+from bot.walk_forward import print_walk_forward, walk_forward
+from db.backtest_results import REPORTS_DIR, run_context, save_results
 from db.duckdb_csv import load_csv_in_dataframe
+from db.parquet_candles import has_candles, load_candles
 
 # Importando funções e classes relevantes do projeto
 install(show_locals=True)
 
-
-def run_backtest(data, strategy_class, **strategy_params):
-    bt = Backtest(
-        data,
-        strategy_class,
-        cash=10000000,
-        commission=0.002,  # 0.2% por operação
-        exclusive_orders=True,
-        **strategy_params,
-    )
-
-    stats = bt.run()
+# Parâmetros do Backtest, os mesmos no teste e na otimização
+BACKTEST_PARAMS = {
+    'cash': 10000000,
+    'commission': 0.002,  # 0.2% por operação
+    'exclusive_orders': True,
+}
+
+# Espaço de busca da TripleIndicator
+TRIPLE_INDICATOR_SPACE = {
+    'short_sma': range(5, 15, 5),
+    'long_sma': range(20, 60, 20),
+    'indicators_validation': [1, 2, 3, 4, 5, 6],
+    'rsi_oversold': range(20, 40, 10),
+    'rsi_overbought': range(60, 80, 10),
+    'rsi': range(14, 20, 2),
+    'macd_fastperiod': range(5, 15, 5),
+    'macd_slowperiod': range(20, 30, 5),
+    'macd_signalperiod': range(9, 15, 2),
+    'stoch_k_period': range(3, 5, 1),
+    'stoch_d_period': range(3, 5, 1),
+    'stoch_slowk_period': range(3, 5, 1),
+    'volume_sma_period': range(10, 30, 5),
+    'atr_period': range(14, 20, 2),
+}
+
+# Parâmetros otimizados em cada fold do walk-forward (os demais ficam
+# com os valores da estratégia)
+WALK_FORWARD_SPACE = {
+    'short_sma': range(5, 15, 5),
+    'long_sma': range(20, 60, 20),
+    'indicators_validation': [1, 2, 3, 4, 5, 6],
+    'rsi_oversold': range(20, 40, 10),
+    'rsi_overbought': range(60, 80, 10),
+}
+
+# Arquivo com os resultados da otimização, gravado durante a busca (junto
+# dos relatórios, fora da raiz do repositório)
+OPTIMIZATION_RESULTS = os.path.join(REPORTS_DIR, 'optimization_results.csv')
+
+
+def run_backtest(  # noqa: PLR0913
+    data,
+    strategy_class,
+    verbose=True,
+    save=True,
+    backtest_params=None,
+    **strategy_params,
+):
+    """Backtest com `backtest_params` (padrão: BACKTEST_PARAMS)."""
+    if backtest_params is None:
+        backtest_params = BACKTEST_PARAMS
+    bt = Backtest(data, strategy_class, **backtest_params)
+
+    stats = bt.run(**strategy_params)
+    if save:
+        # Resultado consultável depois no banco (db.backtest_results)
+        save_results(
+            run_context(data, strategy_class, **backtest_params),
+            [(strategy_params, {m: stats[m] for m in RESULT_METRICS})],
+            'backtest',
+        )
+    if not verbose:
+        return bt, stats
     console.print(f'Testando {strategy_class.__name__}')
     console.print(f'Retorno Total: {stats['Return [%]']:.2f}%')
     console.print(f'Retorno Anualizado: {stats['Return (Ann.) [%]']:.2f}%')
@@ -44,14 +105,18 @@ def run_backtest(data, strategy_class, **strategy_params):
 
 
 # Função para carregar dados históricos
-def load_data(csv_path=None):
+# (do armazenamento colunar, ou de um CSV se csv_path for informado)
+def load_data(csv_path=None, symbol='BTC_BRL', days=BACKTEST_DAYS):
     end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=BACKTEST_DAYS)
-    df = load_csv_in_dataframe(
-        csv_path,
-        start_date=start_date,
-        end_date=end_date,
-    )
+    start_date = end_date - timedelta(days=days)
+    if csv_path is not None:
+        df = load_csv_in_dataframe(
+            csv_path,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    else:
+        df = load_candles(symbol, start_date=start_date, end_date=end_date)
 
     # Assegure-se de que os nomes das colunas estão no formato esperado
     column_map = {
@@ -74,12 +139,12 @@ def load_data(csv_path=None):
     return df
 
 
-def run_optimization(bt, strategy_class):
+def run_optimization(bt, strategy_class, data):
     """Executa a otimização com tratamento de erros."""
     try:
         # Adapta os parâmetros conforme a estratégia utilizada
         if strategy_class == TripleIndicator:
-            stats = optimize_triple_indicator(bt)
+            stats = optimize_triple_indicator(bt, data)
         else:
             console.print(
                 f'[yellow]Estratégia {strategy_class.__name__} '
@@ -95,28 +160,58 @@ def run_optimization(bt, strategy_class):
         return None
 
 
-def optimize_triple_indicator(bt):
-    """Otimiza os parâmetros para a estratégia TripleIndicator"""
-    return bt.optimize(
-        short_sma=range(5, 15, 5),
-        long_sma=range(20, 60, 20),
-        indicators_validation=[1, 2, 3, 4, 5, 6],
-        rsi_oversold=range(20, 40, 10),
-        rsi_overbought=range(60, 80, 10),
-        # Mantém fixos os parâmetros mais pesados para otimização
-        rsi=range(14, 20, 2),
-        macd_fastperiod=range(5, 15, 5),
-        macd_slowperiod=range(20, 30, 5),
-        macd_signalperiod=range(9, 15, 2),
-        stoch_k_period=range(3, 5, 1),
-        stoch_d_period=range(3, 5, 1),
-        stoch_slowk_period=range(3, 5, 1),
-        volume_sma_period=range(10, 30, 5),
-        atr_period=range(14, 20, 2),
+def triple_indicator_constraint(params):
+    """Combinações válidas: médias e MACD com período curto < longo
+    (parâmetros fora da combinação ficam com o valor da estratégia)."""
+    short_sma, long_sma, macd_fast, macd_slow = (
+        params.get(name, getattr(TripleIndicator, name))
+        for name in (
+            'short_sma',
+            'long_sma',
+            'macd_fastperiod',
+            'macd_slowperiod',
+        )
+    )
+    return short_sma < long_sma and macd_fast < macd_slow
+
+
+def optimize_triple_indicator(bt, data, method='bayes', max_tries=100):
+    """
+    Otimiza os parâmetros para a estratégia TripleIndicator em paralelo
+    (um processo por núcleo) e executa `bt` com os melhores parâmetros.
+    """
+    results = optimize_parallel(
+        data,
+        TripleIndicator,
+        TRIPLE_INDICATOR_SPACE,
+        method=method,
+        max_tries=max_tries,
         maximize='Sharpe Ratio',
-        method='sambo',
-        max_tries=100,
+        constraint=triple_indicator_constraint,
+        results_path=OPTIMIZATION_RESULTS,
+        **BACKTEST_PARAMS,
     )
+    return bt.run(**best_params(results, TRIPLE_INDICATOR_SPACE))
+
+
+def run_walk_forward(
+    symbol='BTC_BRL',
+    train_days=WALK_FORWARD_TRAIN_DAYS,
+    test_days=WALK_FORWARD_TEST_DAYS,
+    days=WALK_FORWARD_DAYS,
+):
+    """Walk-forward da TripleIndicator nos últimos `days` dias."""
+    data = load_data(symbol=symbol, days=days)
+    results, summary = walk_forward(
+        data,
+        WALK_FORWARD_SPACE,
+        train_days=train_days,
+        test_days=test_days,
+        constraint=triple_indicator_constraint,
+        **BACKTEST_PARAMS,
+    )
+    print_walk_forward(results, summary)
+    return results, summary
 
 
 def run_multiple_strategies(data):
@@ -128,6 +223,7 @@ def run_multiple_strategies(data):
     best_bt = None
     best_strategy = None
     best_sharpe = -float('inf')
+    os.makedirs(REPORTS_DIR, exist_ok=True)
 
     for strategy in strategies:
         console.print(f'[bold blue]Testando {strategy.__name__}[/bold blue]')
@@ -142,16 +238,18 @@ def run_multiple_strategies(data):
 
         # Salvar gráfico individual da estratégia
         bt.plot(
-            filename=f'{strategy.__name__}.html',
+            filename=os.path.join(REPORTS_DIR, f'{strategy.__name__}.html'),
             open_browser=False,
             resample='1h',
         )
 
         # Otimizar a estratégia
-        opt_stats = run_optimization(bt, strategy)
+        opt_stats = run_optimization(bt, strategy, data)
         if opt_stats is not None:
             bt.plot(
-                filename=f'{strategy.__name__}_Optimized.html',
+                filename=os.path.join(
+                    REPORTS_DIR, f'{strategy.__name__}_Optimized.html'
+                ),
                 open_browser=False,
                 resample='1h',
             )
@@ -172,7 +270,12 @@ def run_multiple_strategies(data):
         console.print(f'Retorno: {best_stats['Return [%]']:.2f}%')
 
         # Abrir o gráfico da melhor estratégia
-        best_bt.plot(open_browser=True)
+        best_bt.plot(
+            filename=os.path.join(
+                REPORTS_DIR, f'{best_strategy.__name__}_Best.html'
+            ),
+            open_browser=True,
+        )
     else:
         console.print(
             '[bold red]Nenhuma estratégia com Sharpe '
@@ -189,8 +292,10 @@ if __name__ == '__main__':
         / 'db'
         / 'BTC_BRL_bitpreco.csv'
     )
-    if data_path.exists():
-        data = load_data(csv_path=data_path)
+    if has_candles('BTC_BRL') or data_path.exists():
+        data = load_data(
+            csv_path=None if has_candles('BTC_BRL') else data_path
+        )
         console.print(f'Dados carregados: {len(data)} registros')
 
         # Executar backtesting comparando múltiplas estratégias
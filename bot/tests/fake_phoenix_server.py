@@ -0,0 +1,152 @@
+"""
+Servidor Phoenix (WebSocket) falso para testar o MarketDataStream sem
+acessar a BitPreço: responde joins e heartbeats, publica eventos 'price'
+no tópico ticker:ALL-BRL e permite derrubar as conexões para testar a
+reconexão.
+
+Uso: python bot/tests/fake_phoenix_server.py
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+import websockets
+
+# Adiciona o diretório raiz ao path para poder importar os módulos do projeto
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+
+class FakePhoenixServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.connections = set()
+        self.heartbeats = 0
+        self.joins = []
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'ws://{self.host}:{self.port}/socket/websocket'
+
+    async def _handler(self, websocket):
+        self.connections.add(websocket)
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message['event'] == 'heartbeat':
+                    self.heartbeats += 1
+                elif message['event'] == 'phx_join':
+                    self.joins.append(message['topic'])
+                else:
+                    continue
+                await websocket.send(
+                    json.dumps({
+                        'event': 'phx_reply',
+                        'topic': message['topic'],
+                        'ref': message['ref'],
+                        'payload': {'status': 'ok', 'response': {}},
+                    })
+                )
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(websocket)
+
+    async def _serve(self):
+        self._server = await websockets.serve(
+            self._handler, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        await self._server.wait_closed()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_until_complete,
+            args=(self._serve(),),
+            daemon=True,
+        )
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._thread.join(timeout=5)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(5)
+
+    def broadcast(self, topic: str, event: str, payload):
+        message = json.dumps({
+            'event': event,
+            'topic': topic,
+            'ref': None,
+            'payload': payload,
+        })
+
+        async def send():
+            for websocket in list(self.connections):
+                await websocket.send(message)
+
+        self._run(send())
+
+    def send_price(self, market: str = 'BTC-BRL', last: float = 100.0):
+        self.broadcast(
+            'ticker:ALL-BRL', 'price', {'market': market, 'last': last}
+        )
+
+    def drop_connections(self):
+        async def close():
+            for websocket in list(self.connections):
+                await websocket.close()
+
+        self._run(close())
+
+
+if __name__ == '__main__':
+    import time
+
+    from bot.apis.market_stream import STATUS_TOPIC, MarketDataStream
+    from bot.logs.config_log import console
+
+    server = FakePhoenixServer().start()
+    stream = MarketDataStream(server.url, heartbeat_interval=0.5)
+    stream.pubsub.subscribe(STATUS_TOPIC, console.print)
+    updates = stream.pubsub.subscribe_queue('ticker:BTC-BRL')
+    stream.start()
+
+    def wait_connected():
+        for _ in range(100):
+            if stream.connected:
+                return True
+            time.sleep(0.05)
+        return False
+
+    assert wait_connected()
+    server.send_price(last=101.5)
+    assert updates.get(timeout=2)['last'] == 101.5  # noqa: PLR2004
+
+    # Queda da conexão: o stream deve reconectar e voltar a receber
+    server.drop_connections()
+    time.sleep(0.2)
+    assert wait_connected()
+    server.send_price(last=102.0)
+    assert updates.get(timeout=2)['last'] == 102.0  # noqa: PLR2004
+
+    time.sleep(1.2)
+    assert server.heartbeats >= 1
+    console.print(
+        f'[green]OK: joins={server.joins} heartbeats={server.heartbeats}'
+        + '[/green]'
+    )
+    stream.stop()
+    server.stop()
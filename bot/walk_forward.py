@@ -0,0 +1,286 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from rich.table import Table
+
+from bot.backtest_vetorizado import (
+    prepare_data,
+    simulate_votes,
+    triple_indicator_signals,
+    vote_metrics,
+    window,
+)
+from bot.estrategias.TripleIndicatoStrategy import TripleIndicator
+from bot.logs.config_log import console
+from bot.otimizador import RESULT_METRICS, SharedOHLCV
+from bot.parametros import WALK_FORWARD_TEST_DAYS, WALK_FORWARD_TRAIN_DAYS
+from db.backtest_results import RESULTS_DB, run_context, save_results
+
+
+def walk_forward_folds(
+    index: pd.DatetimeIndex,
+    train_days: float = WALK_FORWARD_TRAIN_DAYS,
+    test_days: float = WALK_FORWARD_TEST_DAYS,
+    step_days: float | None = None,
+    anchored: bool = False,
+) -> list[dict]:
+    """
+    Divide o histórico em folds: otimização em [início, início + treino)
+    e teste no período seguinte. Os folds avançam `step_days` (padrão: o
+    período de teste, para os testes não se sobreporem). Com
+    anchored=True o treino sempre começa no início do histórico.
+
+    Returns:
+        Folds com as posições {'fold', 'train': (a, b), 'test': (b, c)}
+    """
+    train = pd.Timedelta(days=train_days)
+    test = pd.Timedelta(days=test_days)
+    step = pd.Timedelta(days=step_days or test_days)
+
+    folds = []
+    train_start = index[0]
+    while True:
+        test_start = train_start + train
+        test_end = test_start + test
+        if test_end > index[-1] + (index[-1] - index[-2]):
+            break
+        a, b, c = index.searchsorted([
+            index[0] if anchored else train_start,
+            test_start,
+            test_end,
+        ])
+        if b - a > 1 and c - b > 1:
+            folds.append({
+                'fold': len(folds),
+                'train': (int(a), int(b)),
+                'test': (int(b), int(c)),
+            })
+        train_start += step
+    return folds
+
+
+def _simulate_window(prepared, signals, start, stop, backtest_kwargs):
+    sliced = window(prepared, start, stop)
+    equity, trades = simulate_votes(
+        sliced,
+        signals['long_entry'][start:stop],
+        signals['short_entry'][start:stop],
+        signals['long_exit'][start:stop],
+        signals['short_exit'][start:stop],
+        max(signals['start'] - start, 1),
+        cash=backtest_kwargs.get('cash', 10000),
+        commission=backtest_kwargs.get('commission', 0.0),
+    )
+    return vote_metrics(sliced, equity, trades)
+
+
+def _score(value) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return -math.inf
+    return value if math.isfinite(value) else -math.inf
+
+
+# Estado de cada processo do pool, criado uma vez em _init_worker
+_worker: dict = {}
+
+
+def _init_worker(spec: dict):
+    data, blocks = SharedOHLCV.attach(spec)
+    _worker['blocks'] = blocks
+    _worker['data'] = data
+    _worker['prepared'] = prepare_data(data)
+
+
+def _run_folds(  # noqa: PLR0914
+    folds: list[dict],
+    combinations: list[dict],
+    maximize: str,
+    backtest_kwargs: dict,
+) -> tuple[list[dict], list[tuple]]:
+    """
+    Otimiza e testa um grupo de folds no processo do pool.
+
+    Os sinais de cada combinação são calculados uma vez sobre o histórico
+    todo (indicadores no cache, compartilhados pelas janelas que se
+    sobrepõem) e recortados para o treino de cada fold. O teste usa o
+    run_backtest (backtesting) com os melhores parâmetros do treino, só
+    com os candles do período de teste, como a estratégia operaria.
+
+    Returns:
+        (linhas dos folds, resultados dos testes para o banco)
+    """
+    from bot.tests.backtestRunner import run_backtest  # noqa: PLC0415
+
+    prepared = _worker['prepared']
+    best = {fold['fold']: (-math.inf, None, None) for fold in folds}
+    for params in combinations:
+        signals = triple_indicator_signals(prepared, **params)
+        for fold in folds:
+            metrics = _simulate_window(
+                prepared, signals, *fold['train'], backtest_kwargs
+            )
+            score = _score(metrics[maximize])
+            if best[fold['fold']][1] is None or score > best[fold['fold']][0]:
+                best[fold['fold']] = (score, params, metrics)
+
+    rows, records = [], []
+    index = _worker['data'].index
+    for fold in folds:
+        _, params, train_metrics = best[fold['fold']]
+        (a, b), (_, c) = fold['train'], fold['test']
+        test_data = _worker['data'].iloc[b:c]
+        _, stats = run_backtest(
+            test_data,
+            TripleIndicator,
+            verbose=False,
+            save=False,
+            backtest_params=backtest_kwargs,
+            **params,
+        )
+        test_metrics = {metric: stats[metric] for metric in RESULT_METRICS}
+        rows.append({
+            'fold': fold['fold'],
+            'train_start': index[a],
+            'test_start': index[b],
+            'test_end': index[c - 1],
+            **params,
+            f'train {maximize}': train_metrics[maximize],
+            **test_metrics,
+        })
+        records.append((
+            run_context(test_data, TripleIndicator, **backtest_kwargs),
+            params,
+            test_metrics,
+        ))
+    return rows, records
+
+
+def summarize(folds: pd.DataFrame, maximize: str = 'Sharpe Ratio') -> dict:
+    """Estatísticas agregadas dos períodos de teste (fora da amostra)."""
+    if folds.empty:
+        return {}
+    returns = folds['Return [%]'].astype(float) / 100
+    train = folds[f'train {maximize}'].astype(float)
+    test = folds[maximize].astype(float)
+    return {
+        'Folds': len(folds),
+        'Compounded Return [%]': (np.prod(1 + returns.values) - 1) * 100,
+        'Mean Return [%]': returns.mean() * 100,
+        'Positive Folds [%]': (returns > 0).mean() * 100,
+        f'Mean {maximize}': test.mean(),
+        f'Median {maximize}': test.median(),
+        'Worst Drawdown [%]': folds['Max. Drawdown [%]'].astype(float).min(),
+        '# Trades': int(folds['# Trades'].sum()),
+        # Quanto do resultado do treino se mantém no teste
+        'Walk-Forward Efficiency': (
+            test.mean() / train.mean() if train.mean() else math.nan
+        ),
+    }
+
+
+def walk_forward(  # noqa: PLR0913, PLR0917
+    data: pd.DataFrame,
+    space: dict,
+    train_days: float = WALK_FORWARD_TRAIN_DAYS,
+    test_days: float = WALK_FORWARD_TEST_DAYS,
+    step_days: float | None = None,
+    anchored: bool = False,
+    maximize: str = 'Sharpe Ratio',
+    constraint: Callable[[dict], bool] | None = None,
+    max_workers: int | None = None,
+    results_db: str | None = RESULTS_DB,
+    **backtest_kwargs,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Otimização walk-forward da TripleIndicator: em cada fold, a melhor
+    combinação de `space` na janela de treino (backtest vetorizado) é
+    testada no período seguinte com o backtesting.
+
+    Os folds são divididos entre processos, com os candles em memória
+    compartilhada: os dados são carregados uma vez e cada processo
+    prepara o histórico uma vez para todos os seus folds. Treino e teste
+    usam os mesmos `backtest_kwargs` (cash, commission), sempre com
+    exclusive_orders=True (o único modo do backtest vetorizado). Os
+    testes são gravados em `results_db` (None: não grava).
+
+    Returns:
+        (resultados por fold, estatísticas agregadas dos testes)
+    """
+    if not backtest_kwargs.setdefault('exclusive_orders', True):
+        raise ValueError(
+            'O walk-forward só simula exclusive_orders=True no treino'
+        )
+    folds = walk_forward_folds(
+        data.index, train_days, test_days, step_days, anchored
+    )
+    if not folds:
+        console.print(
+            '[yellow]Histórico curto demais para os folds '
+            + f'({train_days} + {test_days} dias)[/yellow]'
+        )
+        return pd.DataFrame(), {}
+
+    names = list(space)
+    combinations = [
+        params
+        for params in (
+            dict(zip(names, values))
+            for values in itertools.product(*space.values())
+        )
+        if constraint is None or constraint(params)
+    ]
+    workers = min(max_workers or os.cpu_count() or 1, len(folds))
+    # Folds intercalados: cada processo recebe janelas de todo o histórico
+    groups = [folds[i::workers] for i in range(workers)]
+
+    with (
+        SharedOHLCV(data) as shared,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shared.spec,),
+        ) as executor,
+    ):
+        futures = [
+            executor.submit(
+                _run_folds, group, combinations, maximize, backtest_kwargs
+            )
+            for group in groups
+        ]
+        done = [future.result() for future in futures]
+    rows = [row for fold_rows, _ in done for row in fold_rows]
+
+    if results_db is not None:
+        for _, records in done:
+            for context, params, metrics in records:
+                save_results(
+                    context, [(params, metrics)], 'walk_forward', results_db
+                )
+
+    results = pd.DataFrame(rows).sort_values('fold').reset_index(drop=True)
+    return results, summarize(results, maximize)
+
+
+def _format(value) -> str:
+    if isinstance(value, pd.Timestamp):
+        return f'{value:%Y-%m-%d %H:%M}'
+    return f'{value:.2f}' if isinstance(value, float) else str(value)
+
+
+def print_walk_forward(results: pd.DataFrame, summary: dict):
+    columns = ['fold', 'test_start', 'test_end', *RESULT_METRICS[:5]]
+    table = Table(title='Walk-forward (períodos de teste)')
+    for column in columns:
+        table.add_column(column)
+    for row in results[columns].itertuples(index=False):
+        table.add_row(*(_format(value) for value in row))
+    console.print(table)
+    for name, value in summary.items():
+        console.print(f'{name}: {_format(value)}')
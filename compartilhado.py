@@ -1,7 +1,8 @@
 import json
-from typing import Union
-
-import duckdb
+import os
+import threading
+import time
+from typing import Callable, Union
 
 from bot.models.coin_pair import CoinPair, ExchangeType
 from segredos import CAMINHO
@@ -13,8 +14,19 @@ DEFAULT_COINPAIR = 'BTC-BRL'
 DEFAULT_INTERVAL = 30
 
 
+# Catálogo de mercados em cache no disco: evita chamar o Ticker() da
+# BitPreço a cada importação
+MARKETS_CACHE_FILE = CAMINHO + '/markets_cache.json'
+MARKETS_CACHE_TTL = 24 * 60 * 60  # segundos
+
+_markets_lock = threading.Lock()
+_markets_options: list[dict] | None = None
+_markets_fetched_at = 0.0
+_markets_refresh: threading.Thread | None = None
+
+
 # Para criar as opções de coinpair, é necessário importar a API BitPreço
-def coinpair_options():
+def _fetch_coinpair_options() -> list[dict]:
     try:
         from bot.apis.api_bitpreco import Ticker  # noqa: PLC0415
     except ImportError:
@@ -36,26 +48,186 @@ def coinpair_options():
     return options
 
 
-def get_str_coinpairs() -> list[str]:
+def _load_markets_cache() -> bool:
+    global _markets_options, _markets_fetched_at  # noqa: PLW0603
     try:
-        query = f"SELECT coinpair FROM '{COINPAIR_FILE}'"
-        result = duckdb.query(query).fetchone()
-        if result and result[0]:
-            if isinstance(result[0], str):
-                return [result[0]]
-            return result[0]
-        return [DEFAULT_COINPAIR]
+        with open(MARKETS_CACHE_FILE, encoding='utf-8') as f:
+            cache = json.load(f)
+        _markets_options = cache['options']
+        _markets_fetched_at = float(cache['fetched_at'])
+        return True
+    except (FileNotFoundError, KeyError, ValueError, TypeError):
+        return False
+
+
+def refresh_coinpair_options() -> list[dict]:
+    """Busca o catálogo de mercados na API e atualiza o cache no disco."""
+    global _markets_options, _markets_fetched_at  # noqa: PLW0603
+    options = _fetch_coinpair_options()
+    fetched_at = time.time()
+    tmp_file = MARKETS_CACHE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'fetched_at': fetched_at, 'options': options}, f)
+    os.replace(tmp_file, MARKETS_CACHE_FILE)
+    with _markets_lock:
+        _markets_options, _markets_fetched_at = options, fetched_at
+    return options
+
+
+def _refresh_in_background():
+    global _markets_refresh  # noqa: PLW0603
+
+    def run():
+        try:
+            refresh_coinpair_options()
+        except Exception as e:
+            print(f'Erro ao atualizar o catálogo de mercados: {e}')
+
+    if _markets_refresh is None or not _markets_refresh.is_alive():
+        _markets_refresh = threading.Thread(
+            target=run, name='markets-refresh', daemon=True
+        )
+        _markets_refresh.start()
+
+
+def coinpair_options() -> list[dict]:
+    """
+    Opções de pares de moedas (mercados BRL da BitPreço).
+
+    Usa o cache em memória/disco; se o cache estiver vencido, devolve o
+    valor atual e atualiza em segundo plano. A API só é chamada de forma
+    síncrona quando não há cache algum, e sem rede cai no par padrão.
+    """
+    with _markets_lock:
+        if _markets_options is None:
+            _load_markets_cache()
+        options = _markets_options
+        if (
+            options is not None
+            and time.time() - _markets_fetched_at > MARKETS_CACHE_TTL
+        ):
+            _refresh_in_background()
+
+    if options is not None:
+        return options
+    try:
+        return refresh_coinpair_options()
     except Exception as e:
-        print(f'Erro ao ler {COINPAIR_FILE} com DuckDB: {e}')
-        return [DEFAULT_COINPAIR]
+        print(f'Catálogo de mercados indisponível, usando o padrão: {e}')
+        coin = DEFAULT_COINPAIR.split('-', maxsplit=1)[0]
+        return [{'value': DEFAULT_COINPAIR, 'label': f'{coin} para Real'}]
+
+
+class ConfigFile:
+    """
+    Arquivo JSON de configuração mantido em memória: só é relido quando o
+    mtime (ou o tamanho) do arquivo muda. Quem se inscreve recebe o novo
+    valor sempre que ele mudar.
+    """
+
+    def __init__(self, path: str, parse: Callable[[dict], object], default):
+        self.path = path
+        self._parse = parse
+        self._default = default
+        self._lock = threading.Lock()
+        self._stat = None
+        self._value = default
+        self._callbacks: list[Callable] = []
+
+    def subscribe(self, callback: Callable):
+        """Inscreve `callback(valor)`; retorna a função que cancela."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return unsubscribe
+
+    def get(self):
+        try:
+            st = os.stat(self.path)
+            stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stat = None
+
+        with self._lock:
+            if stat == self._stat:
+                return self._value
+            previous = self._value
+            value = self._default
+            if stat is not None:
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        value = self._parse(json.load(f))
+                except Exception as e:
+                    # Arquivo sendo escrito: tenta de novo na próxima leitura
+                    print(f'Erro ao ler {self.path}: {e}')
+                    return previous
+            self._stat, self._value = stat, value
+            callbacks = list(self._callbacks) if value != previous else []
+
+        for callback in callbacks:
+            try:
+                callback(value)
+            except Exception as e:
+                print(f'Erro no assinante de {self.path}: {e}')
+        return value
+
+
+def _parse_coinpairs(data: dict) -> list[str]:
+    coinpairs = data.get('coinpair')
+    if isinstance(coinpairs, str):
+        return [coinpairs]
+    return list(coinpairs) if coinpairs else [DEFAULT_COINPAIR]
+
+
+def _parse_interval(data: dict) -> int:
+    interval = data.get('interval')
+    if isinstance(interval, int) and interval > 0:
+        return interval
+    return DEFAULT_INTERVAL
+
+
+coinpair_config = ConfigFile(
+    COINPAIR_FILE, _parse_coinpairs, [DEFAULT_COINPAIR]
+)
+interval_config = ConfigFile(INTERVAL_FILE, _parse_interval, DEFAULT_INTERVAL)
+
+_config_watcher: threading.Thread | None = None
+
+
+def watch_config(poll_interval: float = 1.0):
+    """
+    Verifica os arquivos de configuração em segundo plano, para que os
+    assinantes sejam avisados das mudanças mesmo sem novas leituras.
+    """
+    global _config_watcher  # noqa: PLW0603
+
+    def run():
+        while True:
+            coinpair_config.get()
+            interval_config.get()
+            time.sleep(poll_interval)
+
+    if _config_watcher is None or not _config_watcher.is_alive():
+        _config_watcher = threading.Thread(
+            target=run, name='config-watcher', daemon=True
+        )
+        _config_watcher.start()
+
+
+def get_str_coinpairs() -> list[str]:
+    return list(coinpair_config.get())
 
 
 def get_str_coinpair() -> str:
     return get_str_coinpairs()[0]
 
 
-def get_coinpairs() -> list[CoinPair]:
-    coinpairs = get_str_coinpairs()
+def coinpairs_from_str(coinpairs: list[str]) -> list[CoinPair]:
     result = []
     for pair in coinpairs:
         base, quote = pair.split('-')
@@ -65,6 +237,10 @@ def get_coinpairs() -> list[CoinPair]:
     return result
 
 
+def get_coinpairs() -> list[CoinPair]:
+    return coinpairs_from_str(get_str_coinpairs())
+
+
 def get_coinpair() -> CoinPair:
     return get_coinpairs()[0]
 
@@ -101,23 +277,8 @@ def set_coinpairs(coinpairs: Union[str, list[str]]) -> bool:
 set_coinpair = set_coinpairs
 
 
-def get_interval():
-    try:
-        # Consulta SQL para extrair o interval do arquivo JSON
-        query = f"SELECT interval FROM '{INTERVAL_FILE}'"
-        result = duckdb.query(query).fetchone()
-        if (
-            result
-            and result[0]
-            and isinstance(result[0], int)
-            and result[0] > 0
-        ):
-            return result[0]
-        else:
-            return DEFAULT_INTERVAL
-    except Exception as e:
-        print(f'Erro ao ler {INTERVAL_FILE} com DuckDB: {e}')
-        return DEFAULT_INTERVAL
+def get_interval() -> int:
+    return interval_config.get()
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 # Importando as bibliotecas necessárias
+import datetime
 import json
 import traceback
 
@@ -8,6 +9,7 @@ import plotly.graph_objects as go
 import plotly.io as pio
 from dash import (
     ALL,
+    MATCH,
     Input,
     Output,
     Patch,
@@ -25,11 +27,12 @@ from compartilhado import (
     get_str_coinpairs,
     set_coinpairs,
 )
-from dashboard import app, dash_utils
+from dashboard import app, dash_utils, snapshot
 from dashboard.componentes_personalizados import (
     bar_precos_atuais,
 )
-from db.duckdb_csv import load_csv_in_records
+from db.duckdb_csv import csv_page
+from db.json_csv import TICKER_SOURCES, load_ticker_history
 
 # from crypto.timescaledb import read_from_db
 from segredos import CAMINHO
@@ -82,8 +85,13 @@ def update_refresh_rate_dash(value):
 def update_df_precos(_):
     # df_precos = pd.read_csv(PRICE_FILE)
     # return df_precos.to_dict('records')
-    # Leitura do arquivo CSV usando DuckDB
-    return load_csv_in_records(PRICE_FILE)
+    # Só as últimas linhas de cada mercado (preços atuais): o histórico é
+    # paginado no servidor. A compactação mantém as linhas mais recentes
+    # no diário, então basta lê-lo; as partições parquet só entram com o
+    # diário vazio
+    return snapshot.latest_records([PRICE_FILE]) or snapshot.latest_records(
+        TICKER_SOURCES
+    )
 
 
 @app.callback(
@@ -96,7 +104,7 @@ def update_df_executed_orders(n_intervals):
     coinpairs = get_str_coinpairs()
     executed_orders_df = pd.DataFrame()
     for coinpair in coinpairs:
-        executed_order_df = pd.read_csv(
+        executed_order_df = snapshot.read_csv(
             CAMINHO + f'/executed_orders_{coinpair}.csv'
         )
         # Adicionando uma coluna com o nome do coinpair
@@ -113,7 +121,7 @@ def update_df_executed_orders(n_intervals):
     Input('interval-component-dash', 'n_intervals'),
 )
 def update_df_balance(n_intervals):
-    balance_df = pd.read_csv(BALANCE_FILE).to_dict('records')
+    balance_df = snapshot.read_csv(BALANCE_FILE).to_dict('records')
     return balance_df
 
 
@@ -163,7 +171,11 @@ def update_tab_icons(df_precos, df_executed_orders):
     df_precos = pd.DataFrame(df_precos)
     df_executed_orders = pd.DataFrame(df_executed_orders)
 
-    # Lógica para o ícone de Preços
+    # Lógica para o ícone de Preços: último e penúltimo preço do mercado
+    # mais recente
+    if 'market' in df_precos.columns and not df_precos.empty:
+        market = df_precos['market'].iloc[-1]
+        df_precos = df_precos[df_precos['market'] == market]
     last_price = df_precos['last'].iloc[-1] if not df_precos.empty else 0
     prev_price = (
         df_precos['last'].iloc[-2] if len(df_precos) > 1 else last_price
@@ -197,9 +209,95 @@ def preco_atuais(
     )
 
 
+# Tabelas paginadas no servidor: table_id -> CSVs, colunas exibidas e
+# ordenação inicial. O navegador recebe só a página visível; a ordenação
+# e a paginação são feitas pelo DuckDB (db.duckdb_csv.csv_page).
+_tabelas: dict[str, dict] = {}
+
+
+def _valor_celula(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return str(value)
+    return value
+
+
+def _cabecalho_tabela(columns, table_id, sortable):
+    if not sortable:
+        return columns
+    # Adicionar ícones para ordenação das colunas
+    return [
+        html.Div(
+            [
+                html.Span(col),
+                html.Span(
+                    DashIconify(icon='mdi:sort', width=16),
+                    style={'marginLeft': '5px', 'cursor': 'pointer'},
+                    id={
+                        'type': 'sort-icon',
+                        'column': col,
+                        'table': table_id,
+                    },
+                ),
+            ],
+            style={'display': 'flex', 'alignItems': 'center'},
+        )
+        for col in columns
+    ]
+
+
+def _pagina_tabela(table_id, estado, page):
+    """
+    Consulta a página `page` da tabela. Para a página seguinte ou anterior
+    a consulta parte da chave da primeira/última linha da página atual.
+    """
+    tabela = _tabelas[table_id]
+    rows_per_page = estado['rows_per_page']
+    current = estado.get('page')
+    result = csv_page(
+        tabela['paths'],
+        sort_column=estado.get('sort_column'),
+        ascending=estado.get('ascending', True),
+        limit=rows_per_page,
+        offset=(page - 1) * rows_per_page,
+        after=estado.get('last') if current == page - 1 else None,
+        before=estado.get('first') if current == page + 1 else None,
+    )
+
+    # Ocultar colunas e aplicar a ordem preferida
+    hidden = set(tabela['hidden_columns'] or [])
+    columns = [col for col in result['columns'] if col not in hidden]
+    order = tabela['column_order'] or []
+    columns = [col for col in order if col in columns] + [
+        col for col in columns if col not in order
+    ]
+    positions = [result['columns'].index(col) for col in columns]
+    body = [
+        [_valor_celula(row[index]) for index in positions]
+        for row in result['rows']
+    ]
+
+    total_rows = result['total']
+    start = (page - 1) * rows_per_page
+    estado = {
+        **estado,
+        'page': page,
+        'total_rows': total_rows,
+        # Chaves guardadas como texto (JSON); o DuckDB converte de volta
+        'first': [_valor_celula(v) for v in result['first'] or []] or None,
+        'last': [_valor_celula(v) for v in result['last'] or []] or None,
+    }
+    info = (
+        f'Mostrando {min(start + 1, total_rows)}-'
+        + f'{min(start + len(body), total_rows)} de {total_rows}'
+    )
+    return columns, body, estado, info
+
+
 # Função utilitária para criar tabelas dmc padronizadas com paginação, ordenação e ocultação de colunas  # noqa: E501
-def criar_tabela_dmc(  # noqa: PLR0913, PLR0917
-    df,
+def criar_tabela_dmc(  # noqa: PLR0913, PLR0914, PLR0917
+    paths,
     caption='Tabela de dados',
     table_id=None,
     striped=True,
@@ -214,12 +312,18 @@ def criar_tabela_dmc(  # noqa: PLR0913, PLR0917
     pagination_size='sm',
     # Parâmetros de ordenação
     sortable=True,
+    sort_column=None,
+    ascending=True,
     # Parâmetros de ocultação de colunas
     hidden_columns=None,
+    column_order=None,
+    estado=None,
 ):
     """
-    Cria uma tabela dmc padronizada a partir de um DataFrame com opções de paginação,
-    ordenação e ocultação de colunas.
+    Cria uma tabela dmc padronizada a partir de CSV(s) com opções de paginação,
+    ordenação e ocultação de colunas. Os dados ficam no servidor: a tabela
+    recebe só a página visível. `estado` (do Store da tabela) mantém a
+    página e a ordenação entre atualizações.
     """  # noqa: E501
     # Gerar IDs únicos se não fornecidos
     if table_id is None:
@@ -227,130 +331,35 @@ def criar_tabela_dmc(  # noqa: PLR0913, PLR0917
 
         table_id = f'table-{str(uuid.uuid4())[:8]}'
 
-    # Ocultar colunas se especificado
-    if hidden_columns:
-        df = df.drop(
-            columns=[col for col in hidden_columns if col in df.columns]
-        )
-
-    # Preparar os dados para dmc.Table
-    head = df.columns.tolist()
-
-    # Implementação da paginação
-    if with_pagination:
-        total_rows = len(df)
-        total_pages = max(1, (total_rows + rows_per_page - 1) // rows_per_page)
-
-        # IDs específicos para os componentes de paginação
-        pagination_id = f'{table_id}-pagination'
-        pagination_info_id = f'{table_id}-pagination-info'
-        data_store_id = f'{table_id}-data-store'
-
-        # Mostrar apenas a primeira página inicialmente
-        body = df.iloc[:rows_per_page].values.tolist() if not df.empty else []
-
-        # Store para os dados completos e estado da paginação
-        store_component = dcc.Store(
-            id=data_store_id,
-            data={
-                'data': df.to_dict('records'),
-                'current_page': 1,
-                'rows_per_page': rows_per_page,
-                'total_rows': total_rows,
-            },
-        )
-
-        # Componente de paginação
-        pagination_component = dmc.Group(
-            justify='space-between',
-            align='center',
-            mt='md',
-            mb='md',
-            children=[
-                dmc.Text(
-                    id=pagination_info_id,
-                    size='sm',
-                    children=f'Mostrando 1-{min(rows_per_page, total_rows)} de {total_rows}',  # noqa: E501
-                ),
-                dmc.Pagination(
-                    id=pagination_id,
-                    total=total_pages,
-                    value=1,
-                    size=pagination_size,
-                    withEdges=True,
-                    siblings=1,
-                    boundaries=1,
-                ),
-            ],
-        )
-
-        # Registrar callback para essa tabela específica
-        @app.callback(
-            [Output(table_id, 'data'), Output(pagination_info_id, 'children')],
-            [Input(pagination_id, 'value')],
-            [State(data_store_id, 'data')],
-        )
-        def update_table_page(page, stored_data):
-            if not page or not stored_data:
-                return no_update, no_update
-
-            df_records = stored_data['data']
-            rows_per_page = stored_data['rows_per_page']
-            total_rows = stored_data['total_rows']
-
-            # Calcular índices para a página atual
-            start_idx = (page - 1) * rows_per_page
-            end_idx = min(start_idx + rows_per_page, total_rows)
-
-            # Criar DataFrame temporário para selecionar a página
-            df_temp = pd.DataFrame(df_records)
-
-            # Dados para a página atual
-            page_data = {
-                'head': head,
-                'body': df_temp.iloc[start_idx:end_idx].values.tolist()
-                if not df_temp.empty
-                else [],
-                'caption': caption,
-            }
-
-            # Atualizar informações de paginação
-            info_text = f'Mostrando {start_idx + 1}-{end_idx} de {total_rows}'
-
-            return page_data, info_text
-
-    else:
-        body = df.values.tolist()
-        pagination_component = None
-        store_component = None
-
-    # Adicionar ícones para ordenação das colunas se sortable=True
-    if sortable:
-        head_with_sort = []
-        for col in head:
-            head_with_sort.append(
-                html.Div(
-                    [
-                        html.Span(col),
-                        html.Span(
-                            DashIconify(icon='mdi:sort', width=16),
-                            style={'marginLeft': '5px', 'cursor': 'pointer'},
-                            id={
-                                'type': 'sort-icon',
-                                'column': col,
-                                'table': table_id,
-                            },
-                        ),
-                    ],
-                    style={'display': 'flex', 'alignItems': 'center'},
-                )
-            )
-        head = head_with_sort
+    _tabelas[table_id] = {
+        'paths': paths,
+        'hidden_columns': hidden_columns,
+        'column_order': column_order,
+        'sortable': sortable,
+    }
+    if not with_pagination:
+        # Sem paginação: todas as linhas em uma única página
+        rows_per_page = 2**31 - 1
+    if estado is None:
+        estado = {
+            'sort_column': sort_column,
+            'ascending': ascending,
+            'rows_per_page': rows_per_page,
+        }
+    page = estado.get('page') or 1
+    # Atualização: a página é consultada de novo pelo OFFSET
+    estado = {**estado, 'page': None}
+    head, body, estado, info = _pagina_tabela(table_id, estado, page)
+
+    # Store com o estado da paginação e da ordenação (sem os dados)
+    components = [
+        dcc.Store(id={'type': 'tabela-estado', 'table': table_id}, data=estado)
+    ]
 
     # Criar a tabela com estilização aprimorada
     table = dmc.Table(
         data={
-            'head': head,
+            'head': _cabecalho_tabela(head, table_id, sortable),
             'body': body,
             'caption': caption,
         },
@@ -360,29 +369,48 @@ def criar_tabela_dmc(  # noqa: PLR0913, PLR0917
         withColumnBorders=with_column_borders,
         verticalSpacing=vertical_spacing,
         horizontalSpacing=horizontal_spacing,
-        id=table_id,
+        id={'type': 'tabela', 'table': table_id},
     )
 
-    # Montar componentes finais em um container responsivo
-    components = []
-
-    if store_component:
-        components.append(store_component)
-
     # Container com scroll horizontal para tabelas grandes
-    table_container = html.Div(
-        table,
-        style={
-            'overflowX': 'auto',
-            'width': '100%',
-            'minWidth': '100%',
-        },
+    components.append(
+        html.Div(
+            table,
+            style={
+                'overflowX': 'auto',
+                'width': '100%',
+                'minWidth': '100%',
+            },
+        )
     )
 
-    components.append(table_container)
-
-    if pagination_component:
-        components.append(pagination_component)
+    # Componente de paginação
+    if with_pagination:
+        total_pages = max(1, -(-estado['total_rows'] // rows_per_page))
+        components.append(
+            dmc.Group(
+                justify='space-between',
+                align='center',
+                mt='md',
+                mb='md',
+                children=[
+                    dmc.Text(
+                        id={'type': 'tabela-info', 'table': table_id},
+                        size='sm',
+                        children=info,
+                    ),
+                    dmc.Pagination(
+                        id={'type': 'tabela-paginacao', 'table': table_id},
+                        total=total_pages,
+                        value=page,
+                        size=pagination_size,
+                        withEdges=True,
+                        siblings=1,
+                        boundaries=1,
+                    ),
+                ],
+            )
+        )
 
     # Container final com largura responsiva
     return html.Div(
@@ -395,50 +423,98 @@ def criar_tabela_dmc(  # noqa: PLR0913, PLR0917
     )
 
 
+def _estado_tabela(estados, ids, table_id):
+    """Estado atual (Store) da tabela `table_id`, se ela já existe."""
+    for estado, id_ in zip(estados, ids):
+        if id_['table'] == table_id:
+            return estado
+    return None
+
+
+# Callback de paginação e ordenação de todas as tabelas
+@app.callback(
+    Output({'type': 'tabela', 'table': MATCH}, 'data'),
+    Output({'type': 'tabela-info', 'table': MATCH}, 'children'),
+    Output({'type': 'tabela-paginacao', 'table': MATCH}, 'total'),
+    Output({'type': 'tabela-paginacao', 'table': MATCH}, 'value'),
+    Output({'type': 'tabela-estado', 'table': MATCH}, 'data'),
+    Input({'type': 'tabela-paginacao', 'table': MATCH}, 'value'),
+    Input({'type': 'sort-icon', 'column': ALL, 'table': MATCH}, 'n_clicks'),
+    State({'type': 'tabela', 'table': MATCH}, 'data'),
+    State({'type': 'tabela-estado', 'table': MATCH}, 'data'),
+    prevent_initial_call=True,
+)
+def atualizar_pagina_tabela(page, _, table_data, estado):
+    """
+    Consulta a página pedida ou, ao clicar em um ícone de ordenação,
+    ordena pela coluna (alternando a direção) e volta à primeira página.
+    """
+    table_id = ctx.triggered_id['table']
+    if table_id not in _tabelas or not estado:
+        return (no_update,) * 5
+
+    if ctx.triggered_id['type'] == 'sort-icon':
+        column = ctx.triggered_id['column']
+        ascending = not (
+            estado.get('sort_column') == column and estado.get('ascending')
+        )
+        estado = {
+            **estado,
+            'sort_column': column,
+            'ascending': ascending,
+            'page': None,
+        }
+        page = 1
+    elif not page:
+        return (no_update,) * 5
+
+    head, body, estado, info = _pagina_tabela(table_id, estado, page)
+    total_pages = max(1, -(-estado['total_rows'] // estado['rows_per_page']))
+    data = {
+        'head': _cabecalho_tabela(
+            head, table_id, _tabelas[table_id]['sortable']
+        ),
+        'body': body,
+        'caption': table_data.get('caption') if table_data else None,
+    }
+    return data, info, total_pages, page, estado
+
+
 # Callback para adicionar o conteúdo da página dentro do tab Preços
 # - Usando o dmc.Table
 @app.callback(
     Output('historico-tabela-container', 'children'),
-    Input('df-precos', 'data'),
+    Input('interval-component-dash', 'n_intervals'),
+    State({'type': 'tabela-estado', 'table': ALL}, 'data'),
+    State({'type': 'tabela-estado', 'table': ALL}, 'id'),
     prevent_initial_call=True,
 )
-def tabela_historico(df1):
+def tabela_historico(_, estados, ids):
     try:
-        df1 = pd.DataFrame(df1)
-        # Deleted columns success
-        if 'success' in df1.columns:
-            df1.drop(['success'], axis=1, inplace=True)
-
-        # Reordered columns
-        desired_column_order = [
-            'timestamp',
-            'last',
-            'var',
-            'vol',
-            'high',
-            'low',
-            'buy',
-            'sell',
-            'market',
-        ]
-        available_columns = [
-            col for col in desired_column_order if col in df1.columns
-        ]
-        other_columns = [
-            col for col in df1.columns if col not in desired_column_order
-        ]
-        final_column_order = available_columns + other_columns
-        df1 = df1[final_column_order]
-
-        df1 = df1.sort_values(
-            by='timestamp', ascending=False, na_position='last'
-        )
-
         # Usar a função utilitária para criar
         # a tabela com paginação e ordenação
+        # Histórico compactado (parquet) e diário, paginados juntos
         table = criar_tabela_dmc(
-            df1,
+            TICKER_SOURCES,
             caption='Histórico de preços por mercado',
+            table_id='historico-precos',
+            sort_column='timestamp',
+            ascending=False,
+            # Deleted columns success
+            hidden_columns=['success'],
+            # Reordered columns
+            column_order=[
+                'timestamp',
+                'last',
+                'var',
+                'vol',
+                'high',
+                'low',
+                'buy',
+                'sell',
+                'market',
+            ],
+            estado=_estado_tabela(estados, ids, 'historico-precos'),
         )
 
         return [table]
@@ -458,11 +534,11 @@ def tabela_historico(df1):
 @app.callback(
     Output('download-csv', 'data'),
     Input('download-csv-button', 'n_clicks'),
-    State('df-precos', 'data'),
     prevent_initial_call=True,
 )
-def download_csv(n_clicks, data):
-    df = pd.DataFrame(data)
+def download_csv(n_clicks):
+    # Histórico completo lido no servidor (parquet e diário)
+    df = load_ticker_history()
     return dcc.send_data_frame(df.to_csv, 'historico_precos.csv', index=False)
 
 
@@ -472,9 +548,11 @@ def download_csv(n_clicks, data):
     Input('df-executed-orders', 'data'),
     Input('df-balance', 'data'),
     Input('df-precos', 'data'),
+    State({'type': 'tabela-estado', 'table': ALL}, 'data'),
+    State({'type': 'tabela-estado', 'table': ALL}, 'id'),
     prevent_initial_call=True,
 )
-def ordens_tab(executed_orders_df, balance_df, df_precos):
+def ordens_tab(executed_orders_df, balance_df, df_precos, estados, ids):
     try:
         executed_orders_df = pd.DataFrame(executed_orders_df)
         # Criando um Gráfico de anel para o balance da minha conta
@@ -542,8 +620,13 @@ def ordens_tab(executed_orders_df, balance_df, df_precos):
 
         # Usar a função utilitária para criar a tabela com paginação
         table = criar_tabela_dmc(
-            executed_orders_df,
+            [
+                CAMINHO + f'/executed_orders_{coinpair}.csv'
+                for coinpair in get_str_coinpairs()
+            ],
             caption='Histórico de ordens executadas',
+            table_id='ordens-executadas',
+            estado=_estado_tabela(estados, ids, 'ordens-executadas'),
         )
         return [
             dmc.CardSection(
@@ -628,7 +711,7 @@ def atualizar_preco_compra_input(df_precos, selected_markets):
             df_precos['market'].str.upper() == primary_market
         ]
         if not filtered_df.empty:
-            return filtered_df['last'].iloc[0]
+            return filtered_df['last'].iloc[-1]
 
     # Caso contrário, use o último preço disponível
     return df_precos['last'].iloc[-1]
@@ -655,7 +738,7 @@ def atualizar_preco_venda_input(df_precos, selected_markets):
             df_precos['market'].str.upper() == primary_market
         ]
         if not filtered_df.empty:
-            return filtered_df['last'].iloc[0]
+            return filtered_df['last'].iloc[-1]
 
     # Caso contrário, use o último preço disponível
     return df_precos['last'].iloc[-1]
@@ -832,55 +915,6 @@ def toggle_aside(opened, aside):
     return aside
 
 
-# Callback para ordenação de tabela
-@app.callback(
-    Output({'type': 'table', 'id': ALL}, 'data'),
-    Input({'type': 'sort-icon', 'column': ALL, 'table': ALL}, 'n_clicks'),
-    State({'type': 'table-data', 'id': ALL}, 'data'),
-    prevent_initial_call=True,
-)
-def sort_table(n_clicks, stored_data):
-    """
-    Ordena a tabela quando um ícone de ordenação é clicado.
-    """
-    # Identificar qual coluna foi clicada para ordenação
-    if not ctx.triggered:
-        return no_update
-
-    trigger = ctx.triggered[0]['prop_id']
-    if not trigger:
-        return no_update
-
-    # Extrair coluna e tabela do ID
-    trigger_dict = json.loads(trigger.split('.')[0])
-    column = trigger_dict.get('column')
-    table_id = trigger_dict.get('table')
-
-    # Encontrar os dados da tabela correta
-    for i, data in enumerate(stored_data):
-        if data and data.get('table_id') == table_id:
-            df = pd.DataFrame(data['df'])
-
-            # Verificar direção atual de ordenação e alternar
-            if data.get('sort_column') == column and data.get(
-                'sort_ascending'
-            ):
-                df = df.sort_values(by=column, ascending=False)
-                data['sort_ascending'] = False
-            else:
-                df = df.sort_values(by=column, ascending=True)
-                data['sort_column'] = column
-                data['sort_ascending'] = True
-
-            # Atualizar dados
-            data['df'] = df.to_dict('records')
-
-            # Retornar dados atualizados
-            return [data]
-
-    return no_update
-
-
 # Adaptar o callback de ordenação para trabalhar com a nova estrutura
 @app.callback(
     Output({'type': 'sort-icon', 'column': ALL, 'table': ALL}, 'style'),
@@ -1,8 +1,44 @@
+import uuid
+from collections import OrderedDict
+
 import dash_chart_editor as dce
 import dash_mantine_components as dmc
+import numpy as np
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
-from dash import ALL, Dash, Input, Output, Patch, State, ctx, dcc, no_update
+from dash import (
+    ALL,
+    MATCH,
+    Dash,
+    Input,
+    Output,
+    Patch,
+    State,
+    ctx,
+    dcc,
+    no_update,
+)
+
+# Cursores de atualização incremental mantidos no servidor
+MAX_CURSORS = 256
+
+
+def _point_paths(trace: dict, size: int, prefix=()):
+    """Caminhos das propriedades do trace com um valor por ponto."""
+    for key, value in trace.items():
+        if isinstance(value, dict):
+            yield from _point_paths(value, size, (*prefix, key))
+        elif (
+            isinstance(value, (list, tuple, np.ndarray)) and len(value) == size
+        ):
+            yield (*prefix, key)
+
+
+def _value_at(trace: dict, path):
+    for key in path:
+        trace = trace[key]
+    return trace
 
 
 class ChartEditor:
@@ -20,6 +56,9 @@ class ChartEditor:
         initial_cards=0,
         update_interval_id=None,
         data_update_function=None,
+        zoom_timezone=None,
+        incremental=False,
+        max_incremental_points=300,
     ):
         """
         Inicializa o editor de gráficos
@@ -41,6 +80,21 @@ class ChartEditor:
             intervalo para atualização periódica
             data_update_function: Função que retorna
             dados atualizados quando chamada
+            zoom_timezone: Fuso dos horários exibidos no eixo x. Ao dar zoom
+            em um gráfico, os dados do período são buscados de novo (em
+            resolução completa) com start_date/end_date nesse fuso
+            incremental: Se True, a atualização periódica envia só os
+            pontos novos de cada gráfico (Patch), a partir de um cursor
+            guardado no servidor. A data_update_function deve aceitar
+            `since` e, com ele, retornar figuras só com os pontos a partir
+            de `since`. As figuras completas são enviadas apenas na
+            primeira vez, quando update_data_params muda (indicadores,
+            tamanho do período), após max_incremental_points pontos
+            acrescentados ou quando a figura foi reduzida
+            (layout.meta['downsampled']): o último grupo agregado não pode
+            ser revisado com os pontos brutos
+            max_incremental_points: Pontos acrescentados a um gráfico
+            antes de reconstruí-lo (nova redução, pontos antigos removidos)
         """
         self.app = app
         self.instance_id = instance_id
@@ -60,6 +114,13 @@ class ChartEditor:
         self.update_interval_id = update_interval_id
         self.data_update_function = data_update_function
         self.update_data_params = {}  # Adicionar o atributo update_data_params
+        self.zoom_timezone = zoom_timezone
+        self.incremental = incremental
+        self.max_incremental_points = max_incremental_points
+        # Cursor de cada gráfico enviado ao navegador, pelo token guardado
+        # no card: o que o cliente já tem de cada trace e o período com
+        # zoom do gráfico
+        self.cursors = OrderedDict()
 
         # Inicializa os títulos
         if figure_titles and not isinstance(figure_titles, list):
@@ -83,6 +144,8 @@ class ChartEditor:
             'dynamic_delete': f'{self.container_id}-dynamic-delete',
             'dynamic_output': f'{self.container_id}-dynamic-output',
             'dynamic_card': f'{self.container_id}-dynamic-card',
+            'dynamic_cursor': f'{self.container_id}-dynamic-cursor',
+            'data_cursor': f'{self.container_id}-data-cursor',
         }
 
         # Cria os componentes
@@ -91,6 +154,10 @@ class ChartEditor:
         self.figures_store = dcc.Store(
             id=self.component_ids['figures_store'], data=self.default_figures
         )
+        # Último timestamp dos dados do editor enviados a este cliente
+        self.data_cursor = dcc.Store(
+            id=self.component_ids['data_cursor'], data=None
+        )
 
         # Registra as callbacks
         self._register_callbacks()
@@ -208,6 +275,14 @@ class ChartEditor:
                         figure=default_fig,  # Usa a figura selecionada
                     )
                 ),
+                # Token do cursor da atualização incremental deste gráfico
+                dcc.Store(
+                    id={
+                        'type': self.component_ids['dynamic_cursor'],
+                        'index': n_clicks,
+                    },
+                    data=None,
+                ),
             ],
             withBorder=True,
             shadow='sm',
@@ -221,7 +296,7 @@ class ChartEditor:
             },
         )
 
-    def _register_callbacks(self):
+    def _register_callbacks(self):  # noqa: PLR0915
         @self.app.callback(
             Output(self.container_id, 'children'),
             Input(self.component_ids['add_chart'], 'n_clicks'),
@@ -375,6 +450,8 @@ class ChartEditor:
                         figs[i]['props']['children'][1]['props']['children'][
                             'props'
                         ]['figure'] = f
+                        # Figura editada: descarta o cursor incremental
+                        figs[i]['props']['children'][2]['props']['data'] = None
                         figure = dce.chartToPython(f, self.df1)
                         return figs, str(figure)
             return no_update, no_update
@@ -397,6 +474,15 @@ class ChartEditor:
                     'dataSources',
                     allow_duplicate=True,
                 ),
+                Output(
+                    {
+                        'type': self.component_ids['dynamic_cursor'],
+                        'index': ALL,
+                    },
+                    'data',
+                    allow_duplicate=True,
+                ),
+                Output(self.component_ids['data_cursor'], 'data'),
                 Input(self.update_interval_id, 'n_intervals'),
                 State(
                     {
@@ -405,11 +491,22 @@ class ChartEditor:
                     },
                     'id',
                 ),
+                State(
+                    {
+                        'type': self.component_ids['dynamic_cursor'],
+                        'index': ALL,
+                    },
+                    'data',
+                ),
+                State(self.component_ids['data_cursor'], 'data'),
                 prevent_initial_call=True,
             )
-            def update_data_periodically(n_intervals, ids):
+            def update_data_periodically(n_intervals, ids, tokens, sent):
                 if n_intervals is None or self.data_update_function is None:
-                    return no_update, no_update, no_update
+                    return (no_update,) * 5
+
+                if self.incremental:
+                    return self._incremental_update(ids, tokens, sent)
 
                 # Obter dados atualizados usando os parâmetros de data
                 updated_data_source, updated_figures = (
@@ -423,15 +520,313 @@ class ChartEditor:
                 if updated_figures is not None:
                     self.default_figures = updated_figures
 
-                    # Atualizar todos os gráficos existentes
+                    # Atualizar todos os gráficos existentes; os gráficos
+                    # com zoom mantêm o período escolhido
                     updated_graphs = []
                     for i in range(len(ids)):
-                        fig_index = ids[i]['index'] % len(updated_figures)
-                        updated_graphs.append(updated_figures[fig_index])
+                        index = ids[i]['index']
+                        figure = None
+                        zoom = self._zoom_range(tokens[i])
+                        if zoom is not None:
+                            figure = self._zoomed_figure(index, zoom)
+                        if figure is None:
+                            figure = updated_figures[
+                                index % len(updated_figures)
+                            ]
+                        updated_graphs.append(figure)
+
+                    return (
+                        updated_figures,
+                        updated_graphs,
+                        self.data_source,
+                        no_update,
+                        no_update,
+                    )
 
-                    return updated_figures, updated_graphs, self.data_source
+                return (no_update,) * 5
 
-                return no_update, no_update, no_update
+            @self.app.callback(
+                Output(
+                    {
+                        'type': self.component_ids['dynamic_output'],
+                        'index': MATCH,
+                    },
+                    'figure',
+                    allow_duplicate=True,
+                ),
+                Output(
+                    {
+                        'type': self.component_ids['dynamic_cursor'],
+                        'index': MATCH,
+                    },
+                    'data',
+                    allow_duplicate=True,
+                ),
+                Input(
+                    {
+                        'type': self.component_ids['dynamic_output'],
+                        'index': MATCH,
+                    },
+                    'relayoutData',
+                ),
+                State(
+                    {
+                        'type': self.component_ids['dynamic_output'],
+                        'index': MATCH,
+                    },
+                    'id',
+                ),
+                prevent_initial_call=True,
+            )
+            def refetch_on_zoom(relayout, graph_id):
+                if not relayout or self.data_update_function is None:
+                    return no_update, no_update
+
+                # A figura do gráfico é substituída: o cursor incremental
+                # deixa de valer. Com zoom, o novo token guarda o período
+                # (por cliente); sem zoom, a próxima atualização envia a
+                # figura completa
+                index = graph_id['index']
+                if 'xaxis.range[0]' in relayout:
+                    start = relayout['xaxis.range[0]']
+                    end = relayout.get('xaxis.range[1]')
+                elif 'xaxis.range' in relayout:
+                    start, end = relayout['xaxis.range']
+                elif relayout.get('xaxis.autorange'):
+                    # Zoom desfeito: volta ao período padrão
+                    return self.default_figures[
+                        index % len(self.default_figures)
+                    ], None
+                else:
+                    return no_update, no_update
+
+                zoom = {
+                    'start_date': self._zoom_timestamp(start),
+                    'end_date': self._zoom_timestamp(end),
+                }
+                figure = self._zoomed_figure(index, zoom)
+                if figure is None:
+                    return no_update, no_update
+                return figure, self._new_cursor(
+                    figure, self._data_config(), zoom=zoom
+                )
+
+    def _data_config(self):
+        """Parâmetros que, ao mudar, exigem o envio de figuras completas."""
+        params = dict(self.update_data_params)
+        start = params.pop('start_date', None)
+        end = params.pop('end_date', None)
+        window = None
+        if start is not None and end is not None:
+            window = (pd.Timestamp(end) - pd.Timestamp(start)).round('s')
+        return repr(sorted(params.items())), window
+
+    def _new_cursor(self, figure, config, zoom=None) -> str:
+        """Registra o que o cliente recebeu de `figure` e retorna o token."""
+        if isinstance(figure, dict):
+            figure = go.Figure(figure)
+        meta = figure.layout.meta
+        traces = []
+        for trace in figure.data:
+            x = getattr(trace, 'x', None)
+            size = 0 if x is None else len(x)
+            last = pd.Timestamp(x[-1]) if size else None
+            traces.append((trace.name, last, size))
+        lasts = [last for _, last, _ in traces if last is not None]
+        token = uuid.uuid4().hex
+        self.cursors[token] = {
+            'config': config,
+            'traces': traces,
+            # Último candle enviado: os pontos posteriores são acrescentados
+            'since': max(lasts) if lasts else None,
+            'appended': 0,
+            # Figura reduzida: os pontos novos não podem ser acrescentados
+            'downsampled': isinstance(meta, dict)
+            and bool(meta.get('downsampled')),
+            'zoom': zoom,
+        }
+        while len(self.cursors) > MAX_CURSORS:
+            self.cursors.popitem(last=False)
+        return token
+
+    def _cursor(self, token):
+        """Cursor do token (None se expirou), marcado como recente."""
+        cursor = self.cursors.get(token)
+        if cursor is not None:
+            self.cursors.move_to_end(token)
+        return cursor
+
+    def _zoom_range(self, token):
+        cursor = self._cursor(token)
+        return None if cursor is None else cursor['zoom']
+
+    @staticmethod
+    def _figure_patch(cursor, tail):  # noqa: PLR0914
+        """
+        Patch que leva a figura do cliente (descrita pelo cursor) ao estado
+        de `tail`, a figura com os pontos a partir de cursor['since']: o
+        último ponto de cada trace é substituído (candle revisado) e os
+        posteriores são acrescentados. Retorna o Patch e o novo cursor, ou
+        None se a figura precisar ser reconstruída (ex.: trace novo).
+        """
+        positions = {
+            name: i for i, (name, _, _) in enumerate(cursor['traces'])
+        }
+        traces = list(cursor['traces'])
+        since = cursor['since']
+        patch = Patch()
+        appended = 0
+        for trace in tail.data:
+            if trace.name not in positions:
+                return None
+            i = positions[trace.name]
+            name, last, size = traces[i]
+            data = trace.to_plotly_json()
+            x = data.get('x')
+            if x is None or not len(x):
+                continue
+            xs = [pd.Timestamp(value) for value in x]
+            new = [j for j, value in enumerate(xs) if value > since]
+            revised = [j for j, value in enumerate(xs) if value == last]
+            if not new and not revised:
+                continue
+            for path in _point_paths(data, len(xs)):
+                values = _value_at(data, path)
+                target = patch['data'][i]
+                for key in path:
+                    target = target[key]
+                if revised and size:
+                    target[size - 1] = values[revised[-1]]
+                if new:
+                    target.extend([values[j] for j in new])
+            if new:
+                traces[i] = (name, xs[new[-1]], size + len(new))
+                appended = max(appended, len(new))
+
+        xaxis_range = tail.layout.xaxis.range
+        if xaxis_range is not None:
+            patch['layout']['xaxis']['range'] = list(xaxis_range)
+
+        lasts = [last for _, last, _ in traces if last is not None]
+        return patch, {
+            **cursor,
+            'traces': traces,
+            'since': max(lasts),
+            'appended': cursor['appended'] + appended,
+        }
+
+    def _extend_data_source(self, df, sent):
+        """
+        Dados do editor para o cliente que já recebeu as linhas até `sent`
+        (timestamp guardado no navegador). As linhas novas de `df` entram
+        nos dados do servidor; o cliente recebe um Patch com as linhas
+        posteriores a `sent`, ou os dados completos se não tiver cursor ou
+        se os dados do servidor começarem depois dele. Retorna os dados e o
+        novo cursor.
+        """
+        if (
+            not isinstance(self.df1, pd.DataFrame)
+            or 'timestamp' not in self.df1.columns
+            or self.df1.empty
+        ):
+            return no_update, sent
+        if df is not None and list(df.columns) == list(self.df1.columns):
+            new_rows = df[df['timestamp'] > self.df1['timestamp'].max()]
+            if not new_rows.empty:
+                self.df1 = pd.concat([self.df1, new_rows], ignore_index=True)
+                for col, values in new_rows.to_dict('list').items():
+                    self.data_source[col].extend(values)
+
+        timestamps = self.df1['timestamp']
+        latest = timestamps.max().isoformat()
+        if sent is None or pd.Timestamp(sent) < timestamps.min():
+            return self.data_source, latest
+        rows = self.df1[timestamps > pd.Timestamp(sent)]
+        if rows.empty:
+            return no_update, sent
+        patch = Patch()
+        for col, values in rows.to_dict('list').items():
+            patch[col].extend(values)
+        return patch, latest
+
+    def _incremental_update(self, ids, tokens, sent):  # noqa: PLR0912, PLR0914
+        """
+        Atualização periódica incremental: Patch com os pontos novos para
+        os gráficos com cursor válido e figura completa para os demais.
+        """
+        config = self._data_config()
+        graphs = [no_update] * len(ids)
+        tokens = list(tokens)
+        patchable, rebuild = {}, []
+        for i in range(len(ids)):
+            index = ids[i]['index']
+            cursor = self._cursor(tokens[i])
+            if cursor is not None and cursor['zoom'] is not None:
+                figure = self._zoomed_figure(index, cursor['zoom'])
+                if figure is not None:
+                    graphs[i] = figure
+                continue
+            if (
+                cursor is None
+                or cursor['since'] is None
+                or cursor['downsampled']
+                or cursor['config'] != config
+                or cursor['appended'] >= self.max_incremental_points
+            ):
+                rebuild.append(i)
+            else:
+                patchable[i] = cursor
+
+        data_source, data_cursor = no_update, sent
+        if patchable:
+            since = min(cursor['since'] for cursor in patchable.values())
+            tail_df, tail_figures = self.data_update_function(
+                since=since, **self.update_data_params
+            )
+            # Sem figuras (sem dados novos ou erro): nada a enviar
+            for i, cursor in patchable.items() if tail_figures else ():
+                tail = tail_figures[ids[i]['index'] % len(tail_figures)]
+                result = self._figure_patch(cursor, tail)
+                if result is None:
+                    rebuild.append(i)
+                    continue
+                graphs[i], self.cursors[tokens[i]] = result
+            data_source, data_cursor = self._extend_data_source(tail_df, sent)
+
+        figures_store = no_update
+        if rebuild:
+            df, figures = self.data_update_function(**self.update_data_params)
+            if df is not None:
+                self.df1 = df
+                self.data_source = df.to_dict('list')
+                data_source = self.data_source
+                if 'timestamp' in df.columns and not df.empty:
+                    data_cursor = df['timestamp'].max().isoformat()
+            if figures is not None:
+                self.default_figures = figures
+                figures_store = figures
+                for i in rebuild:
+                    figure = figures[ids[i]['index'] % len(figures)]
+                    graphs[i] = figure
+                    tokens[i] = self._new_cursor(figure, config)
+
+        if data_cursor == sent:
+            data_cursor = no_update
+        return figures_store, graphs, data_source, tokens, data_cursor
+
+    def _zoom_timestamp(self, value):
+        ts = pd.Timestamp(value)
+        if self.zoom_timezone is not None and ts.tzinfo is None:
+            ts = ts.tz_localize(self.zoom_timezone)
+        return ts
+
+    def _zoomed_figure(self, index, zoom):
+        """Figura do gráfico `index` com os dados do período `zoom`."""
+        params = {**self.update_data_params, **zoom}
+        _, figures = self.data_update_function(**params)
+        if not figures:
+            return None
+        return figures[index % len(figures)]
 
     def get_layout(self):
         # Criar cards iniciais
@@ -450,6 +845,7 @@ class ChartEditor:
             [
                 self.store,
                 self.figures_store,  # Nova store para armazenar figuras
+                self.data_cursor,
                 code_highlight,  # Adiciona o componente code-highlight
                 dmc.Button(
                     'Adicionar Novo Gráfico?',
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# Pontos por série enviados ao navegador: aproximadamente a largura em
+# pixels da área de plotagem de um gráfico
+DEFAULT_MAX_POINTS = 1500
+
+# Agregação das colunas de candles; as demais colunas numéricas
+# (indicadores) ficam com o último valor de cada grupo
+_OHLC_AGG = {
+    'timestamp': 'first',
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+
+def _as_float(values) -> np.ndarray:
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('int64').to_numpy(dtype=np.float64)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Índices dos pontos escolhidos pelo Largest-Triangle-Three-Buckets:
+    preserva picos e vales da série com `threshold` pontos. Pontos com
+    y ausente (NaN) são ignorados.
+    """
+    x = _as_float(x)
+    y = _as_float(y)
+    valid = np.flatnonzero(~np.isnan(y) & ~np.isnan(x))
+    n = len(valid)
+    if threshold >= n or threshold < 3:  # noqa: PLR2004
+        return valid
+    x, y = x[valid], y[valid]
+
+    # threshold - 2 grupos entre o primeiro e o último ponto
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return valid[selected]
+
+
+def lttb(x, y, threshold: int = DEFAULT_MAX_POINTS):
+    """Série (x, y) reduzida a no máximo `threshold` pontos."""
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    if len(x) <= threshold:
+        return x, y
+    indices = lttb_indices(x, y, threshold)
+    return x.iloc[indices], y.iloc[indices]
+
+
+def aggregate_ohlc(
+    df: pd.DataFrame, max_points: int = DEFAULT_MAX_POINTS
+) -> pd.DataFrame:
+    """
+    Reagrupa candles consecutivos para que restem no máximo `max_points`
+    candles, preservando abertura, máxima, mínima, fechamento e volume.
+    """
+    if df is None or len(df) <= max_points:
+        return df
+    df = df.reset_index(drop=True)
+    groups = np.arange(len(df)) * max_points // len(df)
+    agg = {
+        col: _OHLC_AGG.get(col, 'last')
+        for col in df.columns
+        if col in _OHLC_AGG or pd.api.types.is_numeric_dtype(df[col])
+    }
+    return df.groupby(groups, sort=False).agg(agg).reset_index(drop=True)
@@ -8,8 +8,9 @@ from rich.console import Console
 
 from dashboard import app
 from dashboard.custom_chart_editor import ChartEditor
-from db.duckdb_csv import load_csv_in_dataframe
-from segredos import CAMINHO
+from dashboard.downsampling import DEFAULT_MAX_POINTS, aggregate_ohlc, lttb
+from dashboard.snapshot import load_candles
+from db.json_csv import load_ticker_history
 
 console = Console()
 
@@ -39,8 +40,23 @@ def add_missing_indicators(df):
     return df
 
 
+def _line_xy(df, col, max_points, downsampled=None):
+    """
+    x e y de uma linha reduzida por LTTB a no máximo max_points. Com
+    `downsampled`, a redução é guardada e reaproveitada pelas outras
+    figuras do mesmo DataFrame.
+    """
+    if downsampled is not None and (col, max_points) in downsampled:
+        return downsampled[col, max_points]
+    x, y = lttb(df['timestamp'], df[col], max_points)
+    xy = {'x': x, 'y': y}
+    if downsampled is not None:
+        downsampled[col, max_points] = xy
+    return xy
+
+
 # Função para criar figuras compatíveis com ChartEditor
-def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
+def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0914, PLR0915, PLR0917
     df_bity,
     df=None,
     executed_orders_df=None,
@@ -48,6 +64,8 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
     indicadores=None,
     minutes_ago=None,
     now=None,
+    max_points=DEFAULT_MAX_POINTS,
+    downsampled=None,
 ):
     try:  # noqa: PLR1702
         # Obtenha a data e hora atuais se não fornecidas
@@ -143,14 +161,29 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
 
         # Adicionar dados do DataFrame da Bity se disponível
         if df_bity is not None and not df_bity.empty:
+            # Candles reagrupados para a largura do gráfico; as linhas são
+            # reduzidas com LTTB e os sinais usam todos os candles
+            if downsampled is None:
+                candles = aggregate_ohlc(df_bity, max_points)
+            elif ('ohlc', max_points) in downsampled:
+                candles = downsampled['ohlc', max_points]
+            else:
+                candles = aggregate_ohlc(df_bity, max_points)
+                downsampled['ohlc', max_points] = candles
+
+            # Figura reduzida: o ChartEditor não acrescenta candles brutos a
+            # ela, reconstrói a figura inteira
+            if len(df_bity) > max_points:
+                fig1.update_layout(meta={'downsampled': True})
+
             if 'bity_candlestick' in graf_info:
                 fig1.add_trace(
                     go.Candlestick(
-                        x=df_bity['timestamp'],
-                        open=df_bity['open'],
-                        high=df_bity['high'],
-                        low=df_bity['low'],
-                        close=df_bity['close'],
+                        x=candles['timestamp'],
+                        open=candles['open'],
+                        high=candles['high'],
+                        low=candles['low'],
+                        close=candles['close'],
                         name='Bity dataframe',
                     )
                 )
@@ -159,8 +192,7 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
             if 'ema_5' in indicadores and 'ema_5' in df_bity.columns:
                 fig1.add_trace(
                     go.Scattergl(
-                        x=df_bity['timestamp'],
-                        y=df_bity['ema_5'],
+                        **_line_xy(df_bity, 'ema_5', max_points, downsampled),
                         mode='lines',
                         name='EMA 5',
                         line=dict(color='blue', width=1),
@@ -170,8 +202,7 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
             if 'ema_10' in indicadores and 'ema_10' in df_bity.columns:
                 fig1.add_trace(
                     go.Scattergl(
-                        x=df_bity['timestamp'],
-                        y=df_bity['ema_10'],
+                        **_line_xy(df_bity, 'ema_10', max_points, downsampled),
                         mode='lines',
                         name='EMA 10',
                         line=dict(color='red', width=1),
@@ -181,8 +212,7 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
             if 'ema_20' in indicadores and 'ema_20' in df_bity.columns:
                 fig1.add_trace(
                     go.Scattergl(
-                        x=df_bity['timestamp'],
-                        y=df_bity['ema_20'],
+                        **_line_xy(df_bity, 'ema_20', max_points, downsampled),
                         mode='lines',
                         name='EMA 20',
                         line=dict(color='green', width=1),
@@ -192,8 +222,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
             if 'ema_200' in indicadores and 'ema_200' in df_bity.columns:
                 fig1.add_trace(
                     go.Scattergl(
-                        x=df_bity['timestamp'],
-                        y=df_bity['ema_200'],
+                        **_line_xy(
+                            df_bity, 'ema_200', max_points, downsampled
+                        ),
                         mode='lines',
                         name='EMA 200',
                         line=dict(color='purple', width=1),
@@ -204,8 +235,7 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add RSI
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['rsi'],
+                        **_line_xy(df_bity, 'rsi', max_points, downsampled),
                         mode='lines',
                         name='RSI',
                         line=dict(color='purple', width=1),
@@ -249,8 +279,7 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add macd line
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['macd'],
+                        **_line_xy(df_bity, 'macd', max_points, downsampled),
                         mode='lines',
                         name='macd',
                         yaxis='y3',
@@ -261,8 +290,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add signal line
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['macd_signal'],
+                        **_line_xy(
+                            df_bity, 'macd_signal', max_points, downsampled
+                        ),
                         mode='lines',
                         name='Signal',
                         yaxis='y3',
@@ -273,12 +303,12 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add macd histogram with conditional colors
                 colors = [
                     'red' if hist < 0 else 'green'
-                    for hist in df_bity['macd_hist']
+                    for hist in candles['macd_hist']
                 ]
                 fig1.add_trace(
                     go.Bar(
-                        x=df_bity['timestamp'],
-                        y=df_bity['macd_hist'],
+                        x=candles['timestamp'],
+                        y=candles['macd_hist'],
                         name='macd Histogram',
                         yaxis='y3',
                         marker_color=colors,
@@ -292,8 +322,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add Bollinger Bands
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['bb_upper'],
+                        **_line_xy(
+                            df_bity, 'bb_upper', max_points, downsampled
+                        ),
                         mode='lines',
                         name='Upper BB',
                         line=dict(color='gray', width=1),
@@ -302,8 +333,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
 
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['bb_middle'],
+                        **_line_xy(
+                            df_bity, 'bb_middle', max_points, downsampled
+                        ),
                         mode='lines',
                         name='Middle BB',
                         line=dict(color='gray', width=1),
@@ -312,8 +344,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
 
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['bb_lower'],
+                        **_line_xy(
+                            df_bity, 'bb_lower', max_points, downsampled
+                        ),
                         mode='lines',
                         name='Lower BB',
                         line=dict(color='gray', width=1),
@@ -326,8 +359,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add Stochastic
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['stoch_k'],
+                        **_line_xy(
+                            df_bity, 'stoch_k', max_points, downsampled
+                        ),
                         mode='lines',
                         name='Stoch %K',
                         line=dict(color='blue', width=1),
@@ -336,8 +370,9 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
 
                 fig1.add_trace(
                     go.Scatter(
-                        x=df_bity['timestamp'],
-                        y=df_bity['stoch_d'],
+                        **_line_xy(
+                            df_bity, 'stoch_d', max_points, downsampled
+                        ),
                         mode='lines',
                         name='Stoch %D',
                         line=dict(color='orange', width=1),
@@ -356,13 +391,13 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                 # Add volume with red/green colors based on price direction
                 colors = [
                     'red' if close < open else 'green'
-                    for close, open in zip(df_bity['close'], df_bity['open'])
+                    for close, open in zip(candles['close'], candles['open'])
                 ]
 
                 fig1.add_trace(
                     go.Bar(
-                        x=df_bity['timestamp'],
-                        y=df_bity[volume_col],
+                        x=candles['timestamp'],
+                        y=candles[volume_col],
                         name='Volume',
                         yaxis='y2',
                         marker_color=colors,
@@ -458,10 +493,11 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
                         df_ticker = df_ticker[df_ticker['last'].notna()]
 
                         if not df_ticker.empty:
+                            if len(df_ticker) > max_points:
+                                fig1.update_layout(meta={'downsampled': True})
                             fig1.add_trace(
                                 go.Scatter(
-                                    x=df_ticker['timestamp'],
-                                    y=df_ticker['last'],
+                                    **_line_xy(df_ticker, 'last', max_points),
                                     mode='lines',
                                     name='Último Preço',
                                     line=dict(color='blue', width=1.5),
@@ -557,8 +593,13 @@ def create_price_figure(  # noqa: PLR0912, PLR0913, PLR0915, PLR0917
 
 
 # Função para atualizar dados para o ChartEditor
-def update_chart_data(
-    start_date=None, end_date=None, graf_info=None, indicadores=None
+def update_chart_data(  # noqa: PLR0913, PLR0917
+    start_date=None,
+    end_date=None,
+    graf_info=None,
+    indicadores=None,
+    max_points=DEFAULT_MAX_POINTS,
+    since=None,
 ):
     try:
         # Se nenhuma data for fornecida, use os últimos 30 minutos
@@ -578,8 +619,8 @@ def update_chart_data(
             indicadores = ['sinais', 'ema_20', 'ema_200']
 
         # Carregar dados
-        df_bity = load_csv_in_dataframe(
-            CAMINHO + '/BTC_BRL_bitpreco.csv',
+        df_bity = load_candles(
+            'BTC_BRL',
             start_date=start_date,
             end_date=end_date,
         )
@@ -590,9 +631,23 @@ def update_chart_data(
         # Adicionar indicadores faltantes
         df_bity = add_missing_indicators(df_bity)
 
+        # Atualização incremental do ChartEditor: figuras só com os candles
+        # a partir de since (os indicadores usam o período inteiro)
+        if since is not None:
+            df_bity = df_bity[df_bity['timestamp'] >= since]
+            df_bity = df_bity.reset_index(drop=True)
+            if df_bity.empty:
+                return df_bity, None
+
+        # Reduções (candles reagrupados, linhas LTTB) feitas uma vez e
+        # compartilhadas pelas três figuras
+        downsampled = {}
+
         # Criar figuras com base nos indicadores e graf_info selecionados
         figure1 = create_price_figure(
             df_bity=df_bity,
+            max_points=max_points,
+            downsampled=downsampled,
             minutes_ago=start_date,
             now=end_date,
             graf_info=graf_info,
@@ -607,6 +662,8 @@ def update_chart_data(
         if 'volume' in indicadores:
             figure2 = create_price_figure(
                 df_bity=df_bity,
+                max_points=max_points,
+                downsampled=downsampled,
                 minutes_ago=start_date,
                 now=end_date,
                 graf_info=graf_info,
@@ -616,6 +673,8 @@ def update_chart_data(
             # Se volume não estiver selecionado, mostrar emas
             figure2 = create_price_figure(
                 df_bity=df_bity,
+                max_points=max_points,
+                downsampled=downsampled,
                 minutes_ago=start_date,
                 now=end_date,
                 graf_info=graf_info,
@@ -630,6 +689,8 @@ def update_chart_data(
         if tech_indicadores:
             figure3 = create_price_figure(
                 df_bity=df_bity,
+                max_points=max_points,
+                downsampled=downsampled,
                 minutes_ago=start_date,
                 now=end_date,
                 graf_info=graf_info,
@@ -639,6 +700,8 @@ def update_chart_data(
         else:
             figure3 = create_price_figure(
                 df_bity=df_bity,
+                max_points=max_points,
+                downsampled=downsampled,
                 minutes_ago=start_date,
                 now=end_date,
                 graf_info=graf_info,
@@ -661,6 +724,10 @@ editor = ChartEditor(
     initial_cards=3,  # Iniciar com três gráficos padrão
     update_interval_id='interval-component-dash',
     data_update_function=update_chart_data,
+    # Os candles são exibidos no horário UTC (timestamps do armazenamento)
+    zoom_timezone='UTC',
+    # A cada atualização só os candles novos são enviados aos gráficos
+    incremental=True,
     default_title='Criptomoeda Chart',
     figure_titles=[
         'Preço BTC-BRL com EMAs',
@@ -679,7 +746,6 @@ chart_editor = editor.get_layout()
     Input('interval-component-dash', 'n_intervals'),
     Input('data-recency', 'value'),
     Input('data-recency-candlestick', 'value'),
-    State('df-precos', 'data'),
     State('df-executed-orders', 'data'),
     Input('graf-info', 'value'),
     Input('indicadores-tecnicos', 'value'),
@@ -690,7 +756,6 @@ def preco_tab(  # noqa: PLR0913, PLR0917
     n_intervals,
     data_recency,
     data_recency_candlestick,
-    df,
     executed_orders_df,
     graf_info,
     indicadores,
@@ -710,8 +775,8 @@ def preco_tab(  # noqa: PLR0913, PLR0917
 
     try:
         # Carregar dados da BitPreço
-        df_bity = load_csv_in_dataframe(
-            CAMINHO + '/BTC_BRL_bitpreco.csv',
+        df_bity = load_candles(
+            'BTC_BRL',
             start_date=minutes_ago,
             end_date=now,
         )
@@ -719,6 +784,11 @@ def preco_tab(  # noqa: PLR0913, PLR0917
         # Adicionar indicadores faltantes
         df_bity = add_missing_indicators(df_bity)
 
+        # Tickers do período (o df-precos guarda só os preços atuais)
+        df = None
+        if graf_info is None or 'ticker' in graf_info:
+            df = load_ticker_history(start_date=minutes_ago, end_date=now)
+
         # Criar figura usando a função helper
         return create_price_figure(
             df_bity=df_bity,
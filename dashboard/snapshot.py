@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+from db import parquet_candles
+from db.duckdb_csv import (
+    load_csv_in_records,
+    load_latest_records,
+    load_sources_in_records,
+    sources_signature,
+)
+
+# Fotografias mantidas em memória (arquivos e períodos distintos)
+SNAPSHOT_MAX_ENTRIES = 32
+
+
+def file_signature(path: str) -> tuple[int, int] | None:
+    """(mtime, tamanho) do arquivo; None se ele não existir."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class SnapshotCache:
+    """
+    Dados lidos pelos callbacks do dashboard, compartilhados entre eles:
+    a cada atualização (interval-component-dash) vários callbacks pedem os
+    mesmos arquivos, e cada fonte só é lida de novo quando sua assinatura
+    (mtime, tamanho, partições) muda.
+
+    Callbacks simultâneos que pedem a mesma chave esperam uma única
+    leitura. Os valores são compartilhados: quem os recebe não deve
+    alterá-los.
+    """
+
+    def __init__(self, maxsize: int = SNAPSHOT_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._loading: dict = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, signature):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self._entries.move_to_end(key)
+            return True, entry[1]
+        return False, None
+
+    def get(self, key, signature, loader: Callable):
+        """Valor de `key` para a `signature` atual; lê com `loader()`."""
+        with self._lock:
+            hit, value = self._cached(key, signature)
+            if hit:
+                return value
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                hit, value = self._cached(key, signature)
+            if hit:
+                return value
+            value = loader()
+            with self._lock:
+                self._entries[key] = (signature, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._loading.pop(old_key, None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = SnapshotCache()
+
+
+def read_csv(path: str) -> pd.DataFrame:
+    """CSV lido com pandas (saldo, ordens executadas)."""
+    return _cache.get(
+        ('read_csv', path), file_signature(path), lambda: pd.read_csv(path)
+    )
+
+
+def csv_records(path: str) -> list[dict]:
+    """CSV lido com DuckDB como lista de registros (ticker)."""
+    return _cache.get(
+        ('records', path),
+        file_signature(path),
+        lambda: load_csv_in_records(path),
+    )
+
+
+def sources_records(paths) -> list[dict]:
+    """
+    Linhas de CSVs e diretórios de partições parquet, como uma única
+    tabela (ex.: histórico compactado do ticker e o diário ticker.csv).
+    """
+    paths = tuple(paths)
+    return _cache.get(
+        ('sources', paths),
+        sources_signature(paths),
+        lambda: load_sources_in_records(paths),
+    )
+
+
+def latest_records(paths, key: str = 'market') -> list[dict]:
+    """Últimas linhas de cada mercado (ver load_latest_records)."""
+    paths = tuple(paths)
+    return _cache.get(
+        ('latest', paths, key),
+        sources_signature(paths),
+        lambda: load_latest_records(paths, key),
+    )
+
+
+def load_candles(
+    symbol: str,
+    exchange: str = 'bitpreco',
+    start_date=None,
+    end_date=None,
+) -> pd.DataFrame:
+    """
+    Candles do período. São lidos os dias inteiros do período, guardados
+    enquanto as partições não mudam, e o período é recortado em memória:
+    callbacks com períodos que diferem por segundos (calculados a partir
+    de now()) usam a mesma leitura. O DataFrame retornado é uma cópia.
+    """
+    first, last = parquet_candles.day_bounds(start_date, end_date)
+    df = _cache.get(
+        ('candles', exchange, symbol, first, last),
+        parquet_candles.partition_files(symbol, exchange, first, last),
+        lambda: parquet_candles.load_candles(symbol, exchange, first, last),
+    )
+    if df.empty:
+        return pd.DataFrame()
+
+    mask = pd.Series(True, index=df.index)
+    if start_date is not None:
+        mask &= df['timestamp'] >= parquet_candles.to_utc(start_date)
+    if end_date is not None:
+        mask &= df['timestamp'] <= parquet_candles.to_utc(end_date)
+    return df[mask].reset_index(drop=True)
@@ -0,0 +1,360 @@
+import functools
+import hashlib
+import inspect
+import json
+import math
+import os
+import sys
+from datetime import datetime, timezone
+
+import duckdb as db
+import numpy as np
+import pandas as pd
+from rich.table import Table
+
+from bot.logs.config_log import console
+from segredos import BASE_DIR, CAMINHO
+
+# Banco com os resultados dos backtests e das otimizações já executados
+RESULTS_DB = os.path.join(CAMINHO, 'backtests.duckdb')
+
+# Gráficos (HTML) dos backtests, fora da raiz do repositório
+REPORTS_DIR = os.path.join(CAMINHO, 'backtests')
+
+# Métricas do backtesting e suas colunas no banco
+METRIC_COLUMNS = {
+    'Sharpe Ratio': 'sharpe_ratio',
+    'Return [%]': 'return_pct',
+    'Return (Ann.) [%]': 'return_ann_pct',
+    'Max. Drawdown [%]': 'max_drawdown_pct',
+    '# Trades': 'trades',
+    'Win Rate [%]': 'win_rate_pct',
+    'Profit Factor': 'profit_factor',
+}
+
+_KEY_COLUMNS = [
+    'run_key',
+    'strategy',
+    'params_hash',
+    'params',
+    'data_hash',
+    'data_start',
+    'data_end',
+    'bars',
+    'code_version',
+    'backtest_params',
+    'source',
+    'created_at',
+]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS backtest_runs (
+    run_key VARCHAR PRIMARY KEY,
+    strategy VARCHAR,
+    params_hash VARCHAR,
+    params VARCHAR,
+    data_hash VARCHAR,
+    data_start TIMESTAMP,
+    data_end TIMESTAMP,
+    bars BIGINT,
+    code_version VARCHAR,
+    backtest_params VARCHAR,
+    source VARCHAR,
+    created_at TIMESTAMP,
+    {', '.join(f'{col} DOUBLE' for col in METRIC_COLUMNS.values())},
+    error VARCHAR
+)
+"""
+
+
+def _plain(value):
+    """Valores do numpy como tipos do Python, para o JSON."""
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, range):
+        return list(value)
+    return str(value)
+
+
+def _json(value: dict) -> str:
+    return json.dumps(value, sort_keys=True, default=_plain)
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode(), usedforsecurity=False).hexdigest()
+
+
+def params_hash(params: dict) -> str:
+    """Hash dos parâmetros da estratégia (independe da ordem)."""
+    return _sha1(_json(params))
+
+
+def _project_modules(module_name: str) -> list:
+    """
+    O módulo e os módulos do projeto de que ele depende, direta ou
+    indiretamente (ex.: a estratégia e o cache de indicadores que ela
+    usa), pelos nomes importados em cada um.
+    """
+    found, pending = {}, [module_name]
+    while pending:
+        module = sys.modules.get(pending.pop())
+        path = getattr(module, '__file__', None) or ''
+        if module is None or module.__name__ in found:
+            continue
+        if not os.path.abspath(path).startswith(BASE_DIR + os.sep):
+            continue
+        found[module.__name__] = module
+        for value in vars(module).values():
+            if inspect.ismodule(value):
+                pending.append(value.__name__)
+            elif isinstance(getattr(value, '__module__', None), str):
+                pending.append(value.__module__)
+    return [found[name] for name in sorted(found)]
+
+
+@functools.cache
+def code_version(strategy_class) -> str:
+    """
+    Versão do código que produz os resultados: hash do módulo da
+    estratégia, dos módulos do projeto que ela usa (indicadores, cache)
+    e versão do backtesting. Alterar qualquer um deles invalida os
+    resultados guardados da estratégia.
+    """
+    import backtesting  # noqa: PLC0415
+
+    sources = [backtesting.__version__]
+    for module in _project_modules(strategy_class.__module__):
+        try:
+            sources.append(f'{module.__name__}\n{inspect.getsource(module)}')
+        except (OSError, TypeError):
+            sources.append(module.__name__)
+    if len(sources) == 1:
+        sources.append(strategy_class.__qualname__)
+    return _sha1('\n'.join(sources))[:16]
+
+
+def data_hash(data: pd.DataFrame) -> str:
+    """Hash dos candles (datas e OHLCV) usados no backtest."""
+    digest = hashlib.sha1(usedforsecurity=False)
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    timestamps = np.ascontiguousarray(index.as_unit('ns').asi8)
+    digest.update(timestamps.view(np.uint8))
+    columns = [
+        col
+        for col in ('Open', 'High', 'Low', 'Close', 'Volume')
+        if col in data
+    ]
+    digest.update(','.join(columns).encode())
+    values = np.ascontiguousarray(data[columns].to_numpy(dtype=np.float64))
+    digest.update(values.view(np.uint8))
+    return digest.hexdigest()
+
+
+def _naive_utc(value) -> datetime:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.to_pydatetime()
+
+
+def run_context(data: pd.DataFrame, strategy_class, **backtest_kwargs) -> dict:
+    """
+    Chave comum a todas as execuções de uma estratégia sobre os mesmos
+    dados e parâmetros do Backtest; cada execução acrescenta o hash dos
+    parâmetros da estratégia.
+    """
+    return {
+        'strategy': strategy_class.__name__,
+        'data_hash': data_hash(data),
+        'data_start': _naive_utc(data.index[0]) if len(data) else None,
+        'data_end': _naive_utc(data.index[-1]) if len(data) else None,
+        'bars': len(data),
+        'code_version': code_version(strategy_class),
+        'backtest_params': _json(backtest_kwargs),
+    }
+
+
+def _connect(path: str) -> db.DuckDBPyConnection:
+    """Conexão aberta só durante a operação: outros processos (ex.: o
+    dashboard) podem usar o arquivo entre as gravações."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    con = db.connect(path)
+    con.execute(_SCHEMA)
+    return con
+
+
+def _metric(value) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return value
+
+
+def save_results(
+    context: dict,
+    results: list[tuple[dict, dict]],
+    source: str,
+    path: str = RESULTS_DB,
+):
+    """
+    Grava (ou substitui) os resultados `(parâmetros, métricas)` de
+    execuções com a chave `context` de run_context. As métricas usam os
+    nomes do backtesting (METRIC_COLUMNS) e 'error', se houver.
+    """
+    if not results:
+        return
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for params, metrics in results:
+        key = params_hash(params)
+        run_key = _sha1(
+            '|'.join([
+                context['strategy'],
+                context['code_version'],
+                context['data_hash'],
+                context['backtest_params'],
+                key,
+            ])
+        )
+        rows.append({
+            'run_key': run_key,
+            **context,
+            'params_hash': key,
+            'params': _json(params),
+            'source': source,
+            'created_at': created_at,
+            **{
+                col: _metric(metrics.get(metric))
+                for metric, col in METRIC_COLUMNS.items()
+            },
+            'error': metrics.get('error') or None,
+        })
+    columns = [*_KEY_COLUMNS, *METRIC_COLUMNS.values(), 'error']
+    df = pd.DataFrame(rows, columns=columns)
+    # NaN vira NULL: fica fora das ordenações do ranking
+    select = ', '.join(
+        f'CASE WHEN isnan({col}) THEN NULL ELSE {col} END'
+        if col in METRIC_COLUMNS.values()
+        else col
+        for col in columns
+    )
+    with _connect(path) as con:
+        con.register('runs_df', df)
+        con.execute(
+            f'INSERT OR REPLACE INTO backtest_runs ({", ".join(columns)}) '
+            + f'SELECT {select} FROM runs_df'
+        )
+
+
+def load_results(context: dict, path: str = RESULTS_DB) -> dict[str, dict]:
+    """
+    Resultados já gravados com a chave `context`: hash dos parâmetros ->
+    métricas (nomes do backtesting e 'error'), para não repetir
+    avaliações. Avaliações que falharam não entram: são refeitas.
+    """
+    if not os.path.exists(path):
+        return {}
+    columns = ', '.join(METRIC_COLUMNS.values())
+    with _connect(path) as con:
+        rows = con.execute(
+            f'SELECT params_hash, {columns}, error FROM backtest_runs '
+            + 'WHERE strategy = ? AND code_version = ? AND data_hash = ? '
+            + 'AND backtest_params = ? AND error IS NULL',
+            [
+                context['strategy'],
+                context['code_version'],
+                context['data_hash'],
+                context['backtest_params'],
+            ],
+        ).fetchall()
+    return {
+        key: {
+            **{
+                metric: math.nan if value is None else value
+                for metric, value in zip(METRIC_COLUMNS, values)
+            },
+            'error': error or '',
+        }
+        for key, *values, error in rows
+    }
+
+
+def ranking(  # noqa: PLR0913, PLR0917
+    metric: str = 'Sharpe Ratio',
+    strategy: str | None = None,
+    source: str | None = None,
+    current_code: bool = True,
+    limit: int = 20,
+    path: str = RESULTS_DB,
+) -> pd.DataFrame:
+    """
+    Melhores execuções gravadas pela `metric`. Com current_code=True,
+    só as da versão atual do código de cada estratégia (a do processo).
+    """
+    if metric not in METRIC_COLUMNS:
+        raise ValueError(
+            f'Métrica inválida: {metric} (use {list(METRIC_COLUMNS)})'
+        )
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    column = METRIC_COLUMNS[metric]
+    filters, args = [f'{column} IS NOT NULL'], []
+    if strategy is not None:
+        filters.append('strategy = ?')
+        args.append(strategy)
+    if source is not None:
+        filters.append('source = ?')
+        args.append(source)
+    if current_code:
+        # Versão atual das estratégias importadas neste processo
+        versions = _loaded_versions()
+        filters.append("list_contains(?, strategy || ':' || code_version)")
+        args.append(versions)
+    with _connect(path) as con:
+        df = con.execute(
+            'SELECT strategy, params, data_start, data_end, bars, source, '
+            + f'created_at, {", ".join(METRIC_COLUMNS.values())} '
+            + f'FROM backtest_runs WHERE {" AND ".join(filters)} '
+            + f'ORDER BY {column} DESC LIMIT ?',
+            [*args, limit],
+        ).df()
+    return df.rename(columns={v: k for k, v in METRIC_COLUMNS.items()})
+
+
+def _loaded_versions() -> list[str]:
+    from backtesting import Strategy  # noqa: PLC0415
+
+    versions = []
+    pending = list(Strategy.__subclasses__())
+    while pending:
+        strategy_class = pending.pop()
+        pending.extend(strategy_class.__subclasses__())
+        versions.append(
+            f'{strategy_class.__name__}:{code_version(strategy_class)}'
+        )
+    return versions
+
+
+def print_ranking(df: pd.DataFrame, metric: str = 'Sharpe Ratio'):
+    table = Table(title=f'Melhores execuções por {metric}')
+    columns = ['strategy', 'data_start', 'data_end', *METRIC_COLUMNS, 'params']
+    for column in columns:
+        table.add_column(column)
+    for row in df[columns].itertuples(index=False):
+        table.add_row(
+            *(
+                f'{value:.2f}' if isinstance(value, float) else str(value)
+                for value in row
+            )
+        )
+    console.print(table)
+
+
+if __name__ == '__main__':
+    # Importa as estratégias para filtrar pela versão atual do código
+    import bot.estrategias.TripleIndicatoStrategy  # noqa: F401
+
+    print_ranking(ranking())
@@ -1,48 +1,436 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+
 import duckdb as db
 import pandas as pd
 
 from bot.logs.config_log import console
 
+# Conexão persistente (banco em memória) e um cursor por thread: os
+# callbacks do Dash e as threads do bot não pagam a abertura de conexão
+_connection: db.DuckDBPyConnection | None = None
+_connection_lock = threading.Lock()
+_local = threading.local()
+
+# Esquema detectado de cada CSV: caminho -> (cabeçalho, colunas para o
+# read_csv, tipos das colunas). Só é detectado de novo quando o cabeçalho
+# do arquivo muda.
+_schemas: dict[str, tuple[str, str, dict[str, str]]] = {}
+_schemas_lock = threading.Lock()
+
+# Cópia ordenada por timestamp dos CSVs consultados por período, como
+# tabela DuckDB: as consultas usam os min/max de cada bloco (zone maps)
+# e só leem os blocos do período. caminho -> ((mtime, tamanho), tabela)
+_tables: dict[str, tuple[tuple[int, int], str]] = {}
+_tables_lock = threading.Lock()
+
+# CSVs carregados para a paginação das tabelas: arquivos ->
+# (assinatura dos arquivos, tabela, colunas, total de linhas)
+_page_tables: dict[tuple[str, ...], tuple] = {}
+
+_TIMESTAMP_TYPES = {'TIMESTAMP', 'TIMESTAMP WITH TIME ZONE'}
+
+
+def get_cursor() -> db.DuckDBPyConnection:
+    """Cursor DuckDB da thread atual sobre a conexão persistente."""
+    global _connection  # noqa: PLW0603
+    cursor = getattr(_local, 'cursor', None)
+    if cursor is None:
+        with _connection_lock:
+            if _connection is None:
+                _connection = db.connect(':memory:')
+            cursor = _connection.cursor()
+        _local.cursor = cursor
+    return cursor
+
+
+def _sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _read_header(path: str) -> str:
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        return f.readline()
+
+
+def _csv_schema(path: str) -> tuple[str, dict[str, str]]:
+    """
+    Trecho FROM para ler o CSV com os tipos já conhecidos, sem refazer a
+    detecção (sniffing) a cada consulta, e os tipos das colunas. O caminho
+    é o parâmetro ?.
+    """
+    header = _read_header(path)
+    with _schemas_lock:
+        cached = _schemas.get(path)
+    if cached is not None and cached[0] == header:
+        return cached[1], cached[2]
+
+    described = (
+        get_cursor()
+        .execute('DESCRIBE SELECT * FROM read_csv_auto(?)', [path])
+        .fetchall()
+    )
+    columns = ', '.join(
+        f'{_sql_string(name)}: {_sql_string(type_)}'
+        for name, type_, *_ in described
+    )
+    source = (
+        "read_csv(?, header = true, delim = ',', quote = '\"', "
+        + "escape = '\"', auto_detect = false, "
+        + f'columns = {{{columns}}})'
+    )
+    types = {name: type_ for name, type_, *_ in described}
+    with _schemas_lock:
+        _schemas[path] = (header, source, types)
+    return source, types
+
+
+def _timestamp_param(value, column_type: str) -> datetime:
+    """
+    Converte o limite do período para o tipo da coluna timestamp. Datas
+    sem fuso são tratadas como locais, como no armazenamento colunar.
+    """
+    ts = pd.Timestamp(value)
+    local = datetime.now().astimezone().tzinfo
+    if column_type == 'TIMESTAMP WITH TIME ZONE':
+        if ts.tzinfo is None:
+            ts = ts.tz_localize(local)
+        return ts.tz_convert('UTC').to_pydatetime()
+    # Coluna sem fuso (ex.: ticker.csv, gravado no horário local)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(local).tz_localize(None)
+    return ts.to_pydatetime()
+
+
+def _sorted_table(path: str, source: str) -> str:
+    """
+    Tabela com o CSV ordenado por timestamp, recriada quando o arquivo
+    muda (mtime ou tamanho).
+    """
+    st = os.stat(path)
+    stat = (st.st_mtime_ns, st.st_size)
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached is not None and cached[0] == stat:
+            return cached[1]
+        table = 'csv_' + hashlib.md5(path.encode()).hexdigest()[:16]
+        get_cursor().execute(
+            f'CREATE OR REPLACE TABLE {table} AS '
+            + f'SELECT * FROM {source} ORDER BY timestamp',
+            [path],
+        )
+        _tables[path] = (stat, table)
+        return table
+
+
+def _sql_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _page_table(paths: tuple[str, ...]) -> tuple[str | None, list[str], int]:
+    """
+    Tabela DuckDB com as linhas das fontes (CSVs e diretórios de
+    partições parquet, ver _union_source) e um identificador de linha
+    (_row, na ordem do timestamp quando houver a coluna), recriada quando
+    alguma fonte muda. Retorna a tabela, as colunas e o total de linhas.
+    """
+    stats = sources_signature(paths)
+    with _tables_lock:
+        cached = _page_tables.get(paths)
+        if cached is not None and cached[0] == stats:
+            return cached[1:]
+        source, params = _union_source(paths)
+        if not source:
+            return None, [], 0
+        cursor = get_cursor()
+        table = (
+            'page_' + hashlib.md5('|'.join(paths).encode()).hexdigest()[:16]
+        )
+        names = [
+            name
+            for name, *_ in cursor.execute(
+                f'DESCRIBE SELECT * FROM {source}', params
+            ).fetchall()
+        ]
+        order = 'ORDER BY timestamp' if 'timestamp' in names else ''
+        cursor.execute(
+            f'CREATE OR REPLACE TABLE {table} AS '
+            + f'SELECT row_number() OVER ({order}) AS _row, * FROM {source}',
+            params,
+        )
+        columns = [
+            name
+            for name, *_ in cursor.execute(f'DESCRIBE {table}').fetchall()
+            if name != '_row'
+        ]
+        total = cursor.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+        _page_tables[paths] = (stats, table, columns, total)
+        return table, columns, total
+
+
+def csv_page(  # noqa: PLR0913, PLR0914, PLR0917
+    paths,
+    sort_column: str | None = None,
+    ascending: bool = True,
+    limit: int = 10,
+    offset: int = 0,
+    after: list | None = None,
+    before: list | None = None,
+) -> dict:
+    """
+    Uma página das linhas das fontes (CSVs e diretórios de partições
+    parquet, como o histórico compactado do ticker), ordenada e paginada
+    pelo DuckDB (ORDER BY/LIMIT), sem carregar os arquivos no Python.
+
+    A página é escolhida por `offset` ou, para a página seguinte ou
+    anterior, pela chave (valor da coluna de ordenação, _row) da última
+    (`after`) ou da primeira (`before`) linha da página atual: a consulta
+    usa a chave em vez de percorrer as linhas anteriores.
+
+    Returns:
+        dict com columns, rows, total e as chaves first/last da página
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    paths = tuple(path for path in paths if os.path.exists(path))
+    table, columns, total = _page_table(paths) if paths else (None, [], 0)
+    if table is None:
+        return {
+            'columns': [],
+            'rows': [],
+            'total': 0,
+            'first': None,
+            'last': None,
+        }
+    if sort_column not in columns:
+        sort_column = None
+
+    # _row desempata linhas com o mesmo valor e torna a chave única
+    column = None if sort_column is None else _sql_identifier(sort_column)
+    key_columns = ['_row'] if column is None else [column, '_row']
+
+    # Página anterior: percorre no sentido inverso e inverte o resultado
+    bound = after if after is not None else before
+    if bound is not None and column is not None and bound[0] is None:
+        # Chave nula (nulos no fim da ordenação): usa o OFFSET
+        bound = None
+    backwards = bound is not None and after is None
+    forward = ascending != backwards
+    direction = 'ASC' if forward else 'DESC'
+    nulls = 'NULLS FIRST' if backwards else 'NULLS LAST'
+
+    where, params = '', []
+    if bound is not None:
+        operator = '>' if forward else '<'
+        if column is None:
+            where, params = f' WHERE _row {operator} ?', [bound[-1]]
+        else:
+            value, row = bound
+            condition = (
+                f'{column} {operator} ? '
+                + f'OR ({column} = ? AND _row {operator} ?)'
+            )
+            params = [value, value, row]
+            if not backwards:
+                # Os nulos ficam no fim, depois da última chave não nula
+                condition += f' OR {column} IS NULL'
+            where = f' WHERE ({condition})'
+        offset = 0
+
+    order = ', '.join(f'{col} {direction} {nulls}' for col in key_columns)
+    select = ', '.join(_sql_identifier(col) for col in columns)
+    rows = (
+        get_cursor()
+        .execute(
+            f'SELECT {select}, _row FROM {table}{where} '
+            + f'ORDER BY {order} LIMIT ? OFFSET ?',
+            [*params, limit, offset],
+        )
+        .fetchall()
+    )
+    if backwards:
+        rows.reverse()
+
+    def row_key(row):
+        if sort_column is None:
+            return [row[-1]]
+        return [row[columns.index(sort_column)], row[-1]]
+
+    return {
+        'columns': columns,
+        'rows': [list(row[:-1]) for row in rows],
+        'total': total,
+        'first': row_key(rows[0]) if rows else None,
+        'last': row_key(rows[-1]) if rows else None,
+    }
+
+
+def _where(start_date, end_date, convert=str) -> tuple[str, list]:
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append('timestamp >= ?')
+        params.append(convert(start_date))
+    if end_date is not None:
+        conditions.append('timestamp <= ?')
+        params.append(convert(end_date))
+    where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+    return where, params
+
+
+def parquet_files(directory: str) -> list[str]:
+    """Arquivos parquet das partições (date=AAAA-MM-DD) do diretório."""
+    files = []
+    with os.scandir(directory) as partitions:
+        for partition in sorted(partitions, key=lambda entry: entry.name):
+            if not partition.is_dir():
+                continue
+            files += sorted(
+                os.path.join(partition.path, name)
+                for name in os.listdir(partition.path)
+                if name.endswith('.parquet')
+            )
+    return files
+
+
+def sources_signature(paths) -> tuple:
+    """
+    Assinatura das fontes: (mtime, tamanho) de cada CSV e dos arquivos
+    parquet de cada diretório. Muda quando alguma fonte é alterada.
+    """
+    signature = []
+    for path in paths:
+        if os.path.isdir(path):
+            signature.append(
+                tuple(
+                    (file, os.stat(file).st_mtime_ns, os.stat(file).st_size)
+                    for file in parquet_files(path)
+                )
+            )
+        elif os.path.exists(path):
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        else:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _union_source(paths) -> tuple[str, list]:
+    """
+    Trecho FROM com as linhas de todas as fontes (UNION ALL BY NAME):
+    CSVs e diretórios de partições parquet (ex.: o histórico compactado
+    do ticker e o diário ticker.csv). Fontes vazias ou inexistentes são
+    ignoradas; sem nenhuma fonte, retorna ('', []).
+    """
+    csvs, parts = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            parts += parquet_files(path)
+        elif os.path.exists(path) and os.path.getsize(path):
+            csvs.append(path)
+
+    selects, params = [], []
+    if parts:
+        selects.append(
+            'SELECT * FROM read_parquet(?, union_by_name = true, '
+            + 'hive_partitioning = false)'
+        )
+        params.append(parts)
+    if len(csvs) == 1:
+        source, _ = _csv_schema(csvs[0])
+        selects.append(f'SELECT * FROM {source}')
+        params.append(csvs[0])
+    elif csvs:
+        selects.append('SELECT * FROM read_csv_auto(?, union_by_name = true)')
+        params.append(csvs)
+    if not selects:
+        return '', []
+    return '(' + ' UNION ALL BY NAME '.join(selects) + ')', params
+
+
+def load_sources_in_records(paths) -> list[dict]:
+    """Linhas de todas as fontes (ver _union_source) em ordem de tempo."""
+    source, params = _union_source(paths)
+    if not source:
+        return []
+    cursor = get_cursor().execute(
+        f'SELECT * FROM {source} ORDER BY timestamp', params
+    )
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def load_latest_records(
+    paths, key: str = 'market', rows: int = 2
+) -> list[dict]:
+    """
+    As `rows` linhas mais recentes de cada valor de `key` nas fontes (ver
+    _union_source), em ordem de tempo: o navegador recebe só os preços
+    atuais, não o histórico inteiro.
+    """
+    source, params = _union_source(paths)
+    if not source:
+        return []
+    column = _sql_identifier(key)
+    cursor = get_cursor().execute(
+        f'SELECT * FROM {source} QUALIFY row_number() OVER ('
+        + f'PARTITION BY {column} ORDER BY timestamp DESC) <= ? '
+        + 'ORDER BY timestamp',
+        [*params, rows],
+    )
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _query_csv(path: str, start_date=None, end_date=None):
+    """Executa o SELECT no CSV e retorna o cursor com o resultado."""
+    cursor = get_cursor()
+    try:
+        source, types = _csv_schema(path)
+        column_type = types.get('timestamp')
+        if (start_date is None and end_date is None) or (
+            column_type not in _TIMESTAMP_TYPES
+        ):
+            where, params = _where(start_date, end_date)
+            return cursor.execute(
+                f'SELECT * FROM {source}{where}', [path, *params]
+            )
+
+        # Período: consulta tipada sobre a cópia ordenada do CSV
+        where, params = _where(
+            start_date,
+            end_date,
+            lambda value: _timestamp_param(value, column_type),
+        )
+        return cursor.execute(
+            f'SELECT * FROM {_sorted_table(path, source)}{where}', params
+        )
+    except db.ConversionException:
+        # Os tipos mudaram depois da detecção: detecta de novo
+        with _schemas_lock:
+            _schemas.pop(path, None)
+        where, params = _where(start_date, end_date)
+        return cursor.execute(
+            f'SELECT * FROM read_csv_auto(?){where}', [path, *params]
+        )
+
 
 # Função para carregar os dados do CSV com e sem filtro de data
 def load_csv_in_dataframe(
     df: str, start_date=None, end_date=None
 ) -> pd.DataFrame:
-    # Criar nova conexão para cada consulta
-    with db.connect(':memory:') as db1:
-        query = f"SELECT * FROM read_csv_auto('{df}')"
-
-        if start_date is not None and end_date is not None:
-            query += (
-                f" WHERE timestamp >= '{start_date}'"
-                + f" AND timestamp <= '{end_date}'"
-            )
-        elif start_date is not None:
-            query += f" WHERE timestamp >= '{start_date}'"
-        elif end_date is not None:
-            query += f" WHERE timestamp <= '{end_date}'"
+    df = _query_csv(df, start_date, end_date).df()
 
-        df = db1.sql(query).df()
+    # Converter timestamp de volta para datetime UTC
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
 
-        # Converter timestamp de volta para datetime UTC
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-
-        return df
+    return df
 
 
 def load_csv_in_records(df, start_date=None, end_date=None):
-    query = f"SELECT * FROM read_csv_auto('{df}')"
-    if start_date is not None and end_date is not None:
-        query += (
-            f" WHERE timestamp >= '{start_date}' AND timestamp <= '{end_date}'"
-        )
-    elif start_date is not None:
-        query += f" WHERE timestamp >= '{start_date}'"
-    elif end_date is not None:
-        query += f" WHERE timestamp <= '{end_date}'"
-
-    csv_sql = db.sql(query)
+    csv_sql = _query_csv(df, start_date, end_date)
     result = csv_sql.fetchall()
     # Obtenção dos nomes das colunas - corrigido para acessar como propriedade
     column_names = [desc[0] for desc in csv_sql.description]
@@ -58,6 +446,10 @@ def save_to_csv_duckdb(df: pd.DataFrame, filepath: str, mode='overwrite'):
     Salva DataFrame no CSV usando DuckDB de forma otimizada
     mode: 'overwrite' ou 'append'
     """
+    # Cursor persistente da thread; as tabelas temporárias são removidas
+    # ao final
+    con = get_cursor()
+    target = _sql_string(filepath)
     try:
         # Garantir que timestamp está em UTC antes de salvar
         if 'timestamp' in df.columns:
@@ -70,49 +462,43 @@ def save_to_csv_duckdb(df: pd.DataFrame, filepath: str, mode='overwrite'):
                 '%Y-%m-%d %H:%M:%S%z'
             )
 
-        # Criar ou conectar ao banco temporário em memória
-        con = db.connect(':memory:')
-
         # Registrar o DataFrame como uma view
         con.register('temp_df', df)
 
         if mode == 'append':
             # Em caso de append, primeiro remover possíveis duplicatas
-            query = f"""
-            CREATE TABLE IF NOT EXISTS current_data AS
-            SELECT * FROM read_csv_auto('{filepath}');
-
-            CREATE TABLE merged AS
+            con.execute(
+                'CREATE OR REPLACE TEMP TABLE current_data AS '
+                + 'SELECT * FROM read_csv_auto(?)',
+                [filepath],
+            )
+            con.execute("""
+            CREATE OR REPLACE TEMP TABLE merged AS
             SELECT * FROM (
                 SELECT DISTINCT * FROM current_data
                 UNION ALL
                 SELECT * FROM temp_df
                 WHERE timestamp NOT IN (SELECT strftime('%Y-%m-%d %H:%M:%S%z', timestamp) FROM current_data)
             ) t
-            ORDER BY timestamp;
-
-            COPY (SELECT * FROM merged) TO '{filepath}' (HEADER true);
-            """  # noqa: E501
+            ORDER BY timestamp
+            """)  # noqa: E501
+            con.execute(f'COPY merged TO {target} (HEADER true)')
         else:
             # Em caso de overwrite, simplesmente salvar
-            query = (
-                f"COPY (SELECT * FROM temp_df) TO '{filepath}' (HEADER true)"
-            )
-
-        con.execute(query)
+            con.execute(f'COPY temp_df TO {target} (HEADER true)')
         return True
     except Exception as e:
         if 'Binder Error' in str(e):
             # entao salva no modo overwrite
-            con.execute(
-                f"COPY (SELECT * FROM temp_df) TO '{filepath}' (HEADER true)"
-            )
+            con.execute(f'COPY temp_df TO {target} (HEADER true)')
         else:
             console.print_exception(show_locals=True)
             console.print(f'Erro ao salvar dados com duckdb: {e}')
             return False
     finally:
-        con.close()
+        con.execute('DROP TABLE IF EXISTS merged')
+        con.execute('DROP TABLE IF EXISTS current_data')
+        con.unregister('temp_df')
 
 
 if __name__ == '__main__':
@@ -1,26 +1,220 @@
+import csv
+import io
+import os
+import threading
+from datetime import datetime
+
+import duckdb as db
 import pandas as pd
 
+from db.parquet_candles import write_parquet_part
 from segredos import CAMINHO
 
 PRICE_FILE = CAMINHO + '/ticker.csv'
 BALANCE_FILE = CAMINHO + '/balance.csv'
 
+# Histórico colunar dos tickers já compactados, particionado por dia
+TICKER_HISTORY_DIR = os.path.join(CAMINHO, 'ticker')
+# Fontes do histórico completo do ticker: partições compactadas e diário
+TICKER_SOURCES = [TICKER_HISTORY_DIR, PRICE_FILE]
+# Linhas no diário (ticker.csv) que disparam a compactação
+TICKER_COMPACT_ROWS = 50_000
+# Linhas mais recentes mantidas no diário após a compactação
+TICKER_KEEP_ROWS = 5_000
+# Bytes lidos do final do diário para reconstruir o índice em memória
+_TAIL_BYTES = 256 * 1024
+
+_ticker_lock = threading.RLock()
+# Última linha gravada por mercado: market -> (last, timestamp sem segundos)
+_last_ticker: dict[str, tuple[str, str]] = {}
+_ticker_header: list[str] | None = None
+_ticker_rows = 0
+
+
+def _ticker_key(ticker_json) -> tuple[str, str]:
+    return str(ticker_json['last']), str(ticker_json['timestamp'])[:-3]
+
+
+def _load_ticker_index():
+    """
+    Lê o cabeçalho, conta as linhas e reconstrói o índice "última linha
+    por mercado" apenas a partir do final do diário.
+    """
+    global _ticker_header, _ticker_rows  # noqa: PLW0603
+    _last_ticker.clear()
+    _ticker_header, _ticker_rows = None, 0
+    if not os.path.exists(PRICE_FILE) or os.path.getsize(PRICE_FILE) == 0:
+        return
+
+    with open(PRICE_FILE, 'rb') as f:
+        _ticker_header = next(csv.reader([f.readline().decode('utf-8')]))
+        header_end = f.tell()
+        # Contagem em blocos, sem interpretar o CSV
+        while chunk := f.read(1 << 20):
+            _ticker_rows += chunk.count(b'\n')
+        start = max(header_end, f.tell() - _TAIL_BYTES)
+        f.seek(start)
+        tail = f.read().decode('utf-8', errors='ignore')
+
+    rows = list(csv.reader(io.StringIO(tail)))
+    if start > header_end:
+        rows = rows[1:]  # a primeira linha pode estar cortada
+    for row in rows:
+        if len(row) != len(_ticker_header):
+            continue
+        record = dict(zip(_ticker_header, row))
+        if 'last' in record and 'timestamp' in record:
+            _last_ticker[record.get('market', '')] = _ticker_key(record)
+
+
+def _append_ticker_rows(rows: list[dict]):
+    global _ticker_header, _ticker_rows  # noqa: PLW0603
+    write_header = _ticker_header is None
+    if write_header:
+        _ticker_header = list(rows[0].keys())
+    buffer = io.StringIO()
+    # Fim de linha igual ao do pandas (compactação): o DuckDB não lê CSVs
+    # com finais de linha misturados
+    writer = csv.DictWriter(
+        buffer,
+        fieldnames=_ticker_header,
+        extrasaction='ignore',
+        lineterminator='\n',
+    )
+    if write_header:
+        writer.writeheader()
+    writer.writerows(rows)
+    # Uma única escrita por lote: leitores concorrentes (dashboard) não
+    # veem linhas pela metade
+    with open(PRICE_FILE, 'a', encoding='utf-8', newline='') as f:
+        f.write(buffer.getvalue())
+    _ticker_rows += len(rows)
+
+
+def save_prices_to_csv(tickers: list[dict]) -> int:
+    """
+    Acrescenta os tickers ao diário (ticker.csv) em uma única escrita,
+    sem reler o arquivo. A checagem de duplicidade usa o índice em memória
+    da última linha de cada mercado. Retorna a quantidade de linhas novas.
+    """
+    with _ticker_lock:
+        if _ticker_header is None:
+            _load_ticker_index()
+
+        rows = []
+        for ticker_json in tickers:
+            market = str(ticker_json.get('market', ''))
+            key = _ticker_key(ticker_json)
+            if _last_ticker.get(market) == key:
+                continue
+            rows.append(ticker_json)
+            _last_ticker[market] = key
+        if not rows:
+            return 0
+
+        _append_ticker_rows(rows)
+        if _ticker_rows >= TICKER_COMPACT_ROWS:
+            compact_ticker_journal()
+        return len(rows)
+
 
 def save_price_to_csv(ticker_json):
-    try:
-        df_precos = pd.read_csv(PRICE_FILE)
-        if (
-            ticker_json['last'] != df_precos['last'].iloc[-1]
-            or ticker_json['timestamp'][:-3]
-            != df_precos['timestamp'].iloc[-1][:-3]
-        ):
-            df_precos = df_precos._append(ticker_json, ignore_index=True)
-            df_precos.to_csv(PRICE_FILE, index=False)
-    except Exception as e:
-        if 'No columns to parse from file' in str(e):
-            df_precos = pd.DataFrame([ticker_json])
-
-    df_precos.to_csv(PRICE_FILE, index=False)
+    """Acrescenta um ticker ao diário; False se repetir a última linha."""
+    return save_prices_to_csv([ticker_json]) > 0
+
+
+def compact_ticker_journal(keep_rows: int | None = None) -> int:
+    """
+    Move as linhas antigas do diário para o histórico parquet (uma
+    partição por dia) e mantém apenas as `keep_rows` mais recentes no
+    ticker.csv.
+
+    Returns:
+        Quantidade de linhas movidas para o histórico
+    """
+    global _ticker_rows  # noqa: PLW0603
+    if keep_rows is None:
+        keep_rows = TICKER_KEEP_ROWS
+    with _ticker_lock:
+        if not os.path.exists(PRICE_FILE):
+            return 0
+        df = pd.read_csv(PRICE_FILE)
+        if len(df) <= keep_rows:
+            _ticker_rows = len(df)
+            return 0
+
+        old = df.iloc[: len(df) - keep_rows].assign(
+            timestamp=lambda d: pd.to_datetime(
+                d['timestamp'], format='mixed', errors='coerce'
+            )
+        )
+        recent = df.iloc[len(df) - keep_rows :]
+        days = old['timestamp'].dt.strftime('%Y-%m-%d')
+        with db.connect(':memory:') as con:
+            for day, frame in old.groupby(days.fillna('unknown')):
+                write_parquet_part(
+                    con,
+                    frame.reset_index(drop=True),
+                    os.path.join(TICKER_HISTORY_DIR, f'date={day}'),
+                )
+
+        # Reescreve o diário de forma atômica só com as linhas recentes
+        tmp_file = PRICE_FILE + '.tmp'
+        recent.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, PRICE_FILE)
+        _ticker_rows = len(recent)
+        return len(old)
+
+
+def load_ticker_history(start_date=None, end_date=None) -> pd.DataFrame:
+    """Carrega os tickers do histórico compactado e do diário atual."""
+    frames = []
+    if os.path.isdir(TICKER_HISTORY_DIR):
+        parts = []
+        for name in sorted(os.listdir(TICKER_HISTORY_DIR)):
+            day = name.removeprefix('date=')
+            if start_date is not None and day < str(start_date)[:10]:
+                continue
+            if end_date is not None and day > str(end_date)[:10]:
+                continue
+            directory = os.path.join(TICKER_HISTORY_DIR, name)
+            parts += [
+                os.path.join(directory, part)
+                for part in sorted(os.listdir(directory))
+                if part.endswith('.parquet')
+            ]
+        if parts:
+            with db.connect(':memory:') as con:
+                frames.append(
+                    con.execute(
+                        'SELECT * FROM read_parquet(?, union_by_name = true, '
+                        + 'hive_partitioning = false)',
+                        [parts],
+                    ).df()
+                )
+    if os.path.exists(PRICE_FILE) and os.path.getsize(PRICE_FILE):
+        frames.append(pd.read_csv(PRICE_FILE))
+    if not frames:
+        return pd.DataFrame()
+
+    df = pd.concat(frames, ignore_index=True)
+    df['timestamp'] = pd.to_datetime(
+        df['timestamp'], format='mixed', errors='coerce'
+    )
+    if start_date is not None:
+        df = df[df['timestamp'] >= _naive(start_date)]
+    if end_date is not None:
+        df = df[df['timestamp'] <= _naive(end_date)]
+    return df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def _naive(value) -> pd.Timestamp:
+    # Os timestamps do ticker são gravados sem fuso (horário local)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(datetime.now().astimezone().tzinfo)
+        ts = ts.tz_localize(None)
+    return ts
 
 
 def save_balance_to_csv(balance_json):
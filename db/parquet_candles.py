@@ -0,0 +1,362 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import duckdb as db
+import pandas as pd
+
+from bot.logs.config_log import console
+from db.duckdb_csv import load_csv_in_dataframe
+from segredos import CAMINHO
+
+# Armazenamento colunar dos candles: um diretório por exchange/par e uma
+# partição por dia (UTC), no formato
+# candles/{exchange}/{symbol}/date=AAAA-MM-DD/part-{ns}.parquet
+CANDLES_DIR = os.path.join(CAMINHO, 'candles')
+
+# Quantidade de arquivos de um mesmo dia que dispara a compactação
+MAX_PARTS_PER_DAY = 32
+
+_lock = threading.RLock()
+_last_timestamps: dict[tuple[str, str], pd.Timestamp | None] = {}
+# Dias que receberam escrita e ainda podem precisar de compactação
+_pending_days: dict[tuple[str, str], set[str]] = {}
+_last_part = 0
+
+
+def _symbol_dir(symbol: str, exchange: str) -> str:
+    return os.path.join(CANDLES_DIR, exchange, symbol)
+
+
+def _day_dir(symbol: str, exchange: str, day: str) -> str:
+    return os.path.join(_symbol_dir(symbol, exchange), f'date={day}')
+
+
+def _next_part_name() -> str:
+    """Nome de arquivo crescente: o arquivo mais novo vence na leitura."""
+    global _last_part  # noqa: PLW0603
+    with _lock:
+        _last_part = max(time.time_ns(), _last_part + 1)
+        return f'part-{_last_part:020d}.parquet'
+
+
+def to_utc(value) -> pd.Timestamp:
+    """Converte datas para UTC (datas sem fuso são tratadas como locais)."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(datetime.now().astimezone().tzinfo)
+    return ts.tz_convert('UTC')
+
+
+def _list_days(symbol: str, exchange: str) -> list[str]:
+    path = _symbol_dir(symbol, exchange)
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        name.removeprefix('date=')
+        for name in os.listdir(path)
+        if name.startswith('date=')
+    )
+
+
+def _list_parts(symbol: str, exchange: str, day: str) -> list[str]:
+    path = _day_dir(symbol, exchange, day)
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.startswith('part-') and name.endswith('.parquet')
+    )
+
+
+def write_parquet_part(con, df: pd.DataFrame, directory: str):
+    """Escreve um arquivo parquet de forma atômica (tmp + rename)."""
+    os.makedirs(directory, exist_ok=True)
+    name = _next_part_name()
+    tmp_path = os.path.join(directory, f'.{name}.tmp')
+    con.register('candles_df', df)
+    try:
+        con.execute(
+            'COPY (SELECT * FROM candles_df ORDER BY timestamp) '
+            + f"TO '{tmp_path}' (FORMAT parquet)"
+        )
+    finally:
+        con.unregister('candles_df')
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    columns = {
+        'timestamp': pd.to_datetime(df['timestamp'], format='mixed', utc=True)
+    }
+    # Candles vindos da API podem chegar como Decimal (dtype object)
+    for col in ('open', 'high', 'low', 'close', 'volume'):
+        if col in df.columns and df[col].dtype == object:
+            columns[col] = pd.to_numeric(df[col]).astype('float64')
+    return df.assign(**columns).sort_values('timestamp')
+
+
+def get_last_timestamp(
+    symbol: str, exchange: str = 'bitpreco'
+) -> pd.Timestamp | None:
+    """Retorna o timestamp do candle mais recente armazenado."""
+    key = (exchange, symbol)
+    with _lock:
+        if key in _last_timestamps:
+            return _last_timestamps[key]
+
+        last = None
+        for day in reversed(_list_days(symbol, exchange)):
+            parts = _list_parts(symbol, exchange, day)
+            if not parts:
+                continue
+            with db.connect(':memory:') as con:
+                last = con.execute(
+                    'SELECT max(timestamp) FROM read_parquet(?)', [parts]
+                ).fetchone()[0]
+            if last is not None:
+                last = to_utc(last)
+                break
+
+        _last_timestamps[key] = last
+        return last
+
+
+def stored_days(symbol: str, exchange: str = 'bitpreco') -> list[str]:
+    """Dias (AAAA-MM-DD, UTC) que possuem partição no armazenamento."""
+    return _list_days(symbol, exchange)
+
+
+def has_candles(symbol: str, exchange: str = 'bitpreco') -> bool:
+    return get_last_timestamp(symbol, exchange) is not None
+
+
+def append_candles(
+    df: pd.DataFrame,
+    symbol: str,
+    exchange: str = 'bitpreco',
+    only_new: bool = True,
+) -> int:
+    """
+    Acrescenta candles ao armazenamento sem reescrever o histórico.
+
+    Args:
+        df: DataFrame com a coluna timestamp e as demais colunas a salvar
+        symbol: Par no formato BTC_BRL
+        exchange: Nome da exchange (subdiretório)
+        only_new: Se True, grava apenas candles a partir do último
+            timestamp armazenado (inclusive, para capturar a revisão do
+            último candle)
+
+    Returns:
+        Quantidade de candles gravados
+    """
+    if df is None or df.empty:
+        return 0
+
+    df = _normalize(df)
+    with _lock:
+        last = get_last_timestamp(symbol, exchange)
+        if only_new and last is not None:
+            df = df[df['timestamp'] >= last]
+        if df.empty:
+            return 0
+
+        key = (exchange, symbol)
+        pending = _pending_days.setdefault(key, set())
+        days = df['timestamp'].dt.strftime('%Y-%m-%d')
+        with db.connect(':memory:') as con:
+            for day, frame in df.groupby(days, sort=True):
+                write_parquet_part(
+                    con,
+                    frame.reset_index(drop=True),
+                    _day_dir(symbol, exchange, day),
+                )
+                pending.add(day)
+
+        newest = df['timestamp'].iloc[-1]
+        if last is None or newest > last:
+            _last_timestamps[key] = newest
+
+        # Compacta dias fechados e dias com arquivos demais
+        today = pd.Timestamp.now(tz='UTC').strftime('%Y-%m-%d')
+        for day in sorted(pending):
+            parts = _list_parts(symbol, exchange, day)
+            if len(parts) > MAX_PARTS_PER_DAY or (
+                day < today and len(parts) > 1
+            ):
+                compact_partition(symbol, day, exchange)
+            if day < today:
+                pending.discard(day)
+
+    return len(df)
+
+
+def _dedup_query(select: str) -> str:
+    # Em caso de candles repetidos, prevalece o arquivo mais recente
+    return (
+        f'SELECT * EXCLUDE (filename) FROM ({select}) '
+        + 'QUALIFY row_number() OVER '
+        + '(PARTITION BY timestamp ORDER BY filename DESC) = 1'
+    )
+
+
+def compact_partition(symbol: str, day: str, exchange: str = 'bitpreco'):
+    """Reescreve os arquivos de um dia em um único arquivo sem duplicatas."""
+    with _lock:
+        parts = _list_parts(symbol, exchange, day)
+        if len(parts) <= 1:
+            return
+        with db.connect(':memory:') as con:
+            merged = con.execute(
+                _dedup_query(
+                    'SELECT * FROM read_parquet(?, union_by_name = true, '
+                    + 'filename = true, hive_partitioning = false)'
+                ),
+                [parts],
+            ).df()
+            write_parquet_part(con, merged, _day_dir(symbol, exchange, day))
+        for part in parts:
+            os.remove(part)
+
+
+def _days_in_period(symbol: str, exchange: str, start, end) -> list[str]:
+    days = _list_days(symbol, exchange)
+    if start is not None:
+        days = [d for d in days if d >= start.strftime('%Y-%m-%d')]
+    if end is not None:
+        days = [d for d in days if d <= end.strftime('%Y-%m-%d')]
+    return days
+
+
+def day_bounds(start_date=None, end_date=None):
+    """
+    Período ampliado para dias inteiros (UTC), o mesmo recorte das
+    partições: do início do primeiro dia ao último instante do último.
+    """
+    start = to_utc(start_date).floor('D') if start_date is not None else None
+    end = (
+        to_utc(end_date).floor('D') + pd.Timedelta(days=1, microseconds=-1)
+        if end_date is not None
+        else None
+    )
+    return start, end
+
+
+def partition_files(
+    symbol: str,
+    exchange: str = 'bitpreco',
+    start_date=None,
+    end_date=None,
+) -> tuple[str, ...]:
+    """
+    Arquivos das partições dos dias do período. Um arquivo nunca é
+    alterado depois de escrito (novos candles e compactações criam
+    arquivos novos), então a lista identifica o conteúdo armazenado.
+    """
+    start = to_utc(start_date) if start_date is not None else None
+    end = to_utc(end_date) if end_date is not None else None
+    return tuple(
+        part
+        for day in _days_in_period(symbol, exchange, start, end)
+        for part in _list_parts(symbol, exchange, day)
+    )
+
+
+def load_candles(
+    symbol: str,
+    exchange: str = 'bitpreco',
+    start_date=None,
+    end_date=None,
+) -> pd.DataFrame:
+    """
+    Carrega candles do armazenamento colunar, opcionalmente filtrando por
+    período. Apenas as partições dos dias do período são lidas.
+    """
+    start = to_utc(start_date) if start_date is not None else None
+    end = to_utc(end_date) if end_date is not None else None
+
+    for attempt in range(2):
+        days = _days_in_period(symbol, exchange, start, end)
+
+        single, multiple = [], []
+        for day in days:
+            parts = _list_parts(symbol, exchange, day)
+            (multiple if len(parts) > 1 else single).extend(parts)
+        if not single and not multiple:
+            return pd.DataFrame()
+
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            conditions.append('timestamp <= ?')
+            params.append(end)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+
+        read = (
+            'SELECT * FROM read_parquet(?, union_by_name = true, '
+            + 'filename = true, hive_partitioning = false)'
+        )
+        selects, query_params = [], []
+        if single:
+            selects.append(f'SELECT * EXCLUDE (filename) FROM ({read}){where}')
+            query_params += [single, *params]
+        if multiple:
+            selects.append(_dedup_query(f'{read}{where}'))
+            query_params += [multiple, *params]
+        query = (
+            ' UNION ALL BY NAME '.join(f'({s})' for s in selects)
+            + ' ORDER BY timestamp'
+        )
+
+        try:
+            with db.connect(':memory:') as con:
+                df = con.execute(query, query_params).df()
+            break
+        except db.IOException:
+            # Um arquivo pode ter sido removido por uma compactação
+            if attempt:
+                raise
+
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+    return df
+
+
+def import_csv(csv_path: str, symbol: str, exchange: str = 'bitpreco') -> int:
+    """Importa um CSV de candles (formato antigo) para o armazenamento."""
+    df = load_csv_in_dataframe(csv_path)
+    written = append_candles(df, symbol, exchange, only_new=False)
+    console.print(f'[green]{written} candles importados de {csv_path}[/green]')
+    return written
+
+
+def export_csv(
+    symbol: str,
+    csv_path: str,
+    exchange: str = 'bitpreco',
+    start_date=None,
+    end_date=None,
+) -> int:
+    """Exporta os candles armazenados para CSV."""
+    df = load_candles(symbol, exchange, start_date, end_date)
+    if df.empty:
+        return 0
+    with db.connect(':memory:') as con:
+        con.register('candles_df', df)
+        con.execute(
+            f"COPY (SELECT * FROM candles_df) TO '{csv_path}' (HEADER true)"
+        )
+    return len(df)
+
+
+if __name__ == '__main__':
+    import datetime as dt
+    from datetime import timedelta
+
+    end_date = datetime.now(dt.timezone.utc)
+    start_date = end_date - timedelta(days=1)
+    console.print(load_candles('BTC_BRL', start_date=start_date))
@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+
+from bot.logs.config_log import console
+from db.json_csv import (
+    save_balance_to_csv,
+    save_orders_to_csv,
+    save_prices_to_csv,
+)
+from db.parquet_candles import append_candles
+
+# Itens aguardando o escritor; quando cheia, quem grava espera
+WRITER_QUEUE_SIZE = 1000
+# Itens recebidos que disparam a gravação antes do intervalo
+WRITER_BATCH_SIZE = 100
+# Intervalo máximo (s) entre gravações
+WRITER_FLUSH_INTERVAL = 2.0
+
+_STOP = object()
+
+
+def _extend(pending: list, new: list) -> list:
+    pending.extend(new)
+    return pending
+
+
+def _concat_candles(pending: pd.DataFrame, new: pd.DataFrame):
+    df = pd.concat([pending, new], ignore_index=True)
+    # Candle revisado em um ciclo posterior: prevalece o mais recente
+    return df.drop_duplicates(subset=['timestamp'], keep='last')
+
+
+class PersistenceWriter:
+    """
+    Escritor em segundo plano: o ciclo de trading só enfileira o que deve
+    ser salvo e uma thread grava em lotes (por quantidade ou por tempo).
+
+    Cada item tem uma chave (um arquivo ou partição). Itens com a mesma
+    chave são combinados antes da gravação: por padrão vale o mais recente
+    (saldo, ordens) e, com `merge`, os valores são acumulados (tickers,
+    candles).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = WRITER_QUEUE_SIZE,
+        batch_size: int = WRITER_BATCH_SIZE,
+        flush_interval: float = WRITER_FLUSH_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='persistence-writer', daemon=True
+                )
+                self._thread.start()
+
+    def put(
+        self,
+        key: str,
+        value,
+        flush: Callable,
+        merge: Callable | None = None,
+    ):
+        """Enfileira `flush(value)`, combinando itens de mesma chave."""
+        self.start()
+        self._queue.put((key, value, flush, merge))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Grava tudo o que foi enfileirado até agora e espera terminar."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def stop(self, timeout: float | None = 30.0):
+        """Esvazia a fila, grava o que falta e encerra a thread."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        pending: dict[str, list] = {}
+        received = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Empty:
+                item = None
+
+            if item is _STOP or isinstance(item, threading.Event):
+                # Esvazia o que já está na fila antes de gravar
+                controls = [item]
+                while True:
+                    try:
+                        extra = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if extra is _STOP or isinstance(extra, threading.Event):
+                        controls.append(extra)
+                    else:
+                        self._add(pending, extra)
+                self._write(pending)
+                received, deadline = 0, time.monotonic() + self.flush_interval
+                for control in controls:
+                    if control is not _STOP:
+                        control.set()
+                if _STOP in controls:
+                    return
+                continue
+
+            if item is not None:
+                self._add(pending, item)
+                received += 1
+            if received >= self.batch_size or time.monotonic() >= deadline:
+                self._write(pending)
+                received, deadline = 0, time.monotonic() + self.flush_interval
+
+    @staticmethod
+    def _add(pending: dict, item):
+        key, value, flush, merge = item
+        if merge is not None and key in pending:
+            value = merge(pending[key][1], value)
+        pending[key] = [flush, value]
+
+    @staticmethod
+    def _write(pending: dict):
+        for key, (flush, value) in list(pending.items()):
+            try:
+                flush(value)
+            except Exception as e:
+                console.print(f'[red]Erro ao gravar {key}: {e}[/red]')
+        pending.clear()
+
+    # Atalhos para os arquivos do bot
+
+    def save_price(self, ticker_json: dict):
+        self.put('ticker', [ticker_json], save_prices_to_csv, _extend)
+
+    def save_balance(self, balance_json: dict):
+        self.put('balance', balance_json, save_balance_to_csv)
+
+    def save_orders(self, orders_json: list, coinpair):
+        self.put(
+            f'orders:{coinpair.bitpreco_format}',
+            orders_json,
+            lambda orders: save_orders_to_csv(orders, coinpair),
+        )
+
+    def save_candles(self, df: pd.DataFrame, symbol: str, exchange: str):
+        # Cópia: o chamador continua usando (e alterando) o DataFrame
+        self.put(
+            f'candles:{exchange}:{symbol}',
+            df.copy(),
+            lambda candles: append_candles(candles, symbol, exchange),
+            _concat_candles,
+        )
+
+
+_writer_lock = threading.Lock()
+_writer: PersistenceWriter | None = None
+
+
+def get_writer() -> PersistenceWriter:
+    """Instância única do escritor no processo."""
+    global _writer  # noqa: PLW0603
+    with _writer_lock:
+        if _writer is None:
+            _writer = PersistenceWriter()
+        return _writer